@@ -0,0 +1,148 @@
+import argparse
+import json
+import time
+import chess
+import constants
+import search_worker
+import t_table
+import timer
+
+"""
+Search benchmark. Runs each engine at each depth over a fixed suite of positions and reports nodes, time, nodes per
+second, effective branching factor and the chosen move. Searches are fixed depth with a fresh transposition table,
+so the node counts are deterministic: the total (the signature) changes only when search behaviour does.
+Run with: python bench.py [--json] [--algorithm NAME] [--depth N] [--no-null-move] [--no-lmr]
+"""
+
+BENCH_DEPTHS = [2, 3, 4, 5]       # Default depths: deeper ones take too long for the engines without pruning
+
+BENCH_POSITIONS = [
+    ('opening', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'),
+    ('opening', 'r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3'),
+    ('middlegame', 'r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N2N2/PP2BPPP/R2QKB1R w KQ - 0 9'),
+    ('middlegame', 'r2q1rk1/1b1nbppp/p2ppn2/1p6/3NP3/1BN1BP2/PPPQ2PP/2KR3R w - - 0 12'),
+    ('tactics', 'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4'),
+    ('tactics', '2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1'),
+    ('tactics', 'r1bq2rk/pp3pbp/2p1p1pQ/7P/3P4/2PB1N2/PP3PPR/2KR4 w - - 0 1'),
+    ('endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'),
+    ('endgame', '8/8/4k3/8/2K5/3P4/8/8 w - - 0 1'),
+]
+
+
+def bench_position(algorithm, fen, depth, null_move=True, lmr=True):
+    """
+    Search one position to a fixed depth.
+    :param algorithm: algorithm name, from constants.ALGORITHM_LIST.
+    :param fen: position to search.
+    :param depth: search depth.
+    :param null_move: null-move pruning setting (NegaScout and MTD(f)).
+    :param lmr: late move reductions setting (NegaScout and MTD(f)).
+    :return: result dict.
+    """
+    board = chess.Board(fen)
+    time_manager = timer.TimeManager()
+    trans_table = t_table.TransTable() if algorithm == 'MTD(f) - Main' else None  # Fresh table: no carry-over
+    engine = search_worker.create_engine(algorithm, board, depth, trans_table, time_manager,
+                                         null_move=null_move, lmr=lmr)
+    start = time.perf_counter()
+    result = search_worker.run_search(engine, board)
+    seconds = time.perf_counter() - start
+    nodes = result.nodes
+    return {
+        'algorithm': algorithm,
+        'depth': depth,
+        'fen': fen,
+        'move': result.move.uci() if result.move else None,
+        'nodes': nodes,
+        'seconds': seconds,
+        'nps': nodes / seconds if seconds else 0.0,
+        'ebf': nodes ** (1 / depth) if nodes else 0.0,   # Branching factor a uniform tree of this size would have
+    }
+
+
+def run_bench(algorithms=None, depths=None, positions=None, progress=None, null_move=True, lmr=True):
+    """
+    Run the benchmark.
+    :param algorithms: algorithm names, default all of constants.ALGORITHM_LIST.
+    :param depths: search depths, default BENCH_DEPTHS.
+    :param positions: list of (category, FEN) tuples, default BENCH_POSITIONS.
+    :param progress: optional callable, given each result dict as it completes.
+    :param null_move: null-move pruning setting, so its effect can be measured on its own.
+    :param lmr: late move reductions setting, likewise.
+    :return: report dict with the per-search results, per-algorithm totals and the node signature.
+    """
+    algorithms = algorithms or constants.ALGORITHM_LIST
+    depths = depths or BENCH_DEPTHS
+    positions = positions or BENCH_POSITIONS
+    results = []
+    for algorithm in algorithms:
+        for depth in depths:
+            for category, fen in positions:
+                result = bench_position(algorithm, fen, depth, null_move, lmr)
+                result['category'] = category
+                results.append(result)
+                if progress:
+                    progress(result)
+
+    totals = {}
+    for algorithm in algorithms:
+        nodes = sum(result['nodes'] for result in results if result['algorithm'] == algorithm)
+        seconds = sum(result['seconds'] for result in results if result['algorithm'] == algorithm)
+        totals[algorithm] = {'nodes': nodes, 'seconds': seconds, 'nps': nodes / seconds if seconds else 0.0}
+    nodes = sum(result['nodes'] for result in results)
+    seconds = sum(result['seconds'] for result in results)
+    return {
+        'results': results,
+        'totals': totals,
+        'signature': nodes,
+        'seconds': seconds,
+        'nps': nodes / seconds if seconds else 0.0,
+    }
+
+
+def format_result(result):
+    """
+    :param result: result dict from bench_position.
+    :return: one line of the human-readable report.
+    """
+    return '{:<22} d{} {:<10} {:>10} nodes {:>8.2f}s {:>8.0f} nps  ebf {:>5.2f}  {}'.format(
+        result['algorithm'], result['depth'], result['category'], result['nodes'], result['seconds'],
+        result['nps'], result['ebf'], result['move'])
+
+
+def format_report(report):
+    """
+    :param report: report dict from run_bench.
+    :return: human-readable summary.
+    """
+    lines = ['{:<22} {:>10} nodes {:>8.2f}s {:>8.0f} nps'.format(algorithm, total['nodes'], total['seconds'],
+                                                                 total['nps'])
+             for algorithm, total in report['totals'].items()]
+    lines.append('Total time (s) : {:.2f}'.format(report['seconds']))
+    lines.append('Nodes searched : {}'.format(report['signature']))
+    lines.append('Nodes/second   : {:.0f}'.format(report['nps']))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search benchmark over a fixed position suite.')
+    parser.add_argument('--algorithm', action='append', choices=constants.ALGORITHM_LIST,
+                        help='algorithm to run (repeatable, default all)')
+    parser.add_argument('--depth', action='append', type=int,
+                        help='search depth (repeatable, default {})'.format(BENCH_DEPTHS))
+    parser.add_argument('--no-null-move', action='store_true', help='turn null-move pruning off')
+    parser.add_argument('--no-lmr', action='store_true', help='turn late move reductions off')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON instead')
+    args = parser.parse_args()
+
+    progress = None if args.json else lambda result: print(format_result(result), flush=True)
+    report = run_bench(args.algorithm, args.depth, progress=progress, null_move=not args.no_null_move,
+                       lmr=not args.no_lmr)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
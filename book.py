@@ -2,28 +2,49 @@ import chess
 import logging
 import chess.polyglot
 
+"""
+Opening book. Each process maps the polyglot book into memory once (chess.polyglot.MemoryMappedReader: a read-only
+mmap of the key-sorted entries, searched by bisection), so a book probe makes no system calls, and the read-only
+pages are shared by every process that maps the file.
+"""
+
+_readers = {}                                                     # Book file -> reader, one per process
+
+
+def open_book(book_file):
+    """
+    Memory-mapped reader for a book file, opened on first use and kept open for the life of the process.
+    :param book_file: Polyglot book file.
+    :return: chess.polyglot.MemoryMappedReader, or None if the book can't be opened.
+    """
+    if book_file not in _readers:
+        try:
+            _readers[book_file] = chess.polyglot.open_reader(book_file)
+        except (OSError, IOError):
+            logging.warning('GUI book is missing or invalid: %s', book_file)
+            _readers[book_file] = None                           # Don't retry on every move
+    return _readers[book_file]
+
 
 class BookController:
-    def __init__(self, book_file, board):
+    def __init__(self, book_file):
         """
-        Handle polyglot Opening Book Moves for the engine.
+        Handle polyglot Opening Book Moves for the engine, for one game.
         :param book_file: Polgylot book file
-        :param board: provided chess_board position
         """
-        self.book_file = book_file
-        self.board = board
-        self.__book_move = None
+        self.reader = open_book(book_file)
+        self.in_book = self.reader is not None                    # False once the game has left the book
 
-    def get_book_move(self):
-        reader = chess.polyglot.open_reader(self.book_file)
+    def get_book_move(self, board):
+        """
+        :param board: provided chess_board position
+        :return: weighted random book move, or None once the game is out of book.
+        """
+        if not self.in_book:                                      # Out of book: skip probing for the rest of the game
+            return None
         try:
-            entry = reader.weighted_choice(self.board)            # Get move from book
-            self.__book_move = entry.move                         # Store move
+            return self.reader.weighted_choice(board).move        # Get move from book
         except IndexError:
             logging.info('No book move. Moving to main engine.')
-        except Exception():
-            logging.exception('Failed to get Book.')
-        finally:
-            reader.close()                                        # Close polyglot reader
-
-        return self.__book_move
+            self.in_book = False
+        return None
@@ -93,6 +93,9 @@ class ConcreteGUI:
                      relief='sunken'),
              sg.Text('16', k='el_engine_pieces', font=('Courier', 14), size=(5, 1), pad=((35, 0), (1, 7)),
                      relief='sunken')],
+            # ROW 3b - Ponder hit rate (blank unless pondering)
+            [sg.Text('Ponder', font=('Courier', 12), size=(9, 1)),
+             sg.Text('', k='el_ponder', font=('Courier', 12), size=(40, 1), relief='sunken', pad=((0, 0), (1, 7)))],
             # ROW 4 - Headings
             [sg.HorizontalSeparator()],
             [sg.Text('Algorithm:', pad=((7, 174), (5, 0)), font=('Courier', 14), size=(11, 1)),
@@ -118,10 +121,12 @@ class ConcreteGUI:
              sg.Text('Move Type', pad=((7, 10), (5, 0)), font=('Courier', 14), size=(11, 1)),
              sg.VerticalSeparator(),
              sg.Text('Duration', pad=((7, 14), (5, 0)), font=('Courier', 14), size=(8, 1)),
-             sg.VerticalSeparator()],
-            # ROW 7 - Element for move-history output throughout game-play
+             sg.VerticalSeparator(),
+             sg.Text('Last Search', pad=((7, 10), (5, 0)), font=('Courier', 14), size=(12, 1))],
+            # ROW 7 - Elements for move-history output and the engine's last search statistics
             [sg.Multiline('', k='el_move_history', do_not_clear=True, autoscroll=True, size=(60, 15),
-                          font=('Courier', 12), disabled=True)]]
+                          font=('Courier', 12), disabled=True),
+             sg.Multiline('', k='el_search_stats', size=(24, 15), font=('Courier', 12), disabled=True)]]
 
         # Build chess_board layout
         layout = [
@@ -8,12 +8,17 @@ WINDOW_TITLE = 'Beat My Chess AI'
 LOGO = 'Images/logo.ico'
 
 ALGORITHM_LIST = ['NegaMax', 'NegaMax & Alpha-Beta', 'NegaScout & Quiesce', 'MTD(f) - Main']
-DEPTH_LIST = [2, 3, 4, 5]
+DEPTH_LIST = [2, 3, 4, 5, 6, 7]   # 6 and 7 are practical with null-move pruning and LMR (NegaScout, MTD(f))
+THREAD_LIST = [1, 2, 4, 8, 16]   # Search processes: Lazy SMP for MTD(f), root split for NegaMax and NegaMax AB
+PROFILE_LIST = ['Off', 'Sampler', 'cProfile']   # Profiling modes of the engine's searches
+PROFILE_ENV = 'BMCAI_PROFILE'   # Environment variable turning profiling on: 'sample' or 'cprofile'
+PROFILE_DIR = 'Profiles'        # Folder the search profiles are written to, one subfolder per game
 
 # State 1: Pre-Game. GUI elements outside of in-game.
 PREGAME_MENU_BAR = [['Menu', ['Start Game', ['Play as White', 'Play as Black'], 'Close Application']],
                     ['Algorithm Info. && Settings', ['Select Algorithm', 'Default Algorithm', 'Change Search Depth',
-                                                     'Algorithm Information']],
+                                                     'Change Threads', 'Ponder Settings', 'Pruning Settings',
+                                                     'Profiling Settings', 'Algorithm Information']],
                     ['Display Settings', ['Preview Themes', 'Default Theme', 'Select Theme', 'Select Board Colours']],
                     ['Timer Settings', ['Timer Settings']],
                     ['Help && Info', ['Help && Info']]]
@@ -21,9 +26,12 @@ STATE_PREGAME = "Pre-Game - Ready!"
 
 # State 2: In-Game. GUI elements for during gameplay
 IN_GAME_MENU_BAR = [['&Menu', ['End Game']],
-                    ['Algorithm Information', ['Algorithm Info.']],
+                    ['Algorithm Information', ['Algorithm Info.', 'Exchange Values']],
                     ['Help && Info', ['Help && Info']]]
 
+TICK_EVENT = '-TICK-'           # Window event that refreshes the clocks
+TICK_MS = 250                   # ms between clock refreshes
+SEARCH_EVENT = '-SEARCH-'       # Window event posted when the search worker sends back a result
 STATE_PLAYER_MOVE = "In-Game - Your Move!"
 STATE_ENGINE_MOVE = "In-Game - Thinking..."
 START_PIECES_NUM = 16
@@ -33,6 +41,7 @@ COLOUR_LIST = ['Green', 'Wood']
 EXACT_SCORE = 0
 LOWER_BOUND_SCORE = 1
 UPPER_BOUND_SCORE = 2
+TT_SIZE_MB = 32                 # Transposition table size in megabytes
 
 # Identifiers for each chess piece
 BLANK = 0
@@ -85,6 +94,7 @@ CLICKED_DARK_COLOUR = '#008148'                 # Colour if dark square clicked
 """game Constants"""
 HIGHLIGHT_LIGHT = '#80DED9'                     # Colour to highlight potential moves - light sq
 HIGHLIGHT_DARK = '#3CCDC6'                      # Colour to highlight potential moves - dark sq
+GAMES_DIR = 'Games'                             # Folder each game is saved to as a PGN file, as it is played
 STARTER_PGN = {'Event': 'Player vs Engine',   # Starting PGN tags
                'White': 'Player',
                'Black': 'Engine'}
@@ -92,6 +102,7 @@ STARTER_PGN = {'Event': 'Player vs Engine',   # Starting PGN tags
 """evaluator Constants"""
 PAWN_SCORE = 100                # Piece value a pawn
 MAX_SCORE = PAWN_SCORE * 100    # Maximum score awarded in static evaluation
+MATE_SCORE = 9999               # Checkmate score in NegaMax, NegaMax & Alpha-Beta and NegaScout
 """Value of each piece: (old vals shown to side)"""
 PIECE_VALUE = [100,             # PAWN:   100
                300,             # KNIGHT: 400
@@ -129,7 +140,8 @@ INFO_STR = 'This software provides four search algorithms to select from, in inc
            'limited searches on moves in the next layer of the tree that involve captures or check-moves.' \
            '\n\nMTD(f): This algorithm enhances the former methods by using new upperbound and lowerbound ' \
            'values to converge on the\ntrue value. It also incorporates transposition tables, that reduce ' \
-           'calculations by providing a mechanism for storing and retrieving\nchess_board states and their evaluations.'
+           'calculations by providing a mechanism for storing and retrieving\nchess_board states and their evaluations.' \
+           ' It shares the Quiescence search with NegaScout.'
 
 HELP_STR_INIT = 'Welcome to ''BeatMyChessAI'', a software designed to allow you to compete against a selection of ' \
               'prolific and powerful search algorithms.' \
@@ -2,6 +2,124 @@ import piece_tables
 import constants
 import chess
 
+try:
+    import numpy as np
+except ImportError:                        # NumPy is optional; frontier scoring falls back to move_delta()
+    np = None
+
+"""Piece-square tables indexed by python-chess piece type (PAWN = 1 ... KING = 6)."""
+PIECE_TABLES = [None,
+                piece_tables.TABLE_PAWN_MAIN,
+                piece_tables.TABLE_KNIGHT_MAIN,
+                piece_tables.TABLE_BISHOP_MAIN,
+                piece_tables.TABLE_ROOK_MAIN,
+                piece_tables.TABLE_QUEEN_MAIN,
+                piece_tables.TABLE_KING_MAIN]
+
+
+def build_piece_square_tables():
+    """
+    Pre-mirror the piece-square tables for black once at import, so evaluation never calls chess.square_mirror.
+    :return: PIECE_SQUARE_TABLES[colour][piece_type][square].
+    """
+    tables = [[None] * 7, [None] * 7]                                 # [BLACK, WHITE] to match chess.COLORS
+    for piece_type in chess.PIECE_TYPES:
+        table = PIECE_TABLES[piece_type]
+        tables[chess.WHITE][piece_type] = list(table)
+        tables[chess.BLACK][piece_type] = [table[chess.square_mirror(sq)] for sq in chess.SQUARES]
+    return tables
+
+
+PIECE_SQUARE_TABLES = build_piece_square_tables()
+
+
+def build_square_scores():
+    """
+    Combine piece values and piece-square tables into a single lookup, scored from white's perspective.
+    :return: SQUARE_SCORES[colour][piece_type][square] (black entries are negated).
+    """
+    square_scores = [[None] * 7, [None] * 7]
+    for colour in chess.COLORS:
+        sign = 1 if colour == chess.WHITE else -1
+        for piece_type in chess.PIECE_TYPES:
+            value = constants.PIECE_VALUE[piece_type - 1]
+            square_scores[colour][piece_type] = [sign * (value + psq)
+                                                 for psq in PIECE_SQUARE_TABLES[colour][piece_type]]
+    return square_scores
+
+
+SQUARE_SCORES = build_square_scores()
+
+
+def build_square_score_array():
+    """
+    Pack SQUARE_SCORES into an int16 array for batched frontier scoring.
+    :return: array indexed by [colour * 7 + piece_type, square]. Rows 0 and 7 (no piece) are zero.
+    """
+    table = np.zeros((14, 64), dtype=np.int16)
+    for colour in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            table[colour * 7 + piece_type] = SQUARE_SCORES[colour][piece_type]
+    return table
+
+
+if np is not None:
+    SQUARE_SCORE_ARRAY = build_square_score_array()
+    PIECE_CODES = np.array([colour * 7 + piece_type for colour in chess.COLORS for piece_type in chess.PIECE_TYPES],
+                           dtype=np.intp)
+
+
+def piece_codes(board):
+    """
+    Unpack the board's twelve piece bitboards into a NumPy array of per-square piece codes.
+    :param board: board state.
+    :return: array of 64 codes (colour * 7 + piece_type, or 0 for an empty square).
+    """
+    bitboards = [board.pieces_mask(piece_type, colour) for colour in chess.COLORS for piece_type in chess.PIECE_TYPES]
+    bits = np.unpackbits(np.array(bitboards, dtype='>u8').view(np.uint8).reshape(12, 8), axis=1)[:, ::-1]
+    return PIECE_CODES @ bits              # Bit i of each row is square i; each square holds at most one piece
+
+
+def score_board(board):
+    """
+    Full material and piece-square score of a board, from white's perspective. Works directly on the board's
+    bitboards: material from popcounts and piece-squares from the pre-mirrored tables.
+    :param board: board state.
+    :return: white-relative score.
+    """
+    score = 0
+    for colour in chess.COLORS:
+        occupied = board.occupied_co[colour]
+        tables = PIECE_SQUARE_TABLES[colour]
+        side = 0
+        for piece_type, bitboard in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights),
+                                     (chess.BISHOP, board.bishops), (chess.ROOK, board.rooks),
+                                     (chess.QUEEN, board.queens), (chess.KING, board.kings)):
+            pieces = bitboard & occupied
+            if pieces:
+                table = tables[piece_type]
+                side += constants.PIECE_VALUE[piece_type - 1] * chess.popcount(pieces)
+                side += sum(table[sq] for sq in chess.scan_forward(pieces))
+        score = score + side if colour == chess.WHITE else score - side
+
+    return score
+
+
+def score_result(board, result):
+    """
+    Score a determined game result from the perspective of the side to move.
+    :param board: board state.
+    :param result: python-chess formatted result (1-0, 0-1, 1/2-1/2).
+    :return: node score.
+    """
+    if result[0] == "1":                  # If entry begins with 1 (player win or draw (1/2-1/2)):
+        evaluation = 0 if result[1] == "/" else constants.MAX_SCORE  # If result is '1/2-1/2', eval. = 0, else MAX
+    else:                                 # If result doesn't begin with 1 (opponent win)
+        evaluation = -constants.MAX_SCORE  # Set evaluation as negative of max_score -(100*100)
+    if not board.turn:                    # If not turn turn:
+        evaluation = -evaluation          # Reverse evaluation
+    return evaluation
+
 
 def evaluator(board, result):
     """
@@ -11,52 +129,142 @@ def evaluator(board, result):
     :return:
     """
     if not result == "*":                 # If entry exists and is determined:
-        if result[0] == "1":              # If entry begins with 1 (player win or draw (1/2-1/2)):
-            evaluation = 0 if result[1] == "/" else constants.MAX_SCORE  # If result is '1/2-1/2', eval. = 0, else MAX
-        else:                             # If result doesn't begin with 1 (opponent win)
-            evaluation = -constants.MAX_SCORE  # Set evaluation as negative of max_score -(100*100)
-        if not board.turn:                # If not turn turn:
-            evaluation = -evaluation      # Reverse evaluation
-        return evaluation
-
-    # Quantity of remaining pieces:
-    wp = len(board.pieces(chess.PAWN, chess.WHITE))
-    bp = len(board.pieces(chess.PAWN, chess.BLACK))
-    wn = len(board.pieces(chess.KNIGHT, chess.WHITE))
-    bn = len(board.pieces(chess.KNIGHT, chess.BLACK))
-    wb = len(board.pieces(chess.BISHOP, chess.WHITE))
-    bb = len(board.pieces(chess.BISHOP, chess.BLACK))
-    wr = len(board.pieces(chess.ROOK, chess.WHITE))
-    br = len(board.pieces(chess.ROOK, chess.BLACK))
-    wq = len(board.pieces(chess.QUEEN, chess.WHITE))
-    bq = len(board.pieces(chess.QUEEN, chess.BLACK))
-
-    material = 100 * (wp - bp) + 300 * (wn - bn) + 330 * (wb - bb) + 550 * (wr - br) + 1000 * (wq - bq)
-
-    pawn_sq = sum([piece_tables.TABLE_PAWN_MAIN[i] for i in board.pieces(chess.PAWN, chess.WHITE)])
-    pawn_sq += sum([-piece_tables.TABLE_PAWN_MAIN[chess.square_mirror(i)]
-                    for i in board.pieces(chess.PAWN, chess.BLACK)])
-    knight_sq = sum([piece_tables.TABLE_KNIGHT_MAIN[i] for i in board.pieces(chess.KNIGHT, chess.WHITE)])
-    knight_sq += sum([-piece_tables.TABLE_KNIGHT_MAIN[chess.square_mirror(i)]
-                      for i in board.pieces(chess.KNIGHT, chess.BLACK)])
-    bishop_sq = sum([piece_tables.TABLE_BISHOP_MAIN[i] for i in board.pieces(chess.BISHOP, chess.WHITE)])
-    bishop_sq += sum([-piece_tables.TABLE_BISHOP_MAIN[chess.square_mirror(i)]
-                      for i in board.pieces(chess.BISHOP, chess.BLACK)])
-    rook_sq = sum([piece_tables.TABLE_ROOK_MAIN[i] for i in board.pieces(chess.ROOK, chess.WHITE)])
-    rook_sq += sum([-piece_tables.TABLE_ROOK_MAIN[chess.square_mirror(i)]
-                    for i in board.pieces(chess.ROOK, chess.BLACK)])
-    queen_sq = sum([piece_tables.TABLE_QUEEN_MAIN[i] for i in board.pieces(chess.QUEEN, chess.WHITE)])
-    queen_sq += sum([-piece_tables.TABLE_QUEEN_MAIN[chess.square_mirror(i)]
-                     for i in board.pieces(chess.QUEEN, chess.BLACK)])
-    king_sq = sum([piece_tables.TABLE_KING_MAIN[i] for i in board.pieces(chess.KING, chess.WHITE)])
-    king_sq += sum([-piece_tables.TABLE_KING_MAIN[chess.square_mirror(i)]
-                    for i in board.pieces(chess.KING, chess.BLACK)])
-
-    evaluation = material + pawn_sq + knight_sq + bishop_sq + rook_sq + queen_sq + king_sq
+        return score_result(board, result)
+
+    evaluation = score_board(board)       # Material and piece-square score from the bitboards
 
     return evaluation if board.turn else -evaluation
 
 
+class IncrementalEvaluator:
+    """
+    Material and piece-square evaluator that is updated on every push/pop rather than rebuilt at each leaf.
+    The search makes and unmakes moves through this object, so a leaf evaluation is a single lookup.
+    """
+    def __init__(self, board):
+        self.board = board
+        self.scores = [score_board(board)]  # White-relative score for each position on the search path
+
+    def move_delta(self, move):
+        """
+        Change in the white-relative score caused by a move, computed before it is pushed.
+        :param move: pseudo-legal move (or null move) for the current board.
+        :return: score delta.
+        """
+        if not move:                                                       # Null move: no pieces change
+            return 0
+
+        board = self.board
+        colour = board.turn
+        own = SQUARE_SCORES[colour]
+        piece_type = board.piece_type_at(move.from_square)
+
+        if piece_type == chess.KING and board.is_castling(move):           # King and rook both relocate
+            rank = 0 if colour == chess.WHITE else 56
+            if board.is_kingside_castling(move):
+                king_to, rook_from, rook_to = chess.G1 + rank, chess.H1 + rank, chess.F1 + rank
+            else:
+                king_to, rook_from, rook_to = chess.C1 + rank, chess.A1 + rank, chess.D1 + rank
+            return (own[chess.KING][king_to] - own[chess.KING][move.from_square] +
+                    own[chess.ROOK][rook_to] - own[chess.ROOK][rook_from])
+
+        delta = own[move.promotion or piece_type][move.to_square] - own[piece_type][move.from_square]
+
+        if move.to_square == board.ep_square and piece_type == chess.PAWN:  # Captured pawn is behind the target
+            captured_sq = move.to_square - 8 if colour == chess.WHITE else move.to_square + 8
+            delta -= SQUARE_SCORES[not colour][chess.PAWN][captured_sq]
+        else:
+            captured_type = board.piece_type_at(move.to_square)
+            if captured_type:
+                delta -= SQUARE_SCORES[not colour][captured_type][move.to_square]
+
+        return delta
+
+    def batch_deltas(self, moves):
+        """
+        Vectorised move_delta() for every move in the list, gathered from SQUARE_SCORE_ARRAY in one pass.
+        :param moves: non-empty list of legal moves for the current board.
+        :return: list of score deltas.
+        """
+        board = self.board
+        own, their = board.turn * 7, (not board.turn) * 7
+        table = SQUARE_SCORE_ARRAY
+        codes = piece_codes(board)
+        count = len(moves)
+        from_sq = np.fromiter((move.from_square for move in moves), dtype=np.intp, count=count)
+        to_sq = np.fromiter((move.to_square for move in moves), dtype=np.intp, count=count)
+        promotion = np.fromiter((move.promotion or 0 for move in moves), dtype=np.intp, count=count)
+
+        moved = codes[from_sq]
+        new = np.where(promotion > 0, own + promotion, moved)
+        deltas = table[new, to_sq] - table[moved, from_sq] - table[codes[to_sq], to_sq]
+
+        castling = ((moved == own + chess.KING) & (np.abs(to_sq - from_sq) == 2)).nonzero()
+        if castling[0].size:                                               # Rook jumps over the king as well
+            king_from, kingside = from_sq[castling], to_sq[castling] > from_sq[castling]
+            rook_from = np.where(kingside, king_from + 3, king_from - 4)
+            rook_to = np.where(kingside, king_from + 1, king_from - 1)
+            deltas[castling] += table[own + chess.ROOK, rook_to] - table[own + chess.ROOK, rook_from]
+
+        if board.ep_square is not None:                                    # Captured pawn is behind the target sq
+            en_passant = (moved == own + chess.PAWN) & (to_sq == board.ep_square)
+            captured_sq = board.ep_square - 8 if board.turn == chess.WHITE else board.ep_square + 8
+            deltas[en_passant] -= table[their + chess.PAWN, captured_sq]
+
+        return deltas.tolist()
+
+    def frontier_scores(self, moves):
+        """
+        Static scores for every child of a frontier node, without pushing any of them.
+        :param moves: list of legal moves from the current position.
+        :return: list of child scores, each relative to the side to move in that child.
+        """
+        if np is not None and moves:
+            deltas = self.batch_deltas(moves)
+        else:
+            deltas = [self.move_delta(move) for move in moves]
+
+        score = self.scores[-1]
+        if self.board.turn == chess.WHITE:                                 # Children have black to move
+            return [-(score + delta) for delta in deltas]
+        return [score + delta for delta in deltas]
+
+    def push(self, move):
+        """
+        Make a move on the board and update the score.
+        :param move: move to make.
+        """
+        self.scores.append(self.scores[-1] + self.move_delta(move))
+        self.board.push(move)
+
+    def pop(self):
+        """
+        Unmake the last move and restore the previous score.
+        :return: the move that was unmade.
+        """
+        self.scores.pop()
+        return self.board.pop()
+
+    def unwind(self, ply):
+        """
+        Unmake moves until the board is back at the given move stack length, such as after an aborted search.
+        :param ply: move stack length to return to.
+        """
+        while len(self.board.move_stack) > ply:
+            self.pop()
+
+    def evaluate(self, result="*"):
+        """
+        Evaluate the current position. Gives the same scores as evaluator() without scanning the board.
+        :param result: python-chess formatted result, if the position is already determined.
+        :return: node score, relative to the side to move.
+        """
+        if not result == "*":
+            return score_result(self.board, result)
+        score = self.scores[-1]
+        return score if self.board.turn else -score
+
+
 """
 Gaikwad, A. (2020). Let’s create a Chess AI. [ONLINE] Medium.
 Available at: https://medium.com/dscvitpune/lets-create-a-chess-ai-8542a12afef. [Accessed 25 May. 2021].
@@ -1,17 +1,12 @@
 import PySimpleGUI as sg
-import os
 import chess
-import chess.pgn
 import chess.engine
 import chess.polyglot  # Polyglot is based on NumPy for speed
-import logging
 import gui
 import timer
 import book
-import negamax
-import negascout
-import negamaxab
-import mtdf
+import game_record
+import search_worker
 import moves
 import constants
 
@@ -43,28 +38,35 @@ def update_move_counters(counter_player, counter_engine, window, is_player):
     :param window: Application window.
     """
     if is_player:
-        elapse_hum = timer.get_timer(counter_player.elapsed)  # Get elapsed time for player
+        elapse_hum = timer.get_timer(counter_player.read())  # Get elapsed time for player
         window['el_player_time_counter'](elapse_hum)  # Update GUI with new player time
     else:
-        elapse_eng = timer.get_timer(counter_engine.elapsed)  # Get elapsed time for engine
+        elapse_eng = timer.get_timer(counter_engine.read())  # Get elapsed time for engine
         window['el_engine_time_counter'](elapse_eng)  # Update GUI with new engine time
 
 
 class Game:
     def __init__(self, board, window, is_player_white, open_book, alg, game_board, depth, timer_state, dark_sq,
-                 light_sq):
+                 light_sq, ponder_state=False, threads=1, profile_mode='Off', null_move_state=True, lmr_state=True):
         self.chess_board = board
         self.board_array = game_board
         self.window = window
         self.is_player_white = is_player_white
         self.opening_book = open_book
         self.algorithm = alg
-        self.moves_per_side = 0
         self.depth = depth
         self.is_timer_on = timer_state
+        self.is_ponder_on = ponder_state
+        self.threads = threads
+        self.profile_mode = profile_mode
+        self.is_null_move_on = null_move_state
+        self.is_lmr_on = lmr_state
         self.dark_sq = dark_sq
         self.light_sq = light_sq
-        self.node, self.game, self.timer_total = None, None, None
+        self.record, self.timer_total = None, None          # game_record.GameRecord, for the current game
+        self.search_worker = None
+        self.renderer = gui.BoardRenderer(window, game_board, dark_sq, light_sq)  # Draws the board after each move
+        self.book = None                                    # book.BookController, for the current game
         self.piece_left_player, self.piece_left_engine = 16, 16
 
     def setup_game(self):
@@ -73,73 +75,50 @@ class Game:
         :return:
         """
         self.timer_total = timer.Timer()  # Reset main timer
-        self.game = chess.pgn.Game()  # Set/Reset pgn game
-        self.node = None  # Set/Reset node to None
-        self.moves_per_side = 0
-        self.game.headers['White'] = constants.STARTER_PGN['White']
-        self.game.headers['Black'] = constants.STARTER_PGN['Black']
-        self.game.headers['Event'] = constants.STARTER_PGN['Event']
+        self.timer_total.start()
+        self.book = book.BookController(self.opening_book)  # Book is mapped once per process, probed until left
+        self.search_worker = search_worker.SearchWorker(self.algorithm, self.depth,  # Background engine search
+                                                        self.is_ponder_on, self.threads, self.profile_mode,
+                                                        self.post_search_event, self.is_null_move_on,
+                                                        self.is_lmr_on)
+        headers = dict(constants.STARTER_PGN)
         if self.is_player_white:  # Check if the turn is white or in pre-game state
-            self.game.headers['White'] = 'Player'    # Set PGN headers
-            self.game.headers['Black'] = 'Computer'  # Set PGN headers
-        else:                                        # Else, if turn is black:
-            self.game.headers['White'] = 'Computer'
-            self.game.headers['Black'] = 'Player'    # Swap the PGN headers
+            headers['White'] = 'Player'    # Set PGN headers
+            headers['Black'] = 'Computer'  # Set PGN headers
+        else:                              # Else, if turn is black:
+            headers['White'] = 'Computer'
+            headers['Black'] = 'Player'    # Swap the PGN headers
+        self.record = game_record.GameRecord(self.chess_board, headers, game_record.new_pgn_path())  # Set/Reset game
 
     def update_game(self, window, move_count, move, elapse_str, origin_sq, new_sq, user):
         """
         update search nodes and GUI after each move.
         """
-        if move_count == 1:                                        # Update game nodes:
-            self.node = self.game.add_variation(move)
-        else:
-            self.node = self.node.add_variation(move)
+        self.record.add_move(move)                                 # Record move, saving it to the PGN file
         self.update_gui_elements(window, user, elapse_str)         # Update GUI elements
-        gui.change_sq_colour(window, origin_sq)                    # Update original square colour
-        gui.change_sq_colour(window, new_sq)                       # Update new sq colour
+        self.renderer.colour_square(origin_sq, constants.CLICKED_DARK_COLOUR,  # Show the move made
+                                    constants.CLICKED_LIGHT_COLOUR)
+        self.renderer.colour_square(new_sq, constants.CLICKED_DARK_COLOUR, constants.CLICKED_LIGHT_COLOUR)
+
+    def post_search_event(self):
+        """
+        Wake the game loop when the search worker sends back a result. Called from the worker's listener thread.
+        """
+        self.window.write_event_value(constants.SEARCH_EVENT, None)
 
     def update_total_time(self, window):
-        elapse_str = timer.get_timer(self.timer_total.elapsed)      # Get timer
+        elapse_str = timer.get_timer(self.timer_total.read())       # Get timer
         window['el_total_time'](elapse_str)                        # Update GUI
-        self.timer_total.elapsed += 100                             # Elapse timer
 
-    def get_output_string(self, colour, game_moves, move_time):
+    def get_ponder_string(self):
         """
-        Format string for GUI move-history element output. Move type extrapolated from game_moves chess notation.
-        :param colour: Which colour turn it is
-        :param game_moves: Array of current game move history
-        :param move_time: Time taken per move.
+        Format string for the GUI ponder element: hits, hit rate and the search time gained on hits.
         :return: Formatted string for output to GUI
         """
-        result = ''
-        for game_move in game_moves:                                   # Loop through each move in game_moves list
-            move_types = {'#': 'Checkmate!', '+': 'In-Check!',         # Create dict. match keys to move types
-                          '-': 'Castling', 'x': 'Capture', '=': 'Promotion'}
-            move_type = 'Normal Move'                                  # Set type to Normal Move as default
-            for m_type in move_types:                         # Loop through keys in dict to check if in game_move
-                if m_type in game_move:                                # If key is present:
-                    move_type = move_types[m_type]                     # Set move type
-
-            # Get piece name
-            piece_types = {'R': 'Rook', 'N': 'Knight', 'B': 'Bishop',  # Create dict to match keys to piece names
-                           'Q': 'Queen', 'K': 'King', 'O': 'King'}     # ("'O': King" represents Castling)
-            if game_move[0] in piece_types:                            # Check first char of move for piece key
-                piece = piece_types[game_move[0]]                      # If present, set piece
-            else:
-                piece = 'Pawn'                                         # If no letter present, set as pawn move
-
-            move_str = str(game_move[-2:]) if '+' not in game_move else str(game_move[-3:-1])  # Get move as string
-            piece = piece + ':' + (' ' * (7 - len(piece))) + move_str + '  | '
-            space_one = ' ' * (6 - len(game_move)) + '| '              # Set spacing by text length
-            space_two = ' ' * (12 - len(move_type))
-            counter = str(self.moves_per_side)
-            num_align = ' 0' if self.moves_per_side < 10 else ' '
-
-            new_move_arr = colour + num_align + counter + ': ' + game_move + space_one + piece + move_type + space_two \
-                           + '  | ' + move_time + '   | \n'
-            result = ''.join(new_move_arr)
-
-        return result
+        worker = self.search_worker
+        total = worker.ponder_hits + worker.ponder_misses
+        saved = timer.get_timer(worker.ponder_time_saved * 1000)
+        return 'Hits: {}/{} ({:.0%}) | Saved: {}'.format(worker.ponder_hits, total, worker.ponder_hit_rate(), saved)
 
     def update_gui_elements(self, window, turn, move_time):
         """
@@ -148,24 +127,13 @@ class Game:
         :param turn: Engine or Player turn
         :param move_time: duration of move
         """
-        variation_str = str(self.game.variations[0])  # Get game moves as string
-        game_moves = variation_str.split()            # Split the string into components
-
-        if turn == 'player' and self.is_player_white:
-            colour = 'White'
-            self.moves_per_side += 1                  # As white starts, +1 to counter if white move
-        elif turn == 'engine' and not self.is_player_white:
-            colour = 'White'
-            self.moves_per_side += 1
-        else:
-            colour = 'Black'
+        record = self.record.moves[-1]                # Move just recorded
 
         # Update 'Move History' Element
-        result = self.get_output_string(colour, game_moves, move_time)
-        window['el_move_history'](result, append=True)
+        window['el_move_history'](record.history_line(move_time), append=True)
 
         # Update 'Remaining Pieces' Elements
-        if 'x' in game_moves[-1]:
+        if record.is_capture:
             if turn == 'player':
                 self.piece_left_player -= 1
             elif turn == 'engine':
@@ -198,56 +166,16 @@ class Game:
             return
 
         for sq in move_list:                                                # Loop each square in move_list
-            new_elem = window.FindElement(key=sq)                           # Get current square element
             curr_sq = self.board_array[sq[0]][sq[1]]                         # Get current square in x/y
             if curr_sq not in piece_array:                                  # Check array for own pieces
-                colour = gui.update_board_colours(sq[0], sq[1], constants.HIGHLIGHT_DARK,
-                                                  constants.HIGHLIGHT_LIGHT)  # Get colour
-                new_elem.Update(button_color=('black', colour))             # Update colour of button
+                self.renderer.colour_square(sq, constants.HIGHLIGHT_DARK, constants.HIGHLIGHT_LIGHT)
 
-    def move_castling(self, window, current_move, turn):
-        """
-        Implements front-end Castling.
-        :param window: app window.
-        :param current_move: move made.
-        :param turn: Engine or Player turn.
+    def move_handler(self, board, move):
         """
-        is_white = True if self.is_player_white and turn == 'player' else False
-        if current_move == 'e1g1' or current_move == 'e1h1':                                # Player King-side
-            self.board_array[7][7] = constants.BLANK                                         # Clear Rook
-            self.board_array[7][4] = constants.BLANK                                         # Clear King
-            self.board_array[7][5] = constants.ROOK_W if is_white else constants.ROOK_B      # Set Rook
-            self.board_array[7][6] = constants.KING_W if is_white else constants.KING_B      # Set King
-        elif current_move == 'e1a1' or current_move == 'e1c1':                              # Player Queen-side
-            self.board_array[7][0] = constants.BLANK                                         # Clear Rook
-            self.board_array[7][4] = constants.BLANK                                         # Clear King
-            self.board_array[7][3] = constants.ROOK_W if is_white else constants.ROOK_B      # Set Rook
-            self.board_array[7][2] = constants.KING_W if is_white else constants.KING_B      # Set King
-        elif current_move == 'e8g8' or current_move == 'e8h8':                              # Engine King-side
-            self.board_array[0][7] = constants.BLANK                                         # Clear Rook
-            self.board_array[0][4] = constants.BLANK                                         # Clear King
-            self.board_array[0][5] = constants.ROOK_B if is_white else constants.ROOK_B      # Set Rook
-            self.board_array[0][6] = constants.KING_W if is_white else constants.KING_B      # Set King
-        elif current_move == 'e8a8' or current_move == 'e8c8':                              # Engine Queen-side
-            self.board_array[0][0] = constants.BLANK                                         # Clear Rook
-            self.board_array[0][4] = constants.BLANK                                         # Clear King
-            self.board_array[0][3] = constants.ROOK_W if is_white else constants.ROOK_B      # Set Rook
-            self.board_array[0][2] = constants.KING_W if is_white else constants.KING_B      # Set King
-        gui.update_board(window, self.dark_sq, self.light_sq, self.board_array)              # Draw Changes
-
-    def move_handler(self, window, board, player, move, original_sq, new_sq, current_piece):
+        Make a move for either competitor and redraw the squares it changed.
         """
-        Handles the move for each competitor and acts accordingly.
-        """
-        if board.is_castling(move):                                              # Check if move is Castling
-            move_str = str(move)
-            self.move_castling(window, move_str, player)                         # Call function to implement Castling
-        else:                                                                    # Else if normal move:
-            self.board_array[original_sq[0]][original_sq[1]] = constants.BLANK   # Clear original square [row,col]
-            self.board_array[new_sq[0]][new_sq[1]] = current_piece               # Update new square [row, col]
-
-        gui.update_board(window, self.dark_sq, self.light_sq, self.board_array)
         board.push(move)
+        self.renderer.render(board)                  # Castling, en passant and promotion included
 
     def player_move(self, window, board, move_count, timer_player, timer_engine):
         """
@@ -262,14 +190,16 @@ class Game:
         window['el_game_state'](constants.STATE_PLAYER_MOVE)               # Update GUI 'game-state' text
         original_sq, new_sq = None, None
         is_exit_game, has_user_moved, is_human_turn = False, False, True
+        timer_player.start()                                                # Start the player's clock
 
         while is_human_turn:                                                # Loop until turn has moved
-            button, value = window.Read(timeout=100)                        # Read any window input
-            update_move_counters(timer_player, timer_engine, window, True)  # Update move timers
-            self.update_total_time(window)                                  # Update total timer
-            timer_player.elapsed += 100
+            button, value = window.Read()                                   # Wait for input or a clock tick
+            if button == constants.TICK_EVENT:
+                update_move_counters(timer_player, timer_engine, window, True)  # Update move timers
+                self.update_total_time(window)                                  # Update total timer
+                continue
             is_exit_game = gui.check_for_end(window, button, value)         # Check if turn ends game / 'X'
-            gui.check_ingame_buttons(button)
+            gui.check_ingame_buttons(button, board)
             if is_exit_game:                                                # Game ended, return to pre-game state
                 break
 
@@ -277,7 +207,8 @@ class Game:
                 if not has_user_moved:
                     original_sq = button                                              # Get the clicked button
                     current_piece = self.board_array[original_sq[0]][original_sq[1]]  # Get original board square num
-                    gui.change_sq_colour(window, original_sq)                         # Change original square colour
+                    self.renderer.colour_square(original_sq, constants.CLICKED_DARK_COLOUR,  # Change original
+                                                constants.CLICKED_LIGHT_COLOUR)              # square colour
                     self.highlight_possible_moves(window, current_piece, original_sq)  # Highlight moves
                     has_user_moved = True
 
@@ -285,11 +216,9 @@ class Game:
                     origin_row, origin_col = original_sq  # Get original-sq row and col
                     new_sq = button
                     new_row, new_col = new_sq
-                    button_element = window.FindElement(key=(origin_row, origin_col))
 
                     if new_sq == original_sq:  # If button is double-clicked:
-                        gui.reset_clicked_sq(original_sq, button_element, self.light_sq, self.dark_sq)
-                        gui.update_board(window, self.dark_sq, self.light_sq, self.board_array)
+                        self.renderer.reset_colours()  # Clear clicked square and highlighted moves
                         has_user_moved = False  # Undo 'turn move' status
                         continue
 
@@ -297,12 +226,14 @@ class Game:
                     origin_square = chess.square(origin_col, 7 - origin_row)  # Make python-chess format move
                     new_square = chess.square(new_col, 7 - new_row)
                     player_move = chess.Move(origin_square, new_square)
+                    if chess.Move(origin_square, new_square, chess.QUEEN) in board.legal_moves:
+                        player_move = chess.Move(origin_square, new_square, chess.QUEEN)  # Pawns promote to queens
 
                     if player_move in board.legal_moves:                      # Check if turn move is legal
-                        self.move_handler(window, board, 'player', player_move, original_sq, new_sq, current_piece)
+                        self.move_handler(board, player_move)
 
                         # Update Timers
-                        elapse_str = timer.get_timer(timer_player.elapsed)
+                        elapse_str = timer.get_timer(timer_player.read())
                         gui.update_move_timer(window, 'player', timer_player, elapse_str)  # Reset move counter
                         if self.is_timer_on:
                             elapsed_time = timer.get_timer(timer_player.base)  # Get timer
@@ -315,8 +246,7 @@ class Game:
 
                     else:                                                       # If move is illegal:
                         has_user_moved = False                                  # Undo 'move completed' variable
-                        gui.reset_clicked_sq(original_sq, button_element, self.light_sq, self.dark_sq)
-                        gui.update_board(window, self.dark_sq, self.light_sq, self.board_array)
+                        self.renderer.reset_colours()                           # Clear clicked and highlighted
                         continue
 
         return is_human_turn, move_count, is_exit_game
@@ -334,39 +264,38 @@ class Game:
         window['el_game_state'](constants.STATE_ENGINE_MOVE)                     # Update GUI game-state text
         is_exit_game = False
         engine_move = None
+        is_book_move = False
+        timer_engine.start()                                                     # Start the engine's clock
 
         # Engine turn. Get initial moves from Opening Book to initiate different strategies.
         if move_count <= 7:
-            if os.path.isfile(self.opening_book):                                   # If the path to the book exists
-                opening_book = book.BookController(self.opening_book, board)        # Initiate opening book
-                engine_move = opening_book.get_book_move()                          # Get the optimal move from the book
-            else:                                                                   # If the book doesn't exist
-                logging.warning('GUI book is missing.')                             # Log missing book as warning
+            engine_move = self.book.get_book_move(board)                            # None once out of book
+            is_book_move = engine_move is not None
+            if is_book_move:
+                window['el_search_stats']('Book move: {}'.format(engine_move))       # No search statistics
 
         if engine_move is None:                                                     # Run engine if book has no move
-            if self.algorithm == 'NegaMax':
-                engine_search = negamax.NegamaxEngine(board, self.depth)            # Get engine object
-            elif self.algorithm == 'NegaMax & Alpha-Beta':
-                engine_search = negamaxab.NegamaxAbEngine(board, self.depth)
-            elif self.algorithm == 'NegaScout & Quiesce':
-                engine_search = negascout.NegaScoutEngine(board, self.depth)
-            else:                                                                   # Else use MTD(f)
-                engine_search = mtdf.MTDfEngine(board, self.depth)
-
-            while engine_move is None and not is_exit_game:                              # Loop until engine finds move
-                button, value = window.Read(timeout=100)
-                update_move_counters(timer_player, timer_engine, window, False)          # Update move timers
-                self.update_total_time(window)                                           # Update total timer
-                timer_engine.elapsed += 100                                               # Elapse timer
+            budget = timer_engine.move_budget(board.fullmove_number) if self.is_timer_on else None  # ms, or no limit
+            self.search_worker.search(board, budget)                                # Search in the worker process
+            if self.is_ponder_on:
+                window['el_ponder'](self.get_ponder_string())                       # Update ponder hit rate
+
+            while not is_exit_game:                                                      # Loop until engine finds move
+                if self.search_worker.poll():                                            # Search finished
+                    engine_move = self.search_worker.best_move                           # (a ponder hit may already
+                    window['el_search_stats'](self.search_worker.search_result.summary())  # have), show stats
+                    break
+                button, value = window.Read()                           # Wait for a result, input or a clock tick
+                if button == constants.TICK_EVENT:
+                    update_move_counters(timer_player, timer_engine, window, False)      # Update move timers
+                    self.update_total_time(window)                                       # Update total timer
                 is_exit_game = gui.check_for_end(window, button, value)           # Check for app or game exit
 
-                if self.algorithm != 'MTD(f) - Main':
-                    engine_move = engine_search.search_controller()                      # Get move from engine
-                else:
-                    engine_move = engine_search.search_controller(board)                 # Get move from MTF(f) engine
+            if is_exit_game:                                                             # Game ended mid-search
+                self.search_worker.cancel()
 
         if engine_move is None:                                                          # If no legal move (Null-Move):
-            return                                                                       # Return to human turn
+            return False, move_count, is_exit_game                                       # Return to human turn
 
         # Update chess_board with engine move
         move_string = str(engine_move)                             # Get engine move as a string
@@ -377,11 +306,10 @@ class Game:
 
         new_sq = new_row, new_col
         original_sq = origin_row, origin_col                                        # Get location as x/y format
-        current_piece = self.board_array[origin_row][origin_col]                    # Get location
 
-        self.move_handler(window, board, 'engine', engine_move, original_sq, new_sq, current_piece)
+        self.move_handler(board, engine_move)
 
-        elapse_str = timer.get_timer(timer_player.elapsed)
+        elapse_str = timer.get_timer(timer_engine.read())
         gui.update_move_timer(window, 'engine', timer_engine, elapse_str)           # Reset engine move counter
         if self.is_timer_on:
             elapsed_time = timer.get_timer(timer_engine.base)                       # Get timer
@@ -389,6 +317,8 @@ class Game:
 
         move_count += 1
         self.update_game(window, move_count, engine_move, elapse_str, original_sq, new_sq, 'engine')
+        if self.is_ponder_on and not is_book_move:                              # Book moves have no predicted reply
+            self.search_worker.ponder(board)                                    # Think on the player's time
 
         return True, move_count, is_exit_game
 
@@ -403,6 +333,8 @@ class Game:
         timer_engine = timer.Timer()
         is_human_turn = True if self.is_player_white else False
         self.setup_game()
+        ticker = gui.Ticker(self.window)                 # Clock refresh events while the game is on
+        ticker.start()
 
         # Game loop
         while not self.chess_board.is_game_over(claim_draw=True) and not is_exit_game:
@@ -413,6 +345,11 @@ class Game:
                 is_human_turn, move_count, is_exit_game = self.engine_move(self.window, self.chess_board, move_count,
                                                                            timer_player, timer_engine)
 
+        ticker.stop()
+        self.search_worker.close()
+        self.record.finish(self.chess_board.result(claim_draw=True) if self.chess_board.is_game_over(claim_draw=True)
+                           else '*')                                        # Save the final PGN
+
         # Final Scoreboard
         if self.chess_board.is_game_over(claim_draw=True):
             if self.is_player_white:
@@ -0,0 +1,158 @@
+import datetime
+import os
+import chess
+import chess.pgn
+import constants
+
+"""
+Incremental record of a game. Each move's SAN and move type are worked out once, when the move is made, and the
+move-history line and PGN movetext are appended from them, so recording a move costs the same at move 100 as at
+move 1. The PgnWriter streams the game to disk as it is played.
+"""
+
+MOVE_TYPES = {'#': 'Checkmate!', '+': 'In-Check!',        # SAN symbol -> move type; later symbols take priority
+              '-': 'Castling', 'x': 'Capture', '=': 'Promotion'}
+PIECE_NAMES = {'R': 'Rook', 'N': 'Knight', 'B': 'Bishop',  # First SAN character -> piece name
+               'Q': 'Queen', 'K': 'King', 'O': 'King'}     # ("'O': King" represents Castling)
+PGN_LINE_LENGTH = 79                                       # Movetext lines are wrapped before this many characters
+
+
+def new_pgn_path(directory=constants.GAMES_DIR):
+    """
+    :param directory: folder for saved games.
+    :return: path for a new game's PGN file, named by the date and time.
+    """
+    return os.path.join(directory, datetime.datetime.now().strftime('%Y%m%d_%H%M%S') + '.pgn')
+
+
+class MoveRecord:
+    def __init__(self, board, move):
+        """
+        Classify a move, before it is made.
+        :param board: board state before the move.
+        :param move: move to record.
+        """
+        self.move = move
+        self.san = board.san(move)
+        self.number = board.fullmove_number
+        self.colour = 'White' if board.turn == chess.WHITE else 'Black'
+        self.is_capture = board.is_capture(move)
+        self.move_type = 'Normal Move'
+        for symbol, move_type in MOVE_TYPES.items():
+            if symbol in self.san:
+                self.move_type = move_type
+        self.piece = PIECE_NAMES.get(self.san[0], 'Pawn')
+
+    def history_line(self, move_time):
+        """
+        Format string for GUI move-history element output.
+        :param move_time: Time taken for the move.
+        :return: one line, e.g. 'White 01: e4    | Pawn:   e4  | Normal Move   | 00m:03s   | '.
+        """
+        piece = self.piece + ':' + (' ' * (7 - len(self.piece))) + chess.square_name(self.move.to_square) + '  | '
+        num_align = ' 0' if self.number < 10 else ' '
+        return self.colour + num_align + str(self.number) + ': ' + self.san + ' ' * (6 - len(self.san)) + '| ' \
+            + piece + self.move_type + ' ' * (12 - len(self.move_type)) + '  | ' + move_time + '   | \n'
+
+    def movetext(self, is_first):
+        """
+        :param is_first: True for the first move of the game (a black first move needs its number).
+        :return: PGN movetext token(s) for the move, e.g. '12. Nf3' or 'Nc6'.
+        """
+        if self.colour == 'White':
+            return '{}. {}'.format(self.number, self.san)
+        return '{}... {}'.format(self.number, self.san) if is_first else self.san
+
+
+class PgnWriter:
+    def __init__(self, path, headers):
+        """
+        Start a PGN file: the headers are written straight away and each move is appended as it is played.
+        :param path: PGN file path.
+        :param headers: PGN headers (the Result is only known at the end, and is rewritten then).
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'w', encoding='utf-8')
+        for name, value in headers.items():
+            self.file.write('[{} "{}"]\n'.format(name, value))
+        self.file.write('\n')
+        self.line_length = 0
+        self.file.flush()
+
+    def write(self, token):
+        """
+        Append movetext, wrapping lines, and flush so the file is complete up to the last move.
+        :param token: movetext token, e.g. '12. Nf3'.
+        """
+        if self.line_length and self.line_length + 1 + len(token) > PGN_LINE_LENGTH:
+            self.file.write('\n')
+            self.line_length = 0
+        elif self.line_length:
+            self.file.write(' ')
+            self.line_length += 1
+        self.file.write(token)
+        self.line_length += len(token)
+        self.file.flush()
+
+    def close(self, game=None):
+        """
+        Finish the file.
+        :param game: finished chess.pgn.Game, to rewrite the file once with its final Result header; None to end
+                     the movetext with the result already in the headers.
+        """
+        if game is None:
+            self.write('*')
+            self.file.write('\n\n')
+            self.file.close()
+            return
+        self.file.close()
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as pgn:
+            pgn.write(str(game) + '\n\n')
+        os.replace(temp_path, self.path)                # Never leaves a half-written file
+
+
+class GameRecord:
+    def __init__(self, board, headers, pgn_file=None):
+        """
+        Record of one game: a chess.pgn game tree, the MoveRecord of each move and an optional PGN stream.
+        :param board: starting position.
+        :param headers: PGN headers.
+        :param pgn_file: path to stream the game to, or None.
+        """
+        self.board = board.copy(stack=False)           # Own copy, so each SAN is worked out before its move
+        self.game = chess.pgn.Game()
+        self.game.headers.update(headers)
+        self.game.headers['Date'] = datetime.date.today().strftime('%Y.%m.%d')
+        if board.fen() != chess.STARTING_FEN:
+            self.game.setup(board)
+        self.node = self.game
+        self.moves = []
+        self.writer = PgnWriter(pgn_file, self.game.headers) if pgn_file else None
+
+    def add_move(self, move):
+        """
+        Record a move.
+        :param move: move played, legal in the current position.
+        :return: MoveRecord of the move.
+        """
+        record = MoveRecord(self.board, move)
+        self.board.push(move)
+        self.node = self.node.add_variation(move)
+        if self.writer:
+            self.writer.write(record.movetext(len(self.moves) == 0))
+        self.moves.append(record)
+        return record
+
+    def finish(self, result='*'):
+        """
+        End the record.
+        :param result: game result, '*' if the game was abandoned.
+        """
+        self.game.headers['Result'] = result
+        if self.writer:
+            self.writer.close(self.game if result != '*' else None)
+            self.writer = None
@@ -1,11 +1,14 @@
 import PySimpleGUI as sg
 import sys
+import threading
 import chess
 import chess.pgn
 import chess.engine
 import chess.polyglot                                      # Polyglot is based on NumPy for speed
 import logging
 import game
+import profiler
+import see
 import concretegui
 import constants
 
@@ -24,6 +27,8 @@ def clear_elements(window):
     window['el_game_state'](constants.STATE_PREGAME)        # Reset game-state text
     window['el_player_pieces'](constants.START_PIECES_NUM)  # Reset player start pieces
     window['el_engine_pieces'](constants.START_PIECES_NUM)  # Reset engine start pieces
+    window['el_ponder']('')                                 # Clear ponder hit rate
+    window['el_search_stats']('')                           # Clear search statistics
 
 
 def check_for_end(window, button, value):
@@ -47,10 +52,11 @@ def check_for_end(window, button, value):
     return is_exit_game                             # Return True if turn resigns. False if no exit requested.
 
 
-def check_ingame_buttons(button):
+def check_ingame_buttons(button, board=None):
     """
     Check for in-game button clicks.
     :param button: button clicked.
+    :param board: chess board, for the exchange values view.
     """
     if button == 'Algorithm Info.':
         sg.Window('Search Algorithms',
@@ -58,6 +64,12 @@ def check_ingame_buttons(button):
                    [sg.Ok()]],
                   size=(980, 670), finalize=True, font=('Helvetica', 12),
                   icon=constants.LOGO).read(close=True)
+    if button == 'Exchange Values' and board is not None:       # Static exchange evaluation of every capture
+        side = 'White' if board.turn == chess.WHITE else 'Black'
+        sg.Popup('Captures for {} (material won, in centipawns, if both sides keep\n'
+                 'recapturing with their least valuable piece while it pays):\n\n{}'
+                 .format(side, see.format_exchanges(board)),
+                 title='Exchange Values', font=('Courier', 12), icon=constants.LOGO)
     if button == 'Help & Info':
         sg.Popup(constants.HELP_STR_INGAME, title='Help and Information', font=('Helvetica', 12), icon=constants.LOGO)
 
@@ -70,6 +82,35 @@ def update_move_timer(window, name, counter, elapse_str):
         window['el_engine_time_counter'](elapse_str)
 
 
+class Ticker:
+    """
+    Posts constants.TICK_EVENT to the window at a fixed interval from a background thread. The one event refreshes
+    every clock display, so the game loop can block on window.Read() between events.
+    """
+    def __init__(self, window, interval=constants.TICK_MS):
+        """
+        :param window: app window.
+        :param interval: ms between ticks.
+        """
+        self.window = window
+        self.interval = interval / 1000
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.tick, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def tick(self):
+        while not self.stop_event.wait(self.interval):
+            self.window.write_event_value(constants.TICK_EVENT, None)
+
+
 def update_board_colours(x, y, dark, light):
     """
     Determines the required colour.
@@ -87,24 +128,27 @@ def update_board_colours(x, y, dark, light):
     return colour
 
 
-def change_sq_colour(window, sq):                           # change colour of squares on-click
-    row, col = sq[0], sq[1]
-    square = window.FindElement(key=(row, col))
-    colour = update_board_colours(row, col, constants.CLICKED_DARK_COLOUR, constants.CLICKED_LIGHT_COLOUR)
-    square.Update(button_color=('black', colour))
+PIECE_IDS = {'P': constants.PAWN_W, 'N': constants.KNIGHT_W, 'B': constants.BISHOP_W,    # python-chess symbol
+             'R': constants.ROOK_W, 'Q': constants.QUEEN_W, 'K': constants.KING_W,      # -> piece identifier
+             'p': constants.PAWN_B, 'n': constants.KNIGHT_B, 'b': constants.BISHOP_B,
+             'r': constants.ROOK_B, 'q': constants.QUEEN_B, 'k': constants.KING_B}
+piece_image_data = {}                                       # Piece identifier -> PNG bytes, read once
 
 
-def reset_clicked_sq(move_from, button_square, light, dark):
-    if (move_from[0] + move_from[1]) % 2:
-        colour = dark
-    else:
-        colour = light
-    button_square.Update(button_color=('black', colour))
+def piece_image(piece):
+    """
+    :param piece: piece identifier from constants.
+    :return: the piece's image as PNG bytes, read from Images/ on first use only.
+    """
+    if piece not in piece_image_data:
+        with open(constants.PIECE_IMAGES[piece], 'rb') as image:
+            piece_image_data[piece] = image.read()
+    return piece_image_data[piece]
 
 
 def update_board(window, dark, light, game_board):
     """
-    Update board with alterations.
+    Redraw every square of the board (after a colour change or a new window).
     :param window: app window.
     :param dark: dark square colour.
     :param light: light square colour.
@@ -113,9 +157,64 @@ def update_board(window, dark, light, game_board):
     for x in range(8):
         for y in range(8):
             colour = update_board_colours(x, y, dark, light)
-            img = constants.PIECE_IMAGES[game_board[x][y]]
             element = window.FindElement(key=(x, y))
-            element.Update(button_color=('black', colour), image_filename=img)
+            element.Update(button_color=('black', colour), image_data=piece_image(game_board[x][y]))
+
+
+class BoardRenderer:
+    """
+    Draws the game's chess.Board on the window's square buttons. Only squares whose piece changed since the last
+    draw, or that were coloured (clicked, highlighted or last move), are updated.
+    """
+    def __init__(self, window, game_board, dark, light):
+        """
+        :param window: app window.
+        :param game_board: pieces currently drawn [row][col] (row 0 is the eighth rank), kept up to date in place.
+        :param dark: dark square colour.
+        :param light: light square colour.
+        """
+        self.window = window
+        self.game_board = game_board
+        self.dark, self.light = dark, light
+        self.coloured = set()                               # Squares not in their board colour
+
+    def colour_square(self, sq, dark, light):
+        """
+        Colour a square, e.g. to show a clicked square or a possible move. Undone by reset_colours.
+        :param sq: (row, col) of the square.
+        :param dark: colour if the square is dark.
+        :param light: colour if the square is light.
+        """
+        self.window[sq].Update(button_color=('black', update_board_colours(sq[0], sq[1], dark, light)))
+        self.coloured.add(sq)
+
+    def reset_colours(self):
+        """
+        Return every coloured square to its board colour.
+        """
+        for row, col in self.coloured:
+            self.window[(row, col)].Update(button_color=('black', update_board_colours(row, col, self.dark,
+                                                                                       self.light)))
+        self.coloured.clear()
+
+    def render(self, board):
+        """
+        Draw a board state: castling, en passant and promotion change whichever squares they change.
+        :param board: board state.
+        """
+        pieces = [[constants.BLANK] * 8 for _ in range(8)]
+        for square, piece in board.piece_map().items():
+            pieces[7 - chess.square_rank(square)][chess.square_file(square)] = PIECE_IDS[piece.symbol()]
+
+        for row in range(8):
+            for col in range(8):
+                if pieces[row][col] != self.game_board[row][col]:   # Changed square: new image, board colour
+                    self.game_board[row][col] = pieces[row][col]
+                    colour = update_board_colours(row, col, self.dark, self.light)
+                    self.window[(row, col)].Update(button_color=('black', colour),
+                                                   image_data=piece_image(pieces[row][col]))
+                    self.coloured.discard((row, col))
+        self.reset_colours()
 
 
 class Controller:
@@ -123,6 +222,11 @@ class Controller:
         # Default chess_board colours and theme
         self.depth = 4
         self.is_timer_on = True
+        self.is_ponder_on = False              # Think on the player's time; off until turned on in the menu
+        self.threads = 1                       # Search processes
+        self.is_null_move_on = True            # Null-move pruning (NegaScout and MTD(f))
+        self.is_lmr_on = True                  # Late move reductions (NegaScout and MTD(f))
+        self.profile_mode = profiler.mode_from_env()  # Profiling of the engine's searches, off unless BMCAI_PROFILE
         self.is_player_white = True
         self.pregame = True
         self.menu_element, self.board_array = None, None
@@ -172,6 +276,28 @@ class Controller:
                 window['el_player_time_left'](value)
                 window['el_engine_time_left'](value)
 
+        if button == 'Ponder Settings':                         # If turn selects the ponder settings menu option:
+            buttons, values = sg.Window('Ponder Settings',      # Create popup window for ponder settings
+                                        [[sg.Checkbox('Think on your time (Ponder)?', default=self.is_ponder_on,
+                                                      key='ponder_enable'), sg.OK(), sg.Cancel()]],
+                                        finalize=True, font=('Helvetica', 12), icon=constants.LOGO).read(close=True)
+
+            if buttons == 'OK':                                 # If OK clicked: set ponder state:
+                self.is_ponder_on = True if values['ponder_enable'] else False
+
+        if button == 'Pruning Settings':                        # Selective search, each feature set separately
+            buttons, values = sg.Window('Pruning Settings',     # Create popup window for pruning settings
+                                        [[sg.Checkbox('Null-move pruning', default=self.is_null_move_on,
+                                                      key='null_move_enable')],
+                                         [sg.Checkbox('Late move reductions', default=self.is_lmr_on,
+                                                      key='lmr_enable')],
+                                         [sg.OK(), sg.Cancel()]],
+                                        finalize=True, font=('Helvetica', 12), icon=constants.LOGO).read(close=True)
+
+            if buttons == 'OK':                                 # If OK clicked: set pruning states:
+                self.is_null_move_on = True if values['null_move_enable'] else False
+                self.is_lmr_on = True if values['lmr_enable'] else False
+
         if button == 'Change Search Depth':
             buttons, values = sg.Window('Select Search Depth',  # Create popup window for depth selection
                                         [[sg.Combo(constants.DEPTH_LIST, size=(10, 15), readonly=True,
@@ -181,6 +307,23 @@ class Controller:
                 self.depth = values['depth_select']
                 window['el_depth'](self.depth)
 
+        if button == 'Change Threads':
+            buttons, values = sg.Window('Select Threads',       # Create popup window for thread selection
+                                        [[sg.Combo(constants.THREAD_LIST, default_value=self.threads, size=(10, 15),
+                                                   readonly=True, k='thread_select'), sg.OK(), sg.Cancel()]],
+                                        finalize=True, font=('Helvetica', 12), icon=constants.LOGO).read(close=True)
+            if buttons == 'OK':
+                self.threads = values['thread_select']
+
+        if button == 'Profiling Settings':
+            buttons, values = sg.Window('Profile Engine Searches',  # Create popup window for profiling mode
+                                        [[sg.Combo(constants.PROFILE_LIST, default_value=self.profile_mode,
+                                                   size=(10, 15), readonly=True, k='profile_select'), sg.OK(),
+                                          sg.Cancel()]],
+                                        finalize=True, font=('Helvetica', 12), icon=constants.LOGO).read(close=True)
+            if buttons == 'OK':                                 # Profiles are written to constants.PROFILE_DIR
+                self.profile_mode = values['profile_select']
+
         if button == 'Select Board Colours':
             buttons, values = sg.Window('Select Board Colour:',  # Create popup window for depth selection
                                         [[sg.Combo(constants.COLOUR_LIST, size=(10, 15), readonly=True,
@@ -257,7 +400,7 @@ class Controller:
         self.set_labels(window)                                         # Set labels for the app window
 
         while True:                                                     # PRE-GAME - Start main game loop
-            button, value = window.Read(timeout=60)
+            button, value = window.Read()                               # Wait for an event
             check_for_end(window, button, value)                        # Check for exit
             window = self.check_menu_buttons(button, window)            # Check for menu button selections not new game
 
@@ -277,7 +420,9 @@ class Controller:
                 self.menu_element.Update(constants.IN_GAME_MENU_BAR)    # Change menu to 'In-Game' options
                 new_game = game.Game(chess_board, window, self.is_player_white, self.opening_book,
                                      self.algorithm, self.board_array, self.depth, self.is_timer_on,
-                                     self.dark_sq_colour, self.light_sq_colour)  # initialize game
+                                     self.dark_sq_colour, self.light_sq_colour, self.is_ponder_on,
+                                     self.threads, self.profile_mode, self.is_null_move_on,
+                                     self.is_lmr_on)                     # initialize game
                 new_game.game_controller()                                       # Begin game loop
 
                 # Reset elements after game
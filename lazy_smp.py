@@ -0,0 +1,128 @@
+import multiprocessing
+import queue
+import chess
+import mtdf
+import t_table
+import timer
+
+"""
+Lazy SMP for MTD(f). Helper processes search the same root as the main search at staggered (deeper) depths and
+share nothing but the transposition table, held lockless in shared memory. The entries they store let the main
+search's probes cut off sooner.
+"""
+
+PARENT_CHECK_INTERVAL = 1.0   # Seconds between checks, while idle, that the process which started the helper is alive
+REPORT_TIMEOUT = 1.0          # Seconds to wait for a stopped helper's node report
+SHUTDOWN_TIMEOUT = 0.5        # Seconds an idle helper gets to exit cleanly before it is killed
+
+
+def helper_main(helper_id, tt_size_mb, tt_name, requests, reports, stop):
+    """
+    Helper process loop. Searches each requested root until stopped, then reports its node count.
+    :param helper_id: helper number, from 1 (the main search is worker 0).
+    :param tt_size_mb: size of the shared transposition table.
+    :param tt_name: shared memory name of the transposition table.
+    :param requests: queue of (root FEN, move stack, max depth, TT generation, null move, LMR) tuples, or None to
+                     exit.
+    :param reports: queue of (helper id, nodes, seconds) tuples.
+    :param stop: shared deadline value, set to timer.STOP_SEARCH when the main search finishes.
+    """
+    trans_table = t_table.TransTable.attach(tt_size_mb, tt_name)
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            request = requests.get(timeout=PARENT_CHECK_INTERVAL)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():   # Orphaned: the search worker was killed
+                break
+            continue
+        if request is None:                                     # Shutdown request
+            break
+
+        root_fen, move_stack, max_depth, generation, null_move, lmr = request
+        board = chess.Board(root_fen)
+        for uci in move_stack:
+            board.push_uci(uci)
+        trans_table.generation = generation                     # Store entries as part of the main search
+        offset = 1 + helper_id % 2                              # Stagger: one or two plies deeper than the main
+        time_manager = timer.SharedTimeManager(stop)
+        engine = mtdf.MTDfEngine(board, max_depth + offset, trans_table, time_manager, null_move=null_move, lmr=lmr)
+        engine.search_controller(board, first_depth=2 + offset, new_search=False)
+        reports.put((helper_id, time_manager.nodes, time_manager.elapsed()))
+    trans_table.close()
+
+
+def format_report(report):
+    """
+    Per-worker nodes per second, for logging.
+    :param report: list of (worker id, nodes, seconds) tuples.
+    :return: report string.
+    """
+    return ' | '.join('worker {}: {} nodes, {:.0f} nps'.format(worker, nodes, nodes / seconds if seconds else 0)
+                      for worker, nodes, seconds in report)
+
+
+class LazySmpPool:
+    """
+    Helper processes for Lazy SMP, kept alive between searches. The MTD(f) engine calls start_search() before
+    its own iterative deepening and stop_search() after it.
+    """
+    def __init__(self, helpers, trans_table, stop=None):
+        """
+        :param helpers: number of helper processes (threads - 1).
+        :param trans_table: transposition table created with shared=True.
+        :param stop: shared deadline value (multiprocessing.RawValue('d')), or None to create one. Passing one in
+                     lets the process that owns it stop the helpers too.
+        """
+        self.trans_table = trans_table
+        self.stop = stop if stop is not None else multiprocessing.RawValue('d', 0.0)
+        self.reports = multiprocessing.Queue()
+        self.requests = [multiprocessing.Queue() for _ in range(helpers)]
+        self.processes = [multiprocessing.Process(target=helper_main, daemon=True,
+                                                  args=(helper_id + 1, trans_table.size_mb, trans_table.shm.name,
+                                                        requests, self.reports, self.stop))
+                          for helper_id, requests in enumerate(self.requests)]
+        for process in self.processes:
+            process.start()
+
+    def start_search(self, board, max_depth, null_move=True, lmr=True):
+        """
+        Start every helper on a root position.
+        :param board: board state.
+        :param max_depth: maximum depth of the main search.
+        :param null_move: null-move pruning setting of the main search.
+        :param lmr: late move reductions setting of the main search.
+        """
+        self.stop.value = 0.0
+        root_fen = board.root().fen()
+        move_stack = [move.uci() for move in board.move_stack]
+        for requests in self.requests:
+            requests.put((root_fen, move_stack, max_depth, self.trans_table.generation, null_move, lmr))
+
+    def stop_search(self):
+        """
+        Stop the helpers and collect their node counts.
+        :return: list of (helper id, nodes, seconds) tuples.
+        """
+        self.stop.value = timer.STOP_SEARCH
+        report = []
+        for _ in self.processes:
+            try:
+                report.append(self.reports.get(timeout=REPORT_TIMEOUT))
+            except queue.Empty:
+                break
+        return sorted(report)
+
+    def close(self):
+        """
+        Shut the helpers down.
+        """
+        self.stop.value = timer.STOP_SEARCH
+        for requests in self.requests:
+            requests.put(None)
+        for process in self.processes:
+            process.join(SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.processes = []
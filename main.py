@@ -1,3 +1,4 @@
+import multiprocessing
 import gui
 
 
@@ -12,4 +13,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for the search worker process in the frozen (PyInstaller) build
     main()
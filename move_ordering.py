@@ -0,0 +1,132 @@
+import chess
+import see
+
+"""
+Move ordering shared by the pruning engines (NegaMax & Alpha-Beta, NegaScout and MTD(f)).
+Moves are tried in the order: hash move, captures and promotions (MVV-LVA), killer moves, countermove,
+then the remaining quiet moves by history score. Engines with a quiescence search also try captures that lose
+material by static exchange evaluation last; without one, the horizon never sees the recapture, so they stay early.
+"""
+
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 26                  # Plus MVV-LVA score
+LOSING_CAPTURE_SCORE = -(1 << 20)        # Plus MVV-LVA score; below every quiet move
+KILLER_SCORES = (1 << 25, (1 << 25) - 1)  # First and second killer slot
+COUNTERMOVE_SCORE = 1 << 24
+HISTORY_LIMIT = 1 << 23                  # History scores are halved once any reaches this
+MAX_PLY = 64
+
+
+def mvv_lva(victim, attacker):
+    """
+    Most Valuable Victim - Least Valuable Attacker score. Victims dominate, attackers break ties.
+    :param victim: captured piece type.
+    :param attacker: capturing piece type.
+    :return: ordering score.
+    """
+    return victim * 8 - attacker
+
+
+class MoveOrderer:
+    """
+    Orders moves and learns from beta cutoffs: two killer slots per ply, a butterfly history table
+    indexed [colour][from][to], and a countermove table indexed by the previous move's [from][to].
+    """
+    def __init__(self, use_see=False):
+        """
+        :param use_see: order captures that lose material (see.py) after the quiet moves.
+        """
+        self.use_see = use_see
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in chess.COLORS]
+        self.countermoves = [[None] * 64 for _ in range(64)]
+        self.cutoffs = 0                       # Beta cutoffs this search
+        self.first_move_cutoffs = 0            # Beta cutoffs caused by the first move searched
+
+    def new_search(self):
+        """
+        Reset the per-search statistics. Killers and history are kept, as they remain good guesses.
+        """
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def statistics(self):
+        """
+        Cutoff statistics for the current search.
+        :return: dict of cutoffs, first-move cutoffs and the first-move cutoff rate.
+        """
+        rate = self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+        return {'cutoffs': self.cutoffs, 'first_move_cutoffs': self.first_move_cutoffs,
+                'first_move_cutoff_rate': rate}
+
+    def order(self, board, moves, ply, hash_move=None):
+        """
+        Sort moves, best first.
+        :param board: board state.
+        :param moves: legal moves for the board (any iterable).
+        :param ply: distance from the root.
+        :param hash_move: best move stored in the transposition table, if any.
+        :return: ordered list of moves.
+        """
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        previous = board.peek() if board.move_stack else None
+        countermove = self.countermoves[previous.from_square][previous.to_square] if previous else None
+        history = self.history[board.turn]
+        their_pieces = board.occupied_co[not board.turn]
+        ep_square = board.ep_square
+        piece_type_at = board.piece_type_at
+        use_see = self.use_see
+
+        def score(move):
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+            to_sq = move.to_square
+            if their_pieces & chess.BB_SQUARES[to_sq]:                  # Capture
+                victim_score = mvv_lva(piece_type_at(to_sq), piece_type_at(move.from_square))
+                if use_see and see.is_losing_capture(board, move):
+                    return LOSING_CAPTURE_SCORE + victim_score
+                return CAPTURE_SCORE + victim_score
+            if to_sq == ep_square and piece_type_at(move.from_square) == chess.PAWN:
+                return CAPTURE_SCORE + mvv_lva(chess.PAWN, chess.PAWN)  # En passant
+            if move.promotion:
+                return CAPTURE_SCORE + mvv_lva(move.promotion, chess.PAWN)
+            if move == killers[0]:
+                return KILLER_SCORES[0]
+            if move == killers[1]:
+                return KILLER_SCORES[1]
+            if move == countermove:
+                return COUNTERMOVE_SCORE
+            return history[move.from_square][to_sq]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def cutoff(self, board, move, ply, depth_left, move_index):
+        """
+        Record a beta cutoff. Quiet moves update the killer, history and countermove tables.
+        :param board: board state (with the cutoff move already unmade).
+        :param move: move that caused the cutoff.
+        :param ply: distance from the root.
+        :param depth_left: search depth remaining at the node.
+        :param move_index: position of the move in the ordered list.
+        """
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+        if move.promotion or board.is_capture(move):                     # Captures are ordered by MVV-LVA
+            return
+
+        if ply < MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+
+        history = self.history[board.turn]
+        history[move.from_square][move.to_square] += depth_left * depth_left
+        if history[move.from_square][move.to_square] >= HISTORY_LIMIT:
+            for colour_history in self.history:
+                for row in colour_history:
+                    row[:] = [value // 2 for value in row]
+
+        if board.move_stack:
+            previous = board.peek()
+            self.countermoves[previous.from_square][previous.to_square] = move
@@ -1,96 +1,117 @@
-from chess.polyglot import zobrist_hash
+import chess
 import evaluator
+import move_ordering
+import quiescence
+import search_result
+import selective
+import terminal
+import timer
+import zobrist
 import t_table
 import constants
 
 
 class MTDfEngine(object):
-    def __init__(self, board, depth):
-        self._max_depth = depth
+    def __init__(self, board, depth, trans_table=None, time_manager=None, smp_pool=None, null_move=True, lmr=True):
+        self._max_depth = depth                               # Maximum iterative deepening depth
         self._max_score = constants.MAX_SCORE
-        self._transTable = t_table.TransTable()
-
-    def quiesce(self, alpha, beta, board, entry, final_board):
-        """ Apply a Quiescence Search, which aids combat the horizon effect.
-        """
-        move = None
-        stand_pat = evaluator.evaluator(board, entry.result)
-        if stand_pat >= beta:
-            return beta
-        alpha = max(alpha, stand_pat)
-
-        q_moves = (move for move in board.legal_moves if (board.is_check or board.is_capture(move)))
-        for move in q_moves:
-            if board.is_capture(move):
-                board.push(move)
-                move, score, entry.finalBoard = -self.quiesce(-beta, -alpha, board, entry, final_board)
-                board.pop()
-
-                if score >= beta:
-                    return beta
-                alpha = max(alpha, score)
-
-        return move, alpha, entry.finalBoard
-
-    def update_t_table(self, entry, new_entry):
-        if self._transTable.size == self._transTable.maxSize and new_entry:  # If the entry is new and table is full
-            self._transTable.table.popitem()                                 # Remove the last entry
-            self._transTable.size = self._transTable.size - 1                # -1 from the table size
-        self._transTable.table[entry.z_key] = entry                          # Add new entry to the table
-        self._transTable.size = self._transTable.size + 1                    # +1 to the table size
+        self._transTable = trans_table or t_table.TransTable()  # Pass a table in to keep it between moves
+        self._evaluator = None                                # Incremental evaluator, created per search
+        self._hasher = None                                   # Incremental Zobrist key, created per search
+        self._quiescence = None                               # Captures search at the horizon, created per search
+        self._results = {}                                    # Game result of each position seen, by Zobrist key
+        self._orderer = move_ordering.MoveOrderer(use_see=True)  # Killer, history and countermove tables
+        self._time_manager = time_manager or timer.TimeManager()  # Deadline, if the game is timed
+        self._smp_pool = smp_pool                             # Lazy SMP helpers sharing the table, if any
+        self._null_move = null_move                           # Null-move pruning setting
+        self._lmr = lmr                                       # Late move reductions setting
+        self.smp_report = []                                  # (worker, nodes, seconds) for each worker
+        self._tt_cutoffs = 0                                  # Nodes answered from the table, this search
+        self._passes = 0                                      # Null-window searches, this search
 
     def _abwm_negamax(self, board, max_depth, depth, alpha, beta):          # NegaMax with Alpha-BetaWithMemory function
         """
         NegaMax with AlphaBetaWithMemory implementation.
         """
+        self._time_manager.check()                                           # Abort if out of time
         alpha_original = alpha                                               # Set holder for original alpha value
-        new_entry = False
-        z_hash = zobrist_hash(board)                      # Get Zobrist hash for current chess_board state from Polyglot
-        entry = self._transTable.table.get(z_hash)              # Get table entry for current hash key
+        depth_left = max_depth - depth
+        z_hash = self._hasher.key                         # Polyglot Zobrist hash, kept up to date on push/pop
+        entry = self._transTable.probe(z_hash, depth)           # Get table entry for current hash key
 
-        if entry and entry.depth >= max_depth - depth:  # If entry exists and...
+        if entry and entry.depth >= depth_left:         # If entry exists and...
             if entry.flag == constants.EXACT_SCORE:          # If entry is flagged as an exact score (0):
-                return entry.move, entry.score, entry.finalBoard    # Return entry
+                self._tt_cutoffs += 1
+                return entry.move, entry.score                      # Return entry
             elif entry.flag == constants.LOWER_BOUND_SCORE:  # If entry is flagged as an lower bound score (1):
                 alpha = max(alpha, entry.score)                     # Get max
             else:                                                   # If entry is flagged as an upper bound score (2):
                 beta = min(beta, entry.score)                       # Get min
             if alpha >= beta:                                       # AB test
-                return entry.move, entry.score, entry.finalBoard    # Prune or return entry?
-
-        """ Create new entry and initialize values """
-        if not entry:                                               # If state is not in the transposition table:
-            entry = t_table.TransTableEntry()                       # Create new entry. Set class variables:
-            entry.z_key = z_hash                                    # Set Zobrist hash key
-            new_entry = True                                        # Set entry state to True
-            entry.result = board.result()      # Get python-chess entry result (1-0, 0-1, 1/2-1/2, or * (undetermined))
-        entry.depth = max_depth - depth                             # Set entry depth (max depth - current depth)
-        entry.move = None                                           # Set entry move to None
-
-        if depth == max_depth or entry.result != "*":  # if max_depth is reached, or if result is determined (not '*'):
-            entry.score = evaluator.evaluator(board, entry.result)  # Get utility evaluation of current entry
-            entry.finalBoard = board                                # Set final chess_board (to be stored in t. table)
-            self.update_t_table(entry, new_entry)                   # Update table with entry
-            return '', entry.score, board                           # Return values
+                self._tt_cutoffs += 1
+                return entry.move, entry.score                      # Prune or return entry?
+
+        # Get python-chess result (1-0, 0-1, 1/2-1/2, or * (undetermined)), reusing a stored or cached result
+        result = entry.result if entry else self._results.get(z_hash)
+        moves = None
+        if result is None:
+            if depth < max_depth:                                   # Generate moves once: for the result and the loop
+                moves = list(board.legal_moves)
+            result = terminal.result(board, moves)
+            self._results[z_hash] = result
+
+        if result != "*":                                           # If result is determined (not '*'):
+            score = terminal.result_score(result, depth)            # Draw, or mated this many plies from the root
+            self._transTable.store(z_hash, None, score, depth_left, constants.EXACT_SCORE, result, depth)
+            return '', score                                        # Return values
+
+        if depth == max_depth:                                      # Horizon: settle captures before scoring
+            score = self._quiescence.search(alpha, beta, depth)
+            if score <= alpha_original:
+                flag = constants.UPPER_BOUND_SCORE
+            elif score >= beta:
+                flag = constants.LOWER_BOUND_SCORE
+            else:
+                flag = constants.EXACT_SCORE
+            self._transTable.store(z_hash, None, score, depth_left, flag, result, depth)
+            return '', score
+
+        if self._null_move and depth > 0 and selective.null_move_allowed(board, depth_left) \
+                and self._evaluator.evaluate() >= beta:             # Null move: pass, and prune if still >= beta
+            self._hasher.push(chess.Move.null())
+            _, score = self._abwm_negamax(board, max_depth - selective.NULL_MOVE_REDUCTION, depth + 1,
+                                          -beta, -beta + 1)
+            self._hasher.pop()
+            score = min(-score, constants.MATE_SCORE - terminal.MAX_MATE_PLY)  # Fail-soft, but never an unproven mate
+            if score >= beta:
+                self._transTable.store(z_hash, None, score, depth_left, constants.LOWER_BOUND_SCORE, result, depth)
+                return '', score
 
         best_score = -(1 << 64)
         best_move = None
-        final_board = None                                          # Set values to None
         """ Main negamax loop - Recursively loops through all possible moves """
-        for move in board.legal_moves:
-            board.push(move)
-            _, score, final_board = self._abwm_negamax(board, max_depth, depth + 1, -beta, -alpha)
+        hash_move = entry.move if entry else None                   # Best move from an earlier, shallower search
+        moves = self._orderer.order(board, moves if moves is not None else board.legal_moves, depth, hash_move)
+        in_check = board.is_check()
+        for index, move in enumerate(moves):
+            reduction = selective.reduction(board, move, depth_left, index, in_check, self._lmr)  # Late/losing moves
+            self._hasher.push(move)                                 # Updates key, evaluation and board
+            if reduction and board.is_check():                      # Never reduce a checking move
+                reduction = 0
+            _, score = self._abwm_negamax(board, max_depth - reduction, depth + 1, -beta, -alpha)
+            if reduction and -score > alpha:                        # Reduced move beat alpha: search at full depth
+                _, score = self._abwm_negamax(board, max_depth, depth + 1, -beta, -alpha)
 
             # NegaScout implementation
             score_a = score
             if alpha < score < beta:
-                _, score_b, final_board = self._abwm_negamax(board, max_depth, depth + 1, -beta, -alpha)
+                _, score_b = self._abwm_negamax(board, max_depth, depth + 1, -beta, -alpha)
                 score = max(score_a, score_b)
             else:
                 score = score_a
 
             score = -score
-            board.pop()
+            self._hasher.pop()
 
             if score > best_score:
                 best_score = score
@@ -98,21 +119,18 @@ class MTDfEngine(object):
 
             alpha = max(alpha, score)
             if alpha >= beta:
+                self._orderer.cutoff(board, move, depth, depth_left, index)
                 break
 
-        entry.score = best_score
-        entry.move = best_move
-        entry.finalBoard = final_board
-
         if best_score <= alpha_original:
-            entry.flag = constants.UPPER_BOUND_SCORE
+            flag = constants.UPPER_BOUND_SCORE
         elif best_score >= beta:
-            entry.flag = constants.LOWER_BOUND_SCORE
+            flag = constants.LOWER_BOUND_SCORE
         else:
-            entry.flag = constants.EXACT_SCORE
-        self.update_t_table(entry, new_entry)
+            flag = constants.EXACT_SCORE
+        self._transTable.store(z_hash, best_move, best_score, depth_left, flag, result, depth)
 
-        return best_move, best_score, final_board
+        return best_move, best_score
 
     # MTD(f)
     def _mtd(self, board, max_depth, first_guess):
@@ -123,7 +141,6 @@ class MTDfEngine(object):
         :param first_guess: initial search guess.
         """
         move = None
-        final_board = None
         guess = first_guess
         upper_bound = self._max_score
         lower_bound = -self._max_score
@@ -133,32 +150,64 @@ class MTDfEngine(object):
                 beta = guess + 1
             else:
                 beta = guess
-            move, guess, final_board = self._abwm_negamax(board, max_depth, 0, beta - 1, beta)
+            move, guess = self._abwm_negamax(board, max_depth, 0, beta - 1, beta)
+            self._passes += 1
             if guess < beta:
                 upper_bound = guess
             else:
                 lower_bound = guess
 
-        return move, guess, final_board
+        return move, guess
 
-    def search_controller(self, board):               # Iterative Deepening Implementation
+    def search_controller(self, board, first_depth=2, new_search=True):  # Iterative Deepening Implementation
         """
-        Iterative deepening framework and controller for the MTD(f) engine.
+        Iterative deepening framework and controller for the MTD(f) engine. Stops early if the time budget runs out.
         :param board: board state.
-        :return: chosen move.
+        :param first_depth: first iteration depth (Lazy SMP helpers start deeper).
+        :param new_search: False for Lazy SMP helpers, which store entries as part of the main search.
+        :return: search_result.SearchResult, with the chosen move from the last completed iteration.
         """
-        move = None                                   # Initialize chess move, for return
+        result = search_result.SearchResult()
+        self._evaluator = evaluator.IncrementalEvaluator(board)  # Track material and piece-squares on push/pop
+        self._hasher = zobrist.ZobristTracker(board, self._evaluator)  # Track the Zobrist key, pushing via evaluator
+        self._quiescence = quiescence.Quiescence(board, self._hasher, self._evaluator, self._time_manager)
+        if new_search:
+            self._transTable.new_search()             # Age entries from previous moves
+        self._orderer.new_search()
+        self._results = {}
+        self._tt_cutoffs = 0
+        self._passes = 0
         guess1 = 1 << 64                              # First guess is of high importance
         guess2 = 1 << 64
+        root_ply = len(board.move_stack)
+        self._time_manager.start()
+        if self._smp_pool:                            # Helpers fill the shared table in parallel
+            self._smp_pool.start_search(board, self._max_depth, self._null_move, self._lmr)
+
+        for depth in range(first_depth, self._max_depth + 1):
+            try:
+                if depth % 2 == 0:
+                    move, guess1 = self._mtd(board, depth, guess1)
+                    score = guess1
+                else:
+                    move, guess2 = self._mtd(board, depth, guess2)
+                    score = guess2
+            except timer.SearchTimeout:               # Out of time: keep the move from the last completed depth
+                self._hasher.unwind(root_ply)
+                break
+            result.complete_iteration(depth, move, score)
+            if not self._time_manager.iteration_complete(depth, move, score):
+                break
 
-        for depth in range(2, self._max_depth + 1):
-            if depth % 2 == 0:
-                move, guess1, final_board1 = self._mtd(board, depth, guess1)
-            else:
-                move, guess2, final_board2 = self._mtd(board, depth, guess2)
-
-        return move
+        result.finish(self._time_manager, self._orderer, self._transTable)
+        result.tt_cutoffs = self._tt_cutoffs
+        result.mtd_passes = self._passes
+        result.q_nodes = self._quiescence.nodes
+        self.smp_report = [(0, self._time_manager.nodes, self._time_manager.elapsed())]
+        if self._smp_pool:
+            self.smp_report += self._smp_pool.stop_search()
 
+        return result
 
 """
 Ramachandran, A. (2020). JHurricane96/chessai. [ONLINE] GitHub.
@@ -2,68 +2,43 @@ import chess.svg
 import chess.polyglot
 import chess.pgn
 import chess.engine
-import piece_tables
+import evaluator
+import root_split
+import search_result
+import terminal
+import timer
 
 
 class NegamaxEngine:
-    def __init__(self, board, depth):
+    def __init__(self, board, depth, batch_frontier=True, time_manager=None, threads=1):
         self.board = board
-        self.depth = depth
+        self.depth = depth                    # Maximum iterative deepening depth
+        self.threads = threads                # Above 1: root moves are searched in parallel (root_split)
+        self.time_manager = time_manager or timer.TimeManager()  # Deadline, if the game is timed
+        self.best_value = None                # Root score of the last completed iteration
+        self.batch_frontier = batch_frontier  # Score depth-1 children as one batch (every child is visited anyway)
+        self.evaluator = evaluator.IncrementalEvaluator(board)  # Makes/unmakes moves, tracking the score
+        self.root_ply = len(board.move_stack)  # Mate scores count plies from here
+
+    def ply(self):
+        """
+        :return: distance of the current position from the search root.
+        """
+        return len(self.board.move_stack) - self.root_ply
 
-    def evaluation(self):
+    def evaluation(self, static_score=None):
         """
         evaluate current position.
+        :param static_score: material and piece-square score, if already computed by the frontier batch.
         :return: node score.
         """
-        if self.board.is_checkmate():
-            if self.board.turn:
-                return -9999
-            else:
-                return 9999
-        if self.board.is_stalemate():
-            return 0
-        if self.board.is_insufficient_material():
-            return 0
-
-        # Quantity of remaining pieces:
-        wp = len(self.board.pieces(chess.PAWN, chess.WHITE))
-        bp = len(self.board.pieces(chess.PAWN, chess.BLACK))
-        wn = len(self.board.pieces(chess.KNIGHT, chess.WHITE))
-        bn = len(self.board.pieces(chess.KNIGHT, chess.BLACK))
-        wb = len(self.board.pieces(chess.BISHOP, chess.WHITE))
-        bb = len(self.board.pieces(chess.BISHOP, chess.BLACK))
-        wr = len(self.board.pieces(chess.ROOK, chess.WHITE))
-        br = len(self.board.pieces(chess.ROOK, chess.BLACK))
-        wq = len(self.board.pieces(chess.QUEEN, chess.WHITE))
-        bq = len(self.board.pieces(chess.QUEEN, chess.BLACK))
-        # Piece val was: 100, 320, 330, 500, 900
-
-        material = 100 * (wp - bp) + 300 * (wn - bn) + 330 * (wb - bb) + 550 * (wr - br) + 1000 * (wq - bq)
-
-        pawn_sq = sum([piece_tables.TABLE_PAWN_MAIN[i] for i in self.board.pieces(chess.PAWN, chess.WHITE)])
-        pawn_sq += sum([-piece_tables.TABLE_PAWN_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.PAWN, chess.BLACK)])
-
-        knight_sq = sum([piece_tables.TABLE_KNIGHT_MAIN[i] for i in self.board.pieces(chess.KNIGHT, chess.WHITE)])
-        knight_sq += sum([-piece_tables.TABLE_KNIGHT_MAIN[chess.square_mirror(i)]
-                         for i in self.board.pieces(chess.KNIGHT, chess.BLACK)])
-
-        bishop_sq = sum([piece_tables.TABLE_BISHOP_MAIN[i] for i in self.board.pieces(chess.BISHOP, chess.WHITE)])
-        bishop_sq += sum([-piece_tables.TABLE_BISHOP_MAIN[chess.square_mirror(i)]
-                         for i in self.board.pieces(chess.BISHOP, chess.BLACK)])
-        rook_sq = sum([piece_tables.TABLE_ROOK_MAIN[i] for i in self.board.pieces(chess.ROOK, chess.WHITE)])
-        rook_sq += sum([-piece_tables.TABLE_ROOK_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.ROOK, chess.BLACK)])
-        queen_sq = sum([piece_tables.TABLE_QUEEN_MAIN[i] for i in self.board.pieces(chess.QUEEN, chess.WHITE)])
-        queen_sq += sum([-piece_tables.TABLE_QUEEN_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.QUEEN, chess.BLACK)])
-        king_sq = sum([piece_tables.TABLE_KING_MAIN[i] for i in self.board.pieces(chess.KING, chess.WHITE)])
-        king_sq += sum([-piece_tables.TABLE_KING_MAIN[chess.square_mirror(i)]
-                       for i in self.board.pieces(chess.KING, chess.BLACK)])
-
-        evaluation = material + pawn_sq + knight_sq + bishop_sq + rook_sq + queen_sq + king_sq
-
-        return evaluation if self.board.turn else -evaluation
+        terminal_score = terminal.score(self.board, ply=self.ply())  # Checkmate, stalemate or draw, side to move
+        if terminal_score is not None:
+            return terminal_score
+
+        if static_score is not None:
+            return static_score
+        return self.evaluator.evaluate()      # Material and piece-square score, kept up to date
 
     def negamax(self, depth_left):
         """
@@ -71,39 +46,95 @@ class NegamaxEngine:
         :param depth_left: search depth remaining.
         :return: best score found.
         """
+        self.time_manager.check()                  # Abort if out of time
         if depth_left == 0:                        # If max depth or terminal node reached:
             return self.evaluation()               # Return current leaf eval.
+        if depth_left == 1 and self.batch_frontier:  # If children are leaves and batching is on:
+            return self.negamax_frontier()         # Score them as one batch
 
         best_score = -9999
+        moves_searched = 0
         for move in self.board.legal_moves:        # For every position:
-            self.board.push(move)                  # Get current move
+            self.evaluator.push(move)              # Get current move
             score = -self.negamax(depth_left - 1)  # Call opponent, switching sign of return value
-            self.board.pop()                       # Undo move
+            self.evaluator.pop()                   # Undo move
+            moves_searched += 1
 
             best_score = max(score, best_score)    # Compare returned and existing score values, storing highest
 
+        if not moves_searched:                     # No legal moves: checkmate or stalemate
+            return terminal.score(self.board, [], self.ply())
         return best_score
 
-    def search_controller(self):
+    def negamax_frontier(self):
+        """
+        NegaMax at a depth-1 node. All children are scored by one batched lookup, so each child is only pushed
+        for the game-over checks.
+        :return: best score found.
+        """
+        moves = list(self.board.legal_moves)
+        if not moves:                              # No legal moves: checkmate or stalemate
+            return terminal.score(self.board, moves, self.ply())
+        static_scores = self.evaluator.frontier_scores(moves)
+        self.time_manager.nodes += len(moves)      # The batch-scored leaves count as nodes
+
+        best_score = -9999
+        for move, static_score in zip(moves, static_scores):
+            self.board.push(move)                  # Plain push: the child's score is already known
+            score = -self.evaluation(static_score)
+            self.board.pop()
+
+            best_score = max(score, best_score)
+
+        return best_score
+
+    def search_root(self, depth):
         """
-        Controls the NegaMax search.
+        Searches every root move to the given depth.
+        :param depth: search depth.
         :return: best move found.
         """
+        if self.threads > 1:
+            return root_split.search_root(self, list(self.board.legal_moves), depth, False)
+
         best_move = chess.Move.null()
         best_value = -99999                         # Set as INF (essentially)
 
         for move in self.board.legal_moves:
-            self.board.push(move)
-            board_value = -self.negamax(self.depth - 1)
+            self.evaluator.push(move)
+            board_value = -self.negamax(depth - 1)
 
             if board_value > best_value:
                 best_value = board_value
                 best_move = move
 
-            self.board.pop()
+            self.evaluator.pop()
 
+        self.best_value = best_value
         return best_move
 
+    def search_controller(self):
+        """
+        Controls the NegaMax search. Iterative deepening up to self.depth, or until the time budget runs out.
+        :return: search_result.SearchResult, with the best move from the last completed iteration.
+        """
+        result = search_result.SearchResult()
+        result.move = chess.Move.null()
+        self.time_manager.start()
+
+        for depth in range(self.time_manager.first_depth(self.depth), self.depth + 1):
+            try:
+                best_move = self.search_root(depth)
+            except timer.SearchTimeout:             # Out of time: discard the unfinished iteration
+                self.evaluator.unwind(self.root_ply)
+                break
+            result.complete_iteration(depth, best_move, self.best_value)
+            if not self.time_manager.iteration_complete(depth, best_move, self.best_value):
+                break
+
+        result.finish(self.time_manager)
+        return result
+
 
 """
 Gaikwad, A. (2020). Let’s create a Chess AI. [ONLINE] Medium.
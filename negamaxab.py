@@ -3,67 +3,46 @@ import chess.svg
 import chess.polyglot
 import chess.pgn
 import chess.engine
-import piece_tables
+import evaluator
+import move_ordering
+import root_split
+import search_result
+import terminal
+import timer
 
 
 class NegamaxAbEngine:
-    def __init__(self, board, depth):
+    def __init__(self, board, depth, batch_frontier=False, time_manager=None, threads=1):
         self.board = board
-        self.depth = depth
+        self.depth = depth                    # Maximum iterative deepening depth
+        self.threads = threads                # Above 1: root moves are searched in parallel (root_split)
+        self.search_depth = depth             # Depth of the current iteration
+        self.time_manager = time_manager or timer.TimeManager()  # Deadline, if the game is timed
+        self.best_value = None                # Root score of the last completed iteration
+        self.batch_frontier = batch_frontier  # Off by default: listing every child up front defeats early cutoffs
+        self.evaluator = evaluator.IncrementalEvaluator(board)  # Makes/unmakes moves, tracking the score
+        self.root_ply = len(board.move_stack)  # Mate scores count plies from here
+        self.orderer = move_ordering.MoveOrderer()              # Killer, history and countermove tables
+
+    def ply(self):
+        """
+        :return: distance of the current position from the search root.
+        """
+        return len(self.board.move_stack) - self.root_ply
 
-    def evaluation(self):
+    def evaluation(self, static_score=None):
         """
         evaluate current position.
+        :param static_score: material and piece-square score, if already computed by the frontier batch.
         :return: node score.
         """
-        if self.board.is_checkmate():
-            if self.board.turn:
-                return -9999
-            else:
-                return 9999
-        if self.board.is_stalemate():
-            return 0
-        if self.board.is_insufficient_material():
-            return 0
-
-        # Quantity of remaining pieces:
-        wp = len(self.board.pieces(chess.PAWN, chess.WHITE))
-        bp = len(self.board.pieces(chess.PAWN, chess.BLACK))
-        wn = len(self.board.pieces(chess.KNIGHT, chess.WHITE))
-        bn = len(self.board.pieces(chess.KNIGHT, chess.BLACK))
-        wb = len(self.board.pieces(chess.BISHOP, chess.WHITE))
-        bb = len(self.board.pieces(chess.BISHOP, chess.BLACK))
-        wr = len(self.board.pieces(chess.ROOK, chess.WHITE))
-        br = len(self.board.pieces(chess.ROOK, chess.BLACK))
-        wq = len(self.board.pieces(chess.QUEEN, chess.WHITE))
-        bq = len(self.board.pieces(chess.QUEEN, chess.BLACK))
-        # Piece val was: 100, 320, 330, 500, 900
-        material = 100 * (wp - bp) + 300 * (wn - bn) + 330 * (wb - bb) + 550 * (wr - br) + 1000 * (wq - bq)
-
-        pawn_sq = sum([piece_tables.TABLE_PAWN_MAIN[i] for i in self.board.pieces(chess.PAWN, chess.WHITE)])
-        pawn_sq += sum([-piece_tables.TABLE_PAWN_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.PAWN, chess.BLACK)])
-
-        knight_sq = sum([piece_tables.TABLE_KNIGHT_MAIN[i] for i in self.board.pieces(chess.KNIGHT, chess.WHITE)])
-        knight_sq += sum([-piece_tables.TABLE_KNIGHT_MAIN[chess.square_mirror(i)]
-                         for i in self.board.pieces(chess.KNIGHT, chess.BLACK)])
-
-        bishop_sq = sum([piece_tables.TABLE_BISHOP_MAIN[i] for i in self.board.pieces(chess.BISHOP, chess.WHITE)])
-        bishop_sq += sum([-piece_tables.TABLE_BISHOP_MAIN[chess.square_mirror(i)]
-                         for i in self.board.pieces(chess.BISHOP, chess.BLACK)])
-        rook_sq = sum([piece_tables.TABLE_ROOK_MAIN[i] for i in self.board.pieces(chess.ROOK, chess.WHITE)])
-        rook_sq += sum([-piece_tables.TABLE_ROOK_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.ROOK, chess.BLACK)])
-        queen_sq = sum([piece_tables.TABLE_QUEEN_MAIN[i] for i in self.board.pieces(chess.QUEEN, chess.WHITE)])
-        queen_sq += sum([-piece_tables.TABLE_QUEEN_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.QUEEN, chess.BLACK)])
-        king_sq = sum([piece_tables.TABLE_KING_MAIN[i] for i in self.board.pieces(chess.KING, chess.WHITE)])
-        king_sq += sum([-piece_tables.TABLE_KING_MAIN[chess.square_mirror(i)]
-                       for i in self.board.pieces(chess.KING, chess.BLACK)])
-
-        evaluation = material + pawn_sq + knight_sq + bishop_sq + rook_sq + queen_sq + king_sq
-
-        return evaluation if self.board.turn else -evaluation
+        terminal_score = terminal.score(self.board, ply=self.ply())  # Checkmate, stalemate or draw, side to move
+        if terminal_score is not None:
+            return terminal_score
+
+        if static_score is not None:
+            return static_score
+        return self.evaluator.evaluate()      # Material and piece-square score, kept up to date
 
     def alpha_beta(self, alpha, beta, depth_left):
         """
@@ -76,45 +55,112 @@ class NegamaxAbEngine:
         best_score = -9999
         b = beta
 
+        self.time_manager.check()                                 # Abort if out of time
         if depth_left == 0:                                       # If max-depth or terminal-node reached:
             return self.evaluation()                              # Return current leaf eval.
+        if depth_left == 1 and self.batch_frontier:               # If children are leaves and batching is on:
+            return self.alpha_beta_frontier(alpha, beta)          # Score them as one batch
 
-        for move in self.board.legal_moves:                       # Loop over all possible moves
-            self.board.push(move)                                 # Get current move
+        ply = self.search_depth - depth_left
+        moves = self.orderer.order(self.board, self.board.legal_moves, ply)
+        if not moves:                                             # No legal moves: checkmate or stalemate
+            return terminal.score(self.board, moves, self.ply())
+
+        for index, move in enumerate(moves):                      # Loop over all possible moves, best guess first
+            self.evaluator.push(move)                             # Get current move
             score = -self.alpha_beta(-b, -alpha, depth_left - 1)  # Negamax implementation of Minimax
-            self.board.pop()                                      # Undo move
+            self.evaluator.pop()                                  # Undo move
 
             best_score = max(score, best_score)                  # Compare returned and existing values, storing highest
             alpha = max(score, alpha)                            # Adjust search window
             if alpha >= beta:                                    # Alpha Beta Pruning condition
+                self.orderer.cutoff(self.board, move, ply, depth_left, index)
                 return alpha                                     # Prune branch
 
             b = alpha + 1
+
         return best_score
 
-    def search_controller(self):
+    def alpha_beta_frontier(self, alpha, beta):
+        """
+        Alpha-Beta at a depth-1 node. All children are scored by one batched lookup, so each child is only pushed
+        for the game-over checks.
+        :param alpha: current Alpha score.
+        :param beta: current Beta score.
+        :return: best score found.
+        """
+        moves = list(self.board.legal_moves)
+        if not moves:                                             # No legal moves: checkmate or stalemate
+            return terminal.score(self.board, moves, self.ply())
+        static_scores = self.evaluator.frontier_scores(moves)
+
+        best_score = -9999
+        for move, static_score in zip(moves, static_scores):
+            self.time_manager.nodes += 1                          # Batch-scored leaves count as nodes once visited
+            self.board.push(move)                                 # Plain push: the child's score is already known
+            score = -self.evaluation(static_score)
+            self.board.pop()
+
+            best_score = max(score, best_score)
+            alpha = max(score, alpha)
+            if alpha >= beta:                                     # Alpha Beta Pruning condition
+                return alpha                                      # Prune branch
+
+        return best_score
+
+    def search_root(self, depth, first_move=None):
         """
-        Controls the NegaMax with Alpha-Beta Pruning search.
+        Searches every root move to the given depth.
+        :param depth: search depth.
+        :param first_move: move to search first (the best move from the previous iteration).
         :return: best move found.
         """
         best_move = chess.Move.null()
         best_value = -99999  # Set as INF (essentially)
         alpha = -100000      # Set as INF (essentially)
         beta = 100000        # Set as INF (essentially)
+        self.search_depth = depth
+        moves = self.orderer.order(self.board, self.board.legal_moves, 0, first_move)
+        if self.threads > 1:
+            return root_split.search_root(self, moves, depth, True)
 
-        for move in self.board.legal_moves:
-            self.board.push(move)
-            board_value = -self.alpha_beta(-beta, -alpha, self.depth - 1)
+        for move in moves:
+            self.evaluator.push(move)
+            board_value = -self.alpha_beta(-beta, -alpha, depth - 1)
 
             if board_value > best_value:
                 best_value = board_value
                 best_move = move
             alpha = max(board_value, alpha)
 
-            self.board.pop()
+            self.evaluator.pop()
 
+        self.best_value = best_value
         return best_move
 
+    def search_controller(self):
+        """
+        Controls the NegaMax with Alpha-Beta Pruning search. Iterative deepening up to self.depth, or until the time budget
+        runs out.
+        :return: search_result.SearchResult, with the best move from the last completed iteration.
+        """
+        result = search_result.SearchResult()
+        result.move = chess.Move.null()
+        self.orderer.new_search()
+        self.time_manager.start()
+
+        for depth in range(self.time_manager.first_depth(self.depth), self.depth + 1):
+            try:
+                best_move = self.search_root(depth, result.move)
+            except timer.SearchTimeout:       # Out of time: discard the unfinished iteration
+                self.evaluator.unwind(self.root_ply)
+                break
+            result.complete_iteration(depth, best_move, self.best_value)
+            if not self.time_manager.iteration_complete(depth, best_move, self.best_value):
+                break
+
+        result.finish(self.time_manager, self.orderer)
+        return result
 
 """
 Gaikwad, A. (2020). Let’s create a Chess AI. [ONLINE] Medium.
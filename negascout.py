@@ -3,145 +3,142 @@ import chess.svg
 import chess.polyglot
 import chess.pgn
 import chess.engine
-import piece_tables
+import evaluator
+import move_ordering
+import quiescence
+import search_result
+import selective
+import terminal
+import timer
 
 
 class NegaScoutEngine:
-    def __init__(self, board, depth):
+    def __init__(self, board, depth, time_manager=None, null_move=True, lmr=True):
         self.board = board
-        self.depth = depth
-
-    def evaluation(self):
-        """
-        evaluate current position.
-        :return: node score.
-        """
-        if self.board.is_checkmate():
-            if self.board.turn:
-                return -9999
-            else:
-                return 9999
-        if self.board.is_stalemate():
-            return 0
-        if self.board.is_insufficient_material():
-            return 0
-
-        # Quantity of remaining pieces:
-        wp = len(self.board.pieces(chess.PAWN, chess.WHITE))
-        bp = len(self.board.pieces(chess.PAWN, chess.BLACK))
-        wn = len(self.board.pieces(chess.KNIGHT, chess.WHITE))
-        bn = len(self.board.pieces(chess.KNIGHT, chess.BLACK))
-        wb = len(self.board.pieces(chess.BISHOP, chess.WHITE))
-        bb = len(self.board.pieces(chess.BISHOP, chess.BLACK))
-        wr = len(self.board.pieces(chess.ROOK, chess.WHITE))
-        br = len(self.board.pieces(chess.ROOK, chess.BLACK))
-        wq = len(self.board.pieces(chess.QUEEN, chess.WHITE))
-        bq = len(self.board.pieces(chess.QUEEN, chess.BLACK))
-        # Piece val was: 100, 320, 330, 500, 900
-
-        material = 100 * (wp - bp) + 300 * (wn - bn) + 330 * (wb - bb) + 550 * (wr - br) + 1000 * (wq - bq)
-
-        pawn_sq = sum([piece_tables.TABLE_PAWN_MAIN[i] for i in self.board.pieces(chess.PAWN, chess.WHITE)])
-        pawn_sq += sum([-piece_tables.TABLE_PAWN_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.PAWN, chess.BLACK)])
-        knight_sq = sum([piece_tables.TABLE_KNIGHT_MAIN[i] for i in self.board.pieces(chess.KNIGHT, chess.WHITE)])
-        knight_sq += sum([-piece_tables.TABLE_KNIGHT_MAIN[chess.square_mirror(i)]
-                         for i in self.board.pieces(chess.KNIGHT, chess.BLACK)])
-        bishop_sq = sum([piece_tables.TABLE_BISHOP_MAIN[i] for i in self.board.pieces(chess.BISHOP, chess.WHITE)])
-        bishop_sq += sum([-piece_tables.TABLE_BISHOP_MAIN[chess.square_mirror(i)]
-                         for i in self.board.pieces(chess.BISHOP, chess.BLACK)])
-        rook_sq = sum([piece_tables.TABLE_ROOK_MAIN[i] for i in self.board.pieces(chess.ROOK, chess.WHITE)])
-        rook_sq += sum([-piece_tables.TABLE_ROOK_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.ROOK, chess.BLACK)])
-        queen_sq = sum([piece_tables.TABLE_QUEEN_MAIN[i] for i in self.board.pieces(chess.QUEEN, chess.WHITE)])
-        queen_sq += sum([-piece_tables.TABLE_QUEEN_MAIN[chess.square_mirror(i)]
-                        for i in self.board.pieces(chess.QUEEN, chess.BLACK)])
-        king_sq = sum([piece_tables.TABLE_KING_MAIN[i] for i in self.board.pieces(chess.KING, chess.WHITE)])
-        king_sq += sum([-piece_tables.TABLE_KING_MAIN[chess.square_mirror(i)]
-                       for i in self.board.pieces(chess.KING, chess.BLACK)])
-
-        evaluation = material + pawn_sq + knight_sq + bishop_sq + rook_sq + queen_sq + king_sq
-
-        return evaluation if self.board.turn else -evaluation
-
-    def quiesce(self, alpha, beta):
-        """ Apply a Quiescence Search to aid combat the horizon effect """
-        standing_pat = self.evaluation()
-        if standing_pat >= beta:                                      # If current eval >= beta(max score)
-            return beta
-        alpha = max(alpha, standing_pat)                              # Set lower bound
-
-        for move in self.board.legal_moves:                           # For each possible move:
-            if self.board.is_check() or self.board.is_capture(move):
-                self.board.push(move)                                 # Get Move
-                score = -self.quiesce(-beta, -alpha)
-                self.board.pop()                                      # Undo Move
-
-                if score >= beta:
-                    return beta                                       # Return new score
-                alpha = max(alpha, score)                             # Adjust search window
-
-        return alpha
+        self.depth = depth                    # Maximum iterative deepening depth
+        self.search_depth = depth             # Depth of the current iteration
+        self.time_manager = time_manager or timer.TimeManager()  # Deadline, if the game is timed
+        self.best_value = None                # Root score of the last completed iteration
+        self.evaluator = evaluator.IncrementalEvaluator(board)  # Makes/unmakes moves, tracking the score
+        self.quiescence = quiescence.Quiescence(board, self.evaluator, self.evaluator, self.time_manager)
+        self.orderer = move_ordering.MoveOrderer(use_see=True)  # Killer, history and countermove tables
+        self.null_move = null_move            # Null-move pruning setting
+        self.lmr = lmr                        # Late move reductions setting
 
     # Searching the best move using NegaScout Search.
-    def negascout(self, alpha, beta, depth_left):
+    def negascout(self, alpha, beta, depth_left, ply=1):
         """
         Searches the best move using NegaScout, incorporating Alpha-Beta Pruning and NegaMax but adding additional
         NegaScout search and calling the Quiesce search.
         :param alpha: current Alpha score.
         :param beta: current Beta score.
         :param depth_left: search depth remaining.
+        :param ply: distance from the root. Passed down rather than derived from depth_left, which drops faster
+                    than one per ply under reductions.
         :return: best score found.
         """
         best_score = -9999
         b = beta
 
         if depth_left == 0:                                      # If max depth reached:
-            return self.quiesce(alpha, beta)                     # Complete Quiesce Search
-
-        for move in self.board.legal_moves:                      # Loop over all possible moves
-            self.board.push(move)                                # Get current move
-            score = -self.negascout(-b, -alpha, depth_left - 1)  # Iterate
+            terminal_score = terminal.score(self.board, ply=ply)  # Checkmate, stalemate or draw
+            if terminal_score is not None:
+                return terminal_score
+            return self.quiescence.search(alpha, beta, ply)      # Complete Quiesce Search
+        self.time_manager.check()                                # Abort if out of time
+
+        if not terminal.has_legal_move(self.board):              # No legal moves: checkmate or stalemate
+            return terminal.score(self.board, [], ply)
+
+        if self.null_move and selective.null_move_allowed(self.board, depth_left) \
+                and self.evaluator.evaluate() >= beta:           # Null move: pass, and prune if still >= beta
+            self.evaluator.push(chess.Move.null())
+            score = -self.negascout(-beta, -beta + 1, depth_left - 1 - selective.NULL_MOVE_REDUCTION, ply + 1)
+            self.evaluator.pop()
+            if score >= beta:
+                return beta
+
+        moves = self.orderer.order(self.board, self.board.legal_moves, ply)  # Only once the null move fails
+        in_check = self.board.is_check()
+        for index, move in enumerate(moves):                     # Loop over all possible moves, best guess first
+            reduction = selective.reduction(self.board, move, depth_left, index, in_check, self.lmr)  # Late/losing
+            self.evaluator.push(move)                            # Get current move
+            if reduction and self.board.is_check():              # Never reduce a checking move
+                reduction = 0
+            score = -self.negascout(-b, -alpha, depth_left - 1 - reduction, ply + 1)  # Iterate
+            if reduction and score > alpha:                      # Reduced move beat alpha: search at full depth
+                score = -self.negascout(-b, -alpha, depth_left - 1, ply + 1)
 
             # NegaScout Search:
             if score > best_score:
                 if alpha < score < beta:                         # NegaScout condition
                     best_score = max(score, best_score)
                 else:
-                    best_score = -self.negascout(-beta, -score, depth_left - 1)
+                    best_score = -self.negascout(-beta, -score, depth_left - 1, ply + 1)
 
-            self.board.pop()                                     # Undo move
+            self.evaluator.pop()                                 # Undo move
             alpha = max(score, alpha)                            # Adjust search window
             if alpha >= beta:                                    # Alpha Beta Pruning condition
+                self.orderer.cutoff(self.board, move, ply, depth_left, index)
                 return alpha                                     # Prune branch
 
             b = alpha + 1
 
         return best_score
 
-    def search_controller(self):
+    def search_root(self, depth, first_move=None):
         """
-        Controls the NegaScout and Quiesce search.
+        Searches every root move to the given depth.
+        :param depth: search depth.
+        :param first_move: move to search first (the best move from the previous iteration).
         :return: best move found.
         """
         best_move = chess.Move.null()
         best_value = -99999  # Set as INF (essentially)
         alpha = -100000      # Set as INF (essentially)
         beta = 100000        # Set as INF (essentially)
+        self.search_depth = depth
 
-        for move in self.board.legal_moves:
-            self.board.push(move)
-            board_value = -self.negascout(-beta, -alpha, self.depth - 1)
+        for move in self.orderer.order(self.board, self.board.legal_moves, 0, first_move):
+            self.evaluator.push(move)
+            board_value = -self.negascout(-beta, -alpha, depth - 1, 1)
 
             if board_value > best_value:
                 best_value = board_value
                 best_move = move
             alpha = max(board_value, alpha)
 
-            self.board.pop()
+            self.evaluator.pop()
 
+        self.best_value = best_value
         return best_move
 
+    def search_controller(self):
+        """
+        Controls the NegaScout and Quiesce search. Iterative deepening up to self.depth, or until the time budget
+        runs out.
+        :return: search_result.SearchResult, with the best move from the last completed iteration.
+        """
+        result = search_result.SearchResult()
+        result.move = chess.Move.null()
+        root_ply = len(self.board.move_stack)
+        self.orderer.new_search()
+        self.quiescence.nodes = 0
+        self.time_manager.start()
+
+        for depth in range(self.time_manager.first_depth(self.depth), self.depth + 1):
+            try:
+                best_move = self.search_root(depth, result.move)
+            except timer.SearchTimeout:       # Out of time: discard the unfinished iteration
+                self.evaluator.unwind(root_ply)
+                break
+            result.complete_iteration(depth, best_move, self.best_value)
+            if not self.time_manager.iteration_complete(depth, best_move, self.best_value):
+                break
+
+        result.finish(self.time_manager, self.orderer)
+        result.q_nodes = self.quiescence.nodes
+        return result
 
 """
 Gaikwad, A. (2020). Let’s create a Chess AI. [ONLINE] Medium.
@@ -0,0 +1,266 @@
+import argparse
+import concurrent.futures
+import time
+import chess
+import constants
+import moves
+import zobrist
+
+"""
+Perft: counts the leaf nodes of the legal move tree to a fixed depth, to test and time move generation. The last
+ply is bulk counted (the number of legal moves, without making them), transpositions can be looked up in a hash
+table keyed by Zobrist key, and the root moves can be split over processes.
+It can also cross-check the GUI's move highlighter (moves.moves_controller) against python-chess's legal moves at
+every position where moves are generated.
+Run with: python perft.py [--fen FEN] [--depth N] [--divide] [--hash] [--workers N] [--check-highlighter]
+"""
+
+# Reference positions with known node counts (Chess Programming Wiki, Perft Results)
+PERFT_POSITIONS = [
+    ('startpos', chess.STARTING_FEN, {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', {1: 48, 2: 2039, 3: 97862}),
+    ('position 3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', {1: 14, 2: 191, 3: 2812, 4: 43238}),
+    ('position 4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', {1: 6, 2: 264, 3: 9467}),
+    ('position 5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', {1: 44, 2: 1486, 3: 62379}),
+]
+MAX_EXAMPLES = 5          # Highlighter mismatches listed in the report
+
+# Piece identifiers of the GUI board array, in the order moves.moves_controller expects
+PIECE_ARRAYS = {chess.WHITE: [constants.PAWN_W, constants.ROOK_W, constants.KNIGHT_W,
+                              constants.BISHOP_W, constants.QUEEN_W, constants.KING_W],
+                chess.BLACK: [constants.PAWN_B, constants.ROOK_B, constants.KNIGHT_B,
+                              constants.BISHOP_B, constants.QUEEN_B, constants.KING_B]}
+ARRAY_INDEX = {chess.PAWN: 0, chess.ROOK: 1, chess.KNIGHT: 2, chess.BISHOP: 3, chess.QUEEN: 4, chess.KING: 5}
+
+
+def array_square(square):
+    """
+    :param square: python-chess square.
+    :return: (row, column) of the square in the GUI board array.
+    """
+    return 7 - chess.square_rank(square), chess.square_file(square)
+
+
+def square_names(array_squares):
+    """
+    :param array_squares: (row, column) squares of the GUI board array.
+    :return: sorted list of square names.
+    """
+    return sorted(chess.square_name(chess.square(col, 7 - row)) for row, col in array_squares)
+
+
+def board_array(board):
+    """
+    GUI board array (as kept by game.Game) for a board.
+    :param board: board state.
+    :return: 8x8 list of piece identifiers, row 0 being the eighth rank.
+    """
+    array = [[constants.BLANK] * 8 for _ in range(8)]
+    for square, piece in board.piece_map().items():
+        row, col = array_square(square)
+        array[row][col] = PIECE_ARRAYS[piece.color][ARRAY_INDEX[piece.piece_type]]
+    return array
+
+
+def check_highlighter(board):
+    """
+    Compare the squares the GUI highlights for each piece of the side to move with its legal moves.
+    :param board: board state.
+    :return: list of (FEN, square, legal targets not highlighted, highlighted targets not legal) tuples, squares
+             by name.
+    """
+    array = board_array(board)
+    piece_array = PIECE_ARRAYS[board.turn]
+    legal = {}
+    for move in board.legal_moves:
+        legal.setdefault(move.from_square, set()).add(array_square(move.to_square))
+
+    mismatches = []
+    for square in chess.SquareSet(board.occupied_co[board.turn]):
+        row, col = array_square(square)
+        targets = moves.moves_controller(piece_array, array[row][col], (row, col), array, board.turn) or set()
+        highlighted = {(x, y) for x, y in targets if array[x][y] not in piece_array}  # As filtered by the GUI
+        legal_targets = legal.get(square, set())
+        if highlighted != legal_targets:
+            mismatches.append((board.fen(), chess.square_name(square), square_names(legal_targets - highlighted),
+                               square_names(highlighted - legal_targets)))
+    return mismatches
+
+
+class Perft:
+    """
+    Perft counter for one process.
+    """
+    def __init__(self, board, use_hash=False, highlighter=False):
+        """
+        :param board: board state.
+        :param use_hash: True to look up transpositions in a hash table.
+        :param highlighter: True to cross-check moves.moves_controller at every position that generates moves.
+        """
+        self.board = board
+        self.hasher = zobrist.ZobristTracker(board) if use_hash else None
+        self.table = {}                     # (Zobrist key, depth) -> leaf count
+        self.highlighter = highlighter
+        self.positions_checked = 0
+        self.mismatches = []                # From check_highlighter
+
+    def push(self, move):
+        if self.hasher:
+            self.hasher.push(move)
+        else:
+            self.board.push(move)
+
+    def pop(self):
+        if self.hasher:
+            self.hasher.pop()
+        else:
+            self.board.pop()
+
+    def count(self, depth):
+        """
+        Count the leaf nodes to a depth.
+        :param depth: remaining depth.
+        :return: leaf count.
+        """
+        if depth == 0:
+            return 1
+        if self.highlighter:
+            self.positions_checked += 1
+            self.mismatches += check_highlighter(self.board)
+        if depth == 1:                      # Bulk count: the leaves themselves are never made
+            return self.board.legal_moves.count()
+
+        if self.hasher:
+            table_key = (self.hasher.key, depth)
+            if table_key in self.table:
+                return self.table[table_key]
+
+        nodes = 0
+        for move in self.board.legal_moves:
+            self.push(move)
+            nodes += self.count(depth - 1)
+            self.pop()
+
+        if self.hasher:
+            self.table[table_key] = nodes
+        return nodes
+
+
+def perft_move(fen, move_uci, depth, use_hash, highlighter):
+    """
+    Count the leaves below one root move. Runs in a worker process for a root split.
+    :param fen: root position.
+    :param move_uci: root move, in UCI notation.
+    :param depth: perft depth of the root.
+    :param use_hash: True to use a hash table.
+    :param highlighter: True to cross-check the highlighter.
+    :return: (leaf count, positions checked, highlighter mismatches) tuple.
+    """
+    board = chess.Board(fen)
+    board.push_uci(move_uci)
+    counter = Perft(board, use_hash, highlighter)
+    return counter.count(depth - 1), counter.positions_checked, counter.mismatches
+
+
+def run_perft(fen, depth, use_hash=False, workers=1, highlighter=False):
+    """
+    Run perft on a position, divided by root move.
+    :param fen: position.
+    :param depth: perft depth, at least 1.
+    :param use_hash: True to use a hash table (one per process).
+    :param workers: processes to split the root moves over.
+    :param highlighter: True to cross-check the highlighter.
+    :return: report dict: nodes, seconds, nps, divide (root move -> count), positions checked and mismatches.
+    """
+    board = chess.Board(fen)
+    root_moves = [move.uci() for move in board.legal_moves]
+    start = time.perf_counter()
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(perft_move, [fen] * len(root_moves), root_moves, [depth] * len(root_moves),
+                                        [use_hash] * len(root_moves), [highlighter] * len(root_moves)))
+    else:                                   # One counter, so the hash table is shared by all root moves
+        counter = Perft(board, use_hash, highlighter)
+        results = []
+        for move_uci in root_moves:
+            counter.positions_checked, counter.mismatches = 0, []
+            counter.push(chess.Move.from_uci(move_uci))
+            results.append((counter.count(depth - 1), counter.positions_checked, counter.mismatches))
+            counter.pop()
+    seconds = time.perf_counter() - start
+
+    root_mismatches = check_highlighter(board) if highlighter else []
+    nodes = sum(count for count, _, _ in results)
+    return {
+        'fen': fen,
+        'depth': depth,
+        'nodes': nodes,
+        'seconds': seconds,
+        'nps': nodes / seconds if seconds else 0.0,
+        'divide': {move_uci: count for move_uci, (count, _, _) in zip(root_moves, results)},
+        'positions_checked': sum(checked for _, checked, _ in results) + (1 if highlighter else 0),
+        'mismatches': root_mismatches + [mismatch for _, _, found in results for mismatch in found],
+    }
+
+
+def format_report(report, divide=False):
+    """
+    :param report: report dict from run_perft.
+    :param divide: True to list the count for each root move.
+    :return: human-readable report.
+    """
+    lines = ['{}: {}'.format(move_uci, count) for move_uci, count in report['divide'].items()] if divide else []
+    lines.append('perft {}: {} nodes in {:.2f}s ({:.0f} nps)'.format(report['depth'], report['nodes'],
+                                                                     report['seconds'], report['nps']))
+    if report['positions_checked']:
+        mismatches = report['mismatches']
+        lines.append('highlighter: {} positions checked, {} pieces mismatched ({} with legal moves missing, '
+                     '{} with illegal moves shown)'.format(report['positions_checked'], len(mismatches),
+                                                           sum(1 for _, _, missing, _ in mismatches if missing),
+                                                           sum(1 for _, _, _, extra in mismatches if extra)))
+        for fen, square, missing, extra in mismatches[:MAX_EXAMPLES]:
+            lines.append('  {} {}: missing {} extra {}'.format(fen, square, ' '.join(missing) or '-',
+                                                               ' '.join(extra) or '-'))
+    return '\n'.join(lines)
+
+
+def run_suite(max_depth, use_hash=False, workers=1):
+    """
+    Check the reference positions against their known counts.
+    :param max_depth: deepest depth to check.
+    :return: True if every count matches.
+    """
+    passed = True
+    for name, fen, expected in PERFT_POSITIONS:
+        for depth, nodes in sorted(expected.items()):
+            if depth > max_depth:
+                continue
+            report = run_perft(fen, depth, use_hash, workers)
+            ok = report['nodes'] == nodes
+            passed = passed and ok
+            print('{:<11} perft {}: {:>8} {} ({:.2f}s, {:.0f} nps)'.format(
+                name, depth, report['nodes'], 'ok' if ok else 'FAIL, expected {}'.format(nodes),
+                report['seconds'], report['nps']), flush=True)
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move generation perft.')
+    parser.add_argument('--fen', default=chess.STARTING_FEN, help='position (default the starting position)')
+    parser.add_argument('--depth', type=int, default=3, help='perft depth (default 3)')
+    parser.add_argument('--divide', action='store_true', help='list the count for each root move')
+    parser.add_argument('--hash', action='store_true', help='look up transpositions in a hash table')
+    parser.add_argument('--workers', type=int, default=1, help='processes to split the root moves over')
+    parser.add_argument('--check-highlighter', action='store_true',
+                        help='cross-check moves.moves_controller against the legal moves')
+    parser.add_argument('--suite', action='store_true', help='check the reference positions up to --depth')
+    args = parser.parse_args()
+
+    if args.suite:
+        raise SystemExit(0 if run_suite(args.depth, args.hash, args.workers) else 1)
+    report = run_perft(args.fen, max(1, args.depth), args.hash, args.workers, args.check_highlighter)
+    print(format_report(report, args.divide))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import collections
+import cProfile
+import datetime
+import os
+import pstats
+import sys
+import threading
+import time
+import constants
+
+"""
+Opt-in profiling of engine searches, switched on with the BMCAI_PROFILE environment variable ('sample' or
+'cprofile') or the 'Profiling Settings' menu option. The search worker wraps each search in a StackSampler (low
+overhead: collapsed stacks for flamegraph.pl or speedscope) or cProfile (exact call counts, for pstats or snakeviz).
+Each game writes its profiles to a new folder under constants.PROFILE_DIR, with an index of the algorithm, depth
+and FEN of every search. The index entry is written before the search starts and the sampler rewrites its .folded
+file every FLUSH_INTERVAL, so a search that hangs and is killed (SearchWorker.cancel) still leaves its tag and hot
+path on disk. cProfile can only write its stats once profiling stops, so a killed search loses its cProfile data.
+"""
+
+SAMPLE_INTERVAL = 0.001             # Seconds between stack samples
+FLUSH_INTERVAL = 1.0                # Seconds between rewrites of a running search's .folded file
+STATS_LINES = 40                    # Functions listed in each cProfile text report
+ENV_MODES = {'sample': 'Sampler', 'sampler': 'Sampler', '1': 'Sampler', 'on': 'Sampler', 'true': 'Sampler',
+             'cprofile': 'cProfile'}
+
+
+def mode_from_env():
+    """
+    :return: profiling mode set by the BMCAI_PROFILE environment variable, from constants.PROFILE_LIST.
+    """
+    return ENV_MODES.get(os.environ.get(constants.PROFILE_ENV, '').strip().lower(), 'Off')
+
+
+def frame_label(code):
+    """
+    :param code: code object of a stack frame.
+    :return: flamegraph frame name, e.g. 'alpha_beta (negamaxab.py:42)'.
+    """
+    return '{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class StackSampler:
+    """
+    Samples one thread's stack at a fixed interval from a background thread, and counts each collapsed stack
+    (frames root first, joined by ';'). Given an output path, the sampling thread also rewrites the collapsed
+    stacks there every flush_interval, and once more when stopped.
+    """
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL, output_path=None, flush_interval=FLUSH_INTERVAL):
+        """
+        :param thread_id: thread to sample, default the calling thread.
+        :param interval: seconds between samples.
+        :param output_path: .folded file to keep up to date, or None.
+        :param flush_interval: seconds between rewrites of output_path.
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.output_path = output_path
+        self.flush_interval = flush_interval
+        self.counts = collections.Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.sample_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def sample_loop(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+            if self.output_path and time.monotonic() >= next_flush:  # Survives the process being killed
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+        if self.output_path:
+            self.flush()
+
+    def flush(self):
+        """
+        Rewrite output_path with the stacks so far. Written to a temporary file and renamed, so a kill mid-write
+        leaves the previous version intact.
+        """
+        temp_path = self.output_path + '.tmp'
+        with open(temp_path, 'w') as folded:
+            folded.write('\n'.join(self.collapsed()) + '\n')
+        os.replace(temp_path, self.output_path)
+
+    def collapsed(self):
+        """
+        :return: collapsed stack lines ('frame;frame;frame count'), most frequent first.
+        """
+        return ['{} {}'.format(stack, count) for stack, count in self.counts.most_common()]
+
+
+class SearchProfiler:
+    """
+    Profiles each search of a search worker and writes one profile per search.
+    Sampler mode writes <search>.folded (kept up to date while the search runs), and appends the same stacks to
+    all_searches.folded for the whole game once it finishes. cProfile mode writes <search>.prof (pstats format) and
+    a <search>.txt report of the top functions, when the search finishes.
+    index.txt gets a 'started' line for each search before it runs, and a line with its time once it finishes.
+    """
+    def __init__(self, mode, output_dir=None):
+        """
+        :param mode: 'Sampler' or 'cProfile'.
+        :param output_dir: folder for the profiles, default a new timestamped folder under constants.PROFILE_DIR.
+        """
+        self.mode = mode
+        self.output_dir = output_dir or os.path.join(constants.PROFILE_DIR,
+                                                     datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f'))
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.searches = 0
+
+    def run(self, search, algorithm, depth, board, is_ponder=False):
+        """
+        Run and profile a search.
+        :param search: callable that runs the search and returns its result.
+        :param algorithm: algorithm name, for the tag.
+        :param depth: search depth, for the tag.
+        :param board: board state searched, for the tag.
+        :param is_ponder: True for a ponder search.
+        :return: the search's result.
+        """
+        self.searches += 1
+        name = '{:03d}_move{}_{}{}'.format(self.searches, board.fullmove_number,
+                                           'white' if board.turn else 'black', '_ponder' if is_ponder else '')
+        tag = 'algorithm={} depth={} fen={}{}'.format(algorithm, depth, board.fen(), ' ponder' if is_ponder else '')
+        path = os.path.join(self.output_dir, name)
+        self.write_index(name, 'started', tag)                       # Tagged even if the search is killed
+        start = time.perf_counter()
+
+        if self.mode == 'cProfile':
+            profile = cProfile.Profile()
+            result = profile.runcall(search)
+            profile.dump_stats(path + '.prof')
+            with open(path + '.txt', 'w') as report:
+                report.write(tag + '\n\n')
+                pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(STATS_LINES)
+        else:
+            sampler = StackSampler(output_path=path + '.folded')
+            sampler.start()
+            try:
+                result = search()
+            finally:
+                sampler.stop()                                      # Writes the final <search>.folded
+            lines = sampler.collapsed()
+            with open(os.path.join(self.output_dir, 'all_searches.folded'), 'a') as folded:
+                folded.write('\n'.join(lines) + '\n')
+
+        self.write_index(name, '{:.3f}s'.format(time.perf_counter() - start), tag)
+        return result
+
+    def write_index(self, name, status, tag):
+        """
+        Append a line to index.txt.
+        :param name: search file name, without extension.
+        :param status: 'started', or the search time once finished.
+        :param tag: algorithm, depth and FEN of the search.
+        """
+        with open(os.path.join(self.output_dir, 'index.txt'), 'a') as index:
+            index.write('{}\t{}\t{}\n'.format(name, status, tag))
@@ -0,0 +1,121 @@
+import chess
+import constants
+import move_ordering
+import see
+
+"""
+Quiescence search shared by NegaScout and MTD(f). At the leaves of the main search only captures and queen
+promotions are searched (generated directly, ordered MVV-LVA), so the static evaluation is only trusted in quiet
+positions. Hopeless captures are skipped by delta pruning and captures that lose material (see.py) are not searched.
+Check evasions are searched for the first MAX_CHECK_PLY plies so mates at the horizon are seen. Scores are
+fail-soft, as MTD(f) needs.
+"""
+
+DELTA_MARGIN = 200                # Centipawns: skip captures that can't lift the score to alpha even with this margin
+MAX_CHECK_PLY = 2                 # Quiescence plies in which every check evasion is searched
+PROMOTION_GAIN = constants.PIECE_VALUE[chess.QUEEN - 1] - constants.PIECE_VALUE[chess.PAWN - 1]
+PROMOTION_RANKS = {chess.WHITE: (chess.BB_RANK_7, chess.BB_RANK_8), chess.BLACK: (chess.BB_RANK_2, chess.BB_RANK_1)}
+
+
+def capture_gain(board, move):
+    """
+    Material won by a capture or promotion, ignoring any recapture.
+    :param board: board state.
+    :param move: capture or promotion.
+    :return: centipawns.
+    """
+    victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+    gain = constants.PIECE_VALUE[victim - 1] if victim else 0
+    if move.promotion:
+        gain += PROMOTION_GAIN
+    return gain
+
+
+def noisy_moves(board):
+    """
+    Legal captures and queen promotions, best first by MVV-LVA.
+    :param board: board state.
+    :return: ordered list of moves.
+    """
+    seventh_rank, last_rank = PROMOTION_RANKS[board.turn]
+    moves = [move for move in board.generate_legal_captures() if move.promotion in (None, chess.QUEEN)]
+    moves += [move for move in board.generate_legal_moves(board.pawns & board.occupied_co[board.turn] & seventh_rank,
+                                                          last_rank & ~board.occupied)
+              if move.promotion == chess.QUEEN]
+    piece_type_at = board.piece_type_at
+
+    def score(move):
+        victim = piece_type_at(move.to_square) or (chess.PAWN if board.is_en_passant(move) else 0)
+        return move_ordering.mvv_lva(victim, piece_type_at(move.from_square)) + (move.promotion or 0) * 64
+
+    return sorted(moves, key=score, reverse=True)
+
+
+class Quiescence:
+    """
+    Quiescence search for one engine's search. Moves are made through the engine's make/unmake layer, so its
+    incremental score (and Zobrist key, for MTD(f)) stay in step.
+    """
+    def __init__(self, board, mover, scorer, time_manager, mate_score=constants.MATE_SCORE):
+        """
+        :param board: board state.
+        :param mover: push/pop layer of the engine (evaluator.IncrementalEvaluator or zobrist.ZobristTracker).
+        :param scorer: evaluator.IncrementalEvaluator giving the stand-pat score.
+        :param time_manager: timer.TimeManager of the search, checked at every node.
+        :param mate_score: the engine's score for delivering checkmate.
+        """
+        self.board = board
+        self.mover = mover
+        self.scorer = scorer
+        self.time_manager = time_manager
+        self.mate_score = mate_score
+        self.nodes = 0                    # Quiescence nodes this search
+
+    def search(self, alpha, beta, ply=0, q_ply=0):
+        """
+        Search captures and promotions (and check evasions near the horizon) until the position is quiet.
+        The caller has already checked the position is not game over.
+        :param alpha: lower bound.
+        :param beta: upper bound.
+        :param ply: distance from the search root, for mate scores.
+        :param q_ply: quiescence depth so far.
+        :return: fail-soft score, for the side to move.
+        """
+        self.time_manager.check()                                     # Abort if out of time
+        self.nodes += 1
+        board = self.board
+
+        if q_ply < MAX_CHECK_PLY and board.is_check():                # In check: standing pat isn't an option
+            best_score = -(self.mate_score - ply)                     # Checkmated if nothing gets out of check
+            for move in board.legal_moves:
+                self.mover.push(move)
+                score = -self.search(-beta, -max(alpha, best_score), ply + 1, q_ply + 1)
+                self.mover.pop()
+                if score > best_score:
+                    best_score = score
+                    if score >= beta:
+                        break
+            return best_score
+
+        stand_pat = best_score = self.scorer.evaluate()
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        for move in noisy_moves(board):
+            optimistic = stand_pat + capture_gain(board, move) + DELTA_MARGIN
+            if optimistic <= alpha:                                   # Delta pruning: can't reach alpha
+                best_score = max(best_score, optimistic)              # Still a valid upper bound for the node
+                continue
+            if see.is_losing_capture(board, move):                    # SEE pruning: the exchange loses material
+                continue
+            self.mover.push(move)
+            score = -self.search(-beta, -alpha, ply + 1, q_ply + 1)
+            self.mover.pop()
+            if score > best_score:
+                best_score = score
+                if score >= beta:
+                    break
+                alpha = max(alpha, score)
+
+        return best_score
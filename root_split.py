@@ -0,0 +1,134 @@
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import chess
+import negamax
+import negamaxab
+import move_ordering
+import timer
+
+"""
+Parallel root splitting for NegaMax and NegaMax & Alpha-Beta. Each root move's subtree is searched by a process
+pool worker. Alpha-Beta workers share the best root score found so far, so subtrees searched later still prune.
+Results are merged in root move order, so ties go to the same move as the single-process search.
+"""
+
+ROOT_WINDOW = 100000      # Matches the engines' root search window (-100000, 100000)
+ROOT_BEST = -99999        # Matches the engines' initial root best score
+
+_pools = {}               # Worker count -> (executor, shared alpha). Kept alive between searches.
+_shared_alpha = None      # Shared alpha, in each pool worker
+_orderer = None           # Killer and history tables, kept by each pool worker between subtrees
+
+
+def exit_with_parent():
+    """
+    Pool worker watchdog: exit as soon as the process that owns the pool dies (such as a cancelled search worker).
+    """
+    multiprocessing.parent_process().join()
+    os._exit(0)
+
+
+def init_worker(shared_alpha):
+    """
+    Pool worker initializer.
+    :param shared_alpha: multiprocessing.Value holding the best root score found so far.
+    """
+    global _shared_alpha, _orderer
+    _shared_alpha = shared_alpha
+    _orderer = move_ordering.MoveOrderer()
+    if multiprocessing.parent_process() is not None:
+        threading.Thread(target=exit_with_parent, daemon=True).start()
+
+
+def get_pool(workers):
+    """
+    Process pool for the given number of workers, created on first use.
+    :param workers: number of worker processes.
+    :return: (executor, shared alpha) tuple.
+    """
+    if workers not in _pools:
+        shared_alpha = multiprocessing.Value('i', -ROOT_WINDOW)
+        executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=init_worker, initargs=(shared_alpha,))
+        _pools[workers] = executor, shared_alpha
+    return _pools[workers]
+
+
+def search_root_move(is_alpha_beta, root_fen, move_stack, move_uci, depth, limits, batch_frontier):
+    """
+    Pool task: search one root move's subtree.
+    :param is_alpha_beta: True for NegaMax & Alpha-Beta, False for NegaMax.
+    :param root_fen: FEN of the position the game started from.
+    :param move_stack: moves played since, in UCI notation.
+    :param move_uci: root move to search.
+    :param depth: root search depth.
+    :param limits: timer.TimeManager.limits() of the root search.
+    :param batch_frontier: engine batch_frontier setting.
+    :return: (score from the root side, nodes searched) tuple.
+    """
+    board = chess.Board(root_fen)
+    for uci in move_stack:
+        board.push_uci(uci)
+    time_manager = timer.TimeManager.resume(limits)
+
+    if not is_alpha_beta:
+        engine = negamax.NegamaxEngine(board, depth, batch_frontier, time_manager)
+        engine.evaluator.push(chess.Move.from_uci(move_uci))
+        return -engine.negamax(depth - 1), time_manager.nodes
+
+    engine = negamaxab.NegamaxAbEngine(board, depth, batch_frontier, time_manager)
+    engine.orderer = _orderer
+    engine.search_depth = depth
+    alpha = _shared_alpha.value - 1      # One below: a score equal to the best is then exact, so ties merge correctly
+    engine.evaluator.push(chess.Move.from_uci(move_uci))
+    score = -engine.alpha_beta(-ROOT_WINDOW, -alpha, depth - 1)
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return score, time_manager.nodes
+
+
+def search_root(engine, moves, depth, is_alpha_beta):
+    """
+    Search the root moves in parallel. Alpha-Beta searches the first (best ordered) move in this process first,
+    to set a bound for the rest.
+    :param engine: NegamaxEngine or NegamaxAbEngine, with threads > 1.
+    :param moves: root moves, in search order.
+    :param depth: search depth.
+    :param is_alpha_beta: True for NegaMax & Alpha-Beta.
+    :return: best move found.
+    """
+    if not moves:
+        return chess.Move.null()
+    executor, shared_alpha = get_pool(engine.threads)
+    board = engine.board
+    scores = []
+
+    if is_alpha_beta:
+        engine.evaluator.push(moves[0])
+        scores.append(-engine.alpha_beta(-ROOT_WINDOW, ROOT_WINDOW, depth - 1))
+        engine.evaluator.pop()
+        shared_alpha.value = scores[0]
+    else:
+        shared_alpha.value = -ROOT_WINDOW
+
+    root_fen = board.root().fen()
+    move_stack = [move.uci() for move in board.move_stack]
+    limits = engine.time_manager.limits()
+    futures = [executor.submit(search_root_move, is_alpha_beta, root_fen, move_stack, move.uci(), depth, limits,
+                               engine.batch_frontier)
+               for move in moves[len(scores):]]
+    for future in futures:
+        score, nodes = future.result()   # Re-raises timer.SearchTimeout from a worker
+        scores.append(score)
+        engine.time_manager.nodes += nodes
+
+    best_move = chess.Move.null()
+    best_value = ROOT_BEST
+    for move, score in zip(moves, scores):  # Merge in root order: the first of equal scores wins
+        if score > best_value:
+            best_value = score
+            best_move = move
+    engine.best_value = best_value
+    return best_move
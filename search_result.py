@@ -0,0 +1,84 @@
+"""
+Result of a search, returned by every engine's search_controller: the move found and the statistics of the search
+that found it.
+"""
+
+
+class SearchResult:
+    """
+    Best move, score and depth of the last completed iteration, plus node, transposition table and cutoff counts.
+    Counters an engine doesn't have (such as TT probes for NegaMax) stay at 0.
+    """
+    def __init__(self):
+        self.move = None                      # Best move, or a null move if there is no legal move
+        self.score = None                     # Score of the best move, for the side to move
+        self.depth = 0                        # Depth of the last completed iteration
+        self.nodes = 0                        # Nodes searched, including quiescence nodes
+        self.q_nodes = 0                      # Quiescence search nodes
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0                   # Nodes answered straight from the transposition table
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0           # Beta cutoffs caused by the first move searched
+        self.mtd_passes = 0                   # Null-window searches made by MTD(f)
+        self.seconds = 0.0
+
+    @property
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def complete_iteration(self, depth, move, score):
+        """
+        Record a completed iterative deepening iteration.
+        :param depth: depth of the iteration.
+        :param move: best move found.
+        :param score: score of the best move.
+        """
+        self.depth = depth
+        self.move = move
+        self.score = score
+
+    def finish(self, time_manager, orderer=None, trans_table=None):
+        """
+        Collect the counters kept elsewhere once the search has ended.
+        :param time_manager: timer.TimeManager of the search (nodes and elapsed time).
+        :param orderer: move_ordering.MoveOrderer of the search, if any (beta cutoffs).
+        :param trans_table: t_table.TransTable of the search, if any (probes and hits).
+        """
+        self.nodes = time_manager.nodes
+        self.seconds = time_manager.elapsed()
+        if orderer:
+            self.beta_cutoffs = orderer.cutoffs
+            self.first_move_cutoffs = orderer.first_move_cutoffs
+        if trans_table:
+            self.tt_probes = trans_table.probes
+            self.tt_hits = trans_table.hits
+
+    def summary(self):
+        """
+        Format string for the GUI search statistics element.
+        :return: one statistic per line.
+        """
+        lines = ['Move:    {}'.format(self.move.uci() if self.move else '-'),
+                 'Score:   {}'.format(self.score if self.score is not None else '-'),
+                 'Depth:   {}'.format(self.depth),
+                 'Nodes:   {:,}'.format(self.nodes),
+                 'Q-nodes: {:,}'.format(self.q_nodes),
+                 'Time:    {:.2f}s'.format(self.seconds),
+                 'NPS:     {:,.0f}'.format(self.nps),
+                 'Cutoffs: {:,}'.format(self.beta_cutoffs),
+                 '1st cut: {:.0%}'.format(self.first_move_cutoff_rate)]
+        if self.tt_probes:
+            lines += ['TT hits: {:,}/{:,} ({:.0%})'.format(self.tt_hits, self.tt_probes, self.tt_hit_rate),
+                      'TT cuts: {:,}'.format(self.tt_cutoffs)]
+        if self.mtd_passes:
+            lines.append('Passes:  {}'.format(self.mtd_passes))
+        return '\n'.join(lines)
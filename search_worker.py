@@ -0,0 +1,325 @@
+import atexit
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import chess
+import chess.polyglot
+import negamax
+import negamaxab
+import negascout
+import mtdf
+import lazy_smp
+import profiler
+import t_table
+import timer
+
+"""
+Runs the engine search in a background process, so the GUI event loop keeps running (clocks, 'End Game', closing
+the window) while the engine thinks. The worker process is kept alive between moves, which also keeps the MTD(f)
+transposition table warm.
+With pondering on, the worker also searches the player's predicted reply during the player's turn. A ponder hit
+turns that search into the engine's own; a miss aborts it.
+With more than one thread, MTD(f) runs Lazy SMP (helper processes sharing its table), and NegaMax and
+NegaMax & Alpha-Beta split the root moves over a process pool.
+"""
+
+SHUTDOWN_TIMEOUT = 0.5   # Seconds an idle worker gets to exit cleanly before it is killed
+LISTEN_TIMEOUT = 0.5     # Seconds between the result listener's checks that its worker is still alive
+PREDICT_DEPTH = 2        # Alpha-Beta depth used to predict the player's reply when there is no TT move
+
+
+def create_engine(algorithm, board, depth, trans_table=None, time_manager=None, smp_pool=None, threads=1,
+                  null_move=True, lmr=True):
+    """
+    Engine factory.
+    :param algorithm: algorithm name, from constants.ALGORITHM_LIST.
+    :param board: board state.
+    :param depth: maximum search depth.
+    :param trans_table: transposition table to reuse between moves (MTD(f) only).
+    :param time_manager: timer.TimeManager with the move's time budget, or None for a fixed depth search.
+    :param smp_pool: lazy_smp.LazySmpPool sharing trans_table (MTD(f) only), or None for a single thread.
+    :param threads: processes for a parallel root split (NegaMax and NegaMax & Alpha-Beta only).
+    :param null_move: null-move pruning (NegaScout and MTD(f) only).
+    :param lmr: late move reductions (NegaScout and MTD(f) only).
+    :return: engine object.
+    """
+    if algorithm == 'NegaMax':
+        return negamax.NegamaxEngine(board, depth, time_manager=time_manager, threads=threads)
+    elif algorithm == 'NegaMax & Alpha-Beta':
+        return negamaxab.NegamaxAbEngine(board, depth, time_manager=time_manager, threads=threads)
+    elif algorithm == 'NegaScout & Quiesce':
+        return negascout.NegaScoutEngine(board, depth, time_manager=time_manager, null_move=null_move, lmr=lmr)
+    return mtdf.MTDfEngine(board, depth, trans_table, time_manager, smp_pool, null_move, lmr)  # Else use MTD(f)
+
+
+def run_search(engine, board):
+    """
+    Run a search to completion.
+    :param engine: engine object from create_engine.
+    :param board: board state the engine was created with.
+    :return: search_result.SearchResult; its move is None if there is no legal move.
+    """
+    if isinstance(engine, mtdf.MTDfEngine):
+        result = engine.search_controller(board)
+    else:
+        result = engine.search_controller()
+    result.move = result.move or None                           # Null move means no legal move
+    return result
+
+
+def board_from_request(root_fen, move_stack):
+    """
+    Rebuild a board from its starting position and moves, so repetition history is kept.
+    :param root_fen: FEN of the position the game started from.
+    :param move_stack: moves played since, in UCI notation.
+    :return: board state.
+    """
+    board = chess.Board(root_fen)
+    for uci in move_stack:
+        board.push_uci(uci)
+    return board
+
+
+def predict_reply(board, move, trans_table=None):
+    """
+    Predict the player's reply to a move: the TT move for the resulting position if there is one, otherwise the
+    best move from a shallow Alpha-Beta search.
+    :param board: board state before the move.
+    :param move: move the engine is about to play.
+    :param trans_table: transposition table of the search, if any.
+    :return: predicted reply, or None if the game is over after the move.
+    """
+    board.push(move)
+    reply = None
+    if trans_table is not None:
+        entry = trans_table.probe(chess.polyglot.zobrist_hash(board))
+        if entry and entry.move in board.legal_moves:
+            reply = entry.move
+    if reply is None and not board.is_game_over():
+        reply = negamaxab.NegamaxAbEngine(board, PREDICT_DEPTH).search_controller().move or None
+    board.pop()
+    return reply
+
+
+def uses_smp(algorithm, threads):
+    """
+    :return: True if the search runs Lazy SMP helper processes.
+    """
+    return algorithm == 'MTD(f) - Main' and threads > 1
+
+
+def uses_helpers(algorithm, threads):
+    """
+    :return: True if the search starts processes of its own (Lazy SMP or a parallel root split).
+    """
+    return algorithm != 'NegaScout & Quiesce' and threads > 1
+
+
+def worker_main(algorithm, depth, requests, results, ponder_deadline, predict, threads=1, smp_stop=None,
+                profile='Off', null_move=True, lmr=True):
+    """
+    Worker process loop. Searches each requested position and replies with the move, until sent None.
+    :param algorithm: algorithm name.
+    :param depth: search depth.
+    :param requests: queue of (search id, root FEN, move stack, time budget in ms or None, is ponder search) tuples.
+    :param results: queue of (search id, move, predicted reply, search_result.SearchResult) tuples, moves in UCI
+                    notation or None.
+    :param ponder_deadline: shared deadline for ponder searches, written by the GUI process.
+    :param predict: True to predict the player's reply to each move found (for pondering).
+    :param threads: number of search processes, including this one.
+    :param smp_stop: shared value used to stop Lazy SMP helpers, also written by the GUI process on cancel.
+    :param profile: profiling mode from constants.PROFILE_LIST, 'Off' for no profiling.
+    :param null_move: null-move pruning setting.
+    :param lmr: late move reductions setting.
+    """
+    trans_table, smp_pool = None, None
+    search_profiler = profiler.SearchProfiler(profile) if profile != 'Off' else None
+    if algorithm == 'MTD(f) - Main':
+        trans_table = t_table.TransTable(shared=uses_smp(algorithm, threads))
+    if uses_smp(algorithm, threads):
+        smp_pool = lazy_smp.LazySmpPool(threads - 1, trans_table, smp_stop)
+
+    while True:
+        request = requests.get()
+        if request is None:                                     # Shutdown request
+            break
+        search_id, root_fen, move_stack, budget, is_ponder = request
+        board = board_from_request(root_fen, move_stack)
+        time_manager = timer.SharedTimeManager(ponder_deadline) if is_ponder else timer.TimeManager(budget)
+        engine = create_engine(algorithm, board, depth, trans_table, time_manager, smp_pool, threads, null_move, lmr)
+        if search_profiler:
+            result = search_profiler.run(lambda: run_search(engine, board), algorithm, depth, board, is_ponder)
+        else:
+            result = run_search(engine, board)
+        move = result.move
+        if smp_pool:
+            logging.info('Lazy SMP: %s', lazy_smp.format_report(engine.smp_report))
+        reply = predict_reply(board, move, trans_table) if predict and move else None
+        results.put((search_id, move.uci() if move else None, reply.uci() if reply else None, result))
+
+    if smp_pool:
+        smp_pool.close()
+    if trans_table:
+        trans_table.close()
+
+
+class SearchWorker:
+    """
+    Owns the background search process. The GUI calls search() once, then poll() whenever on_result reports a
+    result, and ponder() after the engine's move has been played.
+    """
+    def __init__(self, algorithm, depth, ponder=False, threads=1, profile='Off', on_result=None, null_move=True,
+                 lmr=True):
+        """
+        :param on_result: optional callable, called from a listener thread each time the worker sends back a result
+                          (e.g. to post a window event), so the caller needn't poll on a timer.
+        """
+        self.algorithm = algorithm
+        self.depth = depth
+        self.ponder_enabled = ponder
+        self.threads = threads
+        self.profile = profile            # Profiling mode of the worker's searches, from constants.PROFILE_LIST
+        self.null_move = null_move        # Null-move pruning setting (NegaScout and MTD(f))
+        self.lmr = lmr                    # Late move reductions setting (NegaScout and MTD(f))
+        self.smp_stop = multiprocessing.RawValue('d', 0.0)  # Lets cancel() stop Lazy SMP helpers
+        self.process = None
+        self.requests, self.results = None, None
+        self.finished = queue.Queue()     # Results forwarded by the listener thread, read by poll()
+        self.on_result = on_result
+        self.search_id = 0                # Replies to older (cancelled) searches are ignored
+        self.best_move = None
+        self.search_result = None         # search_result.SearchResult of the last finished search
+        self.ponder_move = None           # Predicted reply to best_move
+        self.ponder_deadline = multiprocessing.RawValue('d', 0.0)  # Written here, read by the ponder search
+        self.is_pondering = False
+        self.ponder_start = 0.0
+        self.ponder_hits, self.ponder_misses = 0, 0
+        self.ponder_time_saved = 0.0      # Seconds of search done on hits before the player moved
+        atexit.register(self.cancel)      # Non-daemon workers (with helpers) must not outlive the app
+
+    def start(self):
+        """
+        Start the worker process, if it is not already running.
+        """
+        if self.process is not None and self.process.is_alive():
+            return
+        self.requests, self.results = multiprocessing.Queue(), multiprocessing.Queue()
+        daemon = not uses_helpers(self.algorithm, self.threads)  # Daemon processes can't start helpers
+        self.process = multiprocessing.Process(target=worker_main, daemon=daemon,
+                                               args=(self.algorithm, self.depth, self.requests, self.results,
+                                                     self.ponder_deadline, self.ponder_enabled, self.threads,
+                                                     self.smp_stop, self.profile, self.null_move, self.lmr))
+        self.process.start()
+        threading.Thread(target=self.listen, args=(self.process, self.results), daemon=True).start()
+
+    def listen(self, process, results):
+        """
+        Forward one worker process's results to poll() and on_result, until the process exits. Runs on a thread.
+        :param process: worker process.
+        :param results: its results queue.
+        """
+        while process.is_alive() or not results.empty():
+            try:
+                item = results.get(timeout=LISTEN_TIMEOUT)
+            except queue.Empty:
+                continue
+            self.finished.put(item)
+            if self.on_result:
+                self.on_result()
+
+    def search(self, board, budget=None):
+        """
+        Start searching a position. Returns immediately.
+        :param board: board state.
+        :param budget: time budget in ms, or None to search to the full depth.
+        """
+        if self.is_pondering:
+            self.is_pondering = False
+            if board.move_stack and board.peek() == self.ponder_move:  # Ponder hit: carry on with that search
+                self.ponder_hits += 1
+                self.ponder_time_saved += time.monotonic() - self.ponder_start
+                if budget is not None:
+                    self.ponder_deadline.value = time.monotonic() + budget / 1000
+                return
+            self.ponder_misses += 1
+            self.ponder_deadline.value = timer.STOP_SEARCH         # Ponder miss: abort it, the reply is ignored
+
+        self.start()
+        self.search_id += 1
+        self.best_move = None
+        self.requests.put((self.search_id, board.root().fen(), [move.uci() for move in board.move_stack], budget,
+                           False))
+
+    def ponder(self, board):
+        """
+        Start searching the position after the predicted reply. Called once the engine's move has been played.
+        :param board: board state, with the player to move.
+        """
+        if not self.ponder_enabled or self.ponder_move not in board.legal_moves:
+            return
+        self.start()
+        self.search_id += 1
+        self.best_move = None
+        self.ponder_deadline.value = 0.0                             # No deadline until the player moves
+        move_stack = [move.uci() for move in board.move_stack] + [self.ponder_move.uci()]
+        self.requests.put((self.search_id, board.root().fen(), move_stack, None, True))
+        self.is_pondering = True
+        self.ponder_start = time.monotonic()
+
+    def ponder_hit_rate(self):
+        """
+        :return: share of ponder searches where the player made the predicted move.
+        """
+        total = self.ponder_hits + self.ponder_misses
+        return self.ponder_hits / total if total else 0.0
+
+    def poll(self):
+        """
+        Check for a finished search without blocking.
+        :return: True once the search has finished; the move (or None if no legal move) is in best_move and its
+                 statistics in search_result.
+        """
+        while True:
+            try:
+                search_id, uci, reply_uci, result = self.finished.get_nowait()
+            except queue.Empty:
+                return False
+            if search_id == self.search_id:
+                self.best_move = chess.Move.from_uci(uci) if uci else None
+                self.search_result = result
+                self.ponder_move = chess.Move.from_uci(reply_uci) if reply_uci else None
+                return True
+
+    def cancel(self):
+        """
+        Abandon the current search. The worker is killed straight away and restarted on the next search.
+        """
+        self.is_pondering = False
+        self.smp_stop.value = timer.STOP_SEARCH                         # Helpers outlive the worker: stop them
+        self.stop_process(0)
+
+    def close(self):
+        """
+        Shut the worker down at the end of a game.
+        """
+        if self.is_pondering:
+            self.is_pondering = False
+            self.ponder_deadline.value = timer.STOP_SEARCH
+        if self.process is not None and self.process.is_alive():
+            self.requests.put(None)
+        self.stop_process(SHUTDOWN_TIMEOUT)
+
+    def stop_process(self, timeout):
+        """
+        Wait for the worker to exit, then kill it.
+        :param timeout: seconds to wait before killing.
+        """
+        if self.process is None:
+            return
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.process = None
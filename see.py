@@ -0,0 +1,133 @@
+import chess
+import constants
+
+"""
+Static Exchange Evaluation: the material a capture wins or loses once every piece attacking the square has joined
+in, least valuable first, with either side free to stop capturing when it no longer pays. Attackers are found from
+python-chess's attack bitboards against a shrinking occupancy, so sliders behind the pieces that have captured
+(x-rays) join in. Pins and checks are ignored.
+Used to order captures, to prune losing captures in quiescence and to reduce them in the main search, and for the
+GUI's exchange view.
+"""
+
+PIECE_VALUES = [0] + constants.PIECE_VALUE[:5] + [20000]      # By piece type; the king outweighs any exchange
+BAD_CAPTURE_REDUCTION = 1         # Plies a losing capture is searched shallower by in NegaScout and MTD(f)
+REDUCTION_MIN_DEPTH = 3           # Depth remaining below which nothing is reduced
+
+
+def attackers(board, square, occupied):
+    """
+    Pieces of either colour attacking a square, for a given occupancy.
+    :param board: board state.
+    :param square: target square.
+    :param occupied: occupancy bitboard (pieces that have already captured are removed).
+    :return: attacker bitboard.
+    """
+    rank_pieces = chess.BB_RANK_MASKS[square] & occupied
+    file_pieces = chess.BB_FILE_MASKS[square] & occupied
+    diag_pieces = chess.BB_DIAG_MASKS[square] & occupied
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
+    return occupied & (
+        (chess.BB_KING_ATTACKS[square] & board.kings) |
+        (chess.BB_KNIGHT_ATTACKS[square] & board.knights) |
+        (chess.BB_RANK_ATTACKS[square][rank_pieces] & queens_and_rooks) |
+        (chess.BB_FILE_ATTACKS[square][file_pieces] & queens_and_rooks) |
+        (chess.BB_DIAG_ATTACKS[square][diag_pieces] & queens_and_bishops) |
+        (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]) |
+        (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE]))
+
+
+def least_valuable(board, attacker_mask):
+    """
+    :param board: board state.
+    :param attacker_mask: attackers of one colour (non-empty).
+    :return: (square, piece type) of the least valuable attacker.
+    """
+    for piece_type, pieces in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights),
+                               (chess.BISHOP, board.bishops), (chess.ROOK, board.rooks),
+                               (chess.QUEEN, board.queens), (chess.KING, board.kings)):
+        subset = attacker_mask & pieces
+        if subset:
+            return chess.lsb(subset), piece_type
+
+
+def see(board, move):
+    """
+    Static exchange evaluation of a capture (or any move) for the side making it.
+    :param board: board state before the move.
+    :param move: pseudo-legal move.
+    :return: material gained in centipawns (negative if the exchange loses material).
+    """
+    to_sq = move.to_square
+    occupied = board.occupied ^ chess.BB_SQUARES[move.from_square]
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+        occupied ^= chess.BB_SQUARES[to_sq - 8 if board.turn == chess.WHITE else to_sq + 8]
+    else:
+        victim = board.piece_type_at(to_sq) or 0
+
+    gains = [PIECE_VALUES[victim]]
+    on_square = move.promotion or board.piece_type_at(move.from_square)  # Piece the next capture would win
+    if move.promotion:
+        gains[0] += PIECE_VALUES[move.promotion] - PIECE_VALUES[chess.PAWN]
+    side = not board.turn
+
+    while True:
+        side_attackers = attackers(board, to_sq, occupied) & board.occupied_co[side]
+        if not side_attackers:
+            break
+        square, piece_type = least_valuable(board, side_attackers)
+        occupied ^= chess.BB_SQUARES[square]
+        if piece_type == chess.KING and attackers(board, to_sq, occupied) & board.occupied_co[not side]:
+            break                                                       # The king can't capture a defended piece
+        gains.append(PIECE_VALUES[on_square] - gains[-1])              # Gain if this side captures and is recaptured
+        on_square = piece_type
+        side = not side
+
+    while len(gains) > 1:                                               # Either side may stop capturing instead
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+
+def is_losing_capture(board, move):
+    """
+    Cheap test for a capture that loses material. Captures by a piece worth no more than its victim never lose,
+    so SEE only runs for the rest.
+    :param board: board state before the move.
+    :param move: capture.
+    :return: True if the exchange loses material.
+    """
+    victim = board.piece_type_at(move.to_square) or chess.PAWN              # Empty target: en passant
+    if PIECE_VALUES[board.piece_type_at(move.from_square)] <= PIECE_VALUES[victim]:
+        return False
+    return see(board, move) < 0
+
+
+def capture_reduction(board, move, depth_left, move_index):
+    """
+    Depth reduction for a move in the main search: losing captures, other than the first move, are searched
+    BAD_CAPTURE_REDUCTION plies shallower. The caller re-searches at full depth if the move beats alpha anyway.
+    :param board: board state before the move.
+    :param move: move about to be searched.
+    :param depth_left: search depth remaining at the node.
+    :param move_index: position of the move in the ordered list.
+    :return: plies to reduce by.
+    """
+    if move_index == 0 or depth_left < REDUCTION_MIN_DEPTH or not board.is_capture(move):
+        return 0
+    return BAD_CAPTURE_REDUCTION if is_losing_capture(board, move) else 0
+
+
+def format_exchanges(board):
+    """
+    Text for the GUI exchange view: every capture for the side to move with its exchange value, best first.
+    :param board: board state.
+    :return: one capture per line, e.g. 'Nxe5    +100'.
+    """
+    exchanges = sorted(((see(board, move), board.san(move)) for move in board.generate_legal_captures()),
+                       reverse=True)
+    if not exchanges:
+        return 'No captures.'
+    return '\n'.join('{:<8}{:>+6}'.format(san, value) for value, san in exchanges)
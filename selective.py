@@ -0,0 +1,57 @@
+import chess
+import see
+
+"""
+Selective search shared by NegaScout and MTD(f): null-move pruning and late move reductions, each switched on or
+off by its own setting, plus the reduction of losing captures from see.py.
+Null-move pruning lets the side to move pass; if a reduced search still fails high, the node is pruned. It is
+skipped in check, after another null move, and when the side to move has only pawns left, where passing may be the
+best move (zugzwang) and the pruning would be unsound.
+Late move reductions search quiet moves far down the ordered list a ply or two shallower, re-searching at full
+depth any that fail high.
+"""
+
+NULL_MOVE_REDUCTION = 2           # Plies the null-move search is reduced by, on top of the move itself (R)
+NULL_MOVE_MIN_DEPTH = 3           # Depth remaining needed for a null move: R + 1, so the reduced search is >= 0
+LMR_MIN_DEPTH = 3                 # Depth remaining needed to reduce a late move
+LMR_FULL_MOVES = 3                # Moves searched at full depth before any is reduced
+LMR_DEEP_MOVES = 12               # Moves from this index on are reduced a further ply...
+LMR_DEEP_DEPTH = 5                # ...when this much depth remains
+
+
+def null_move_allowed(board, depth_left):
+    """
+    Zugzwang and recursion guard for null-move pruning.
+    :param board: board state.
+    :param depth_left: search depth remaining at the node.
+    :return: True if the side to move may try a null move.
+    """
+    if depth_left < NULL_MOVE_MIN_DEPTH or board.is_check():
+        return False
+    if board.move_stack and not board.peek():                           # No two null moves in a row
+        return False
+    pieces = board.knights | board.bishops | board.rooks | board.queens
+    return bool(pieces & board.occupied_co[board.turn])                 # Pawns and king only: zugzwang risk
+
+
+def reduction(board, move, depth_left, move_index, in_check, lmr=True):
+    """
+    Plies to search a move shallower by. The caller re-searches at full depth if a reduced move beats alpha, and
+    should not reduce moves that give check.
+    :param board: board state before the move.
+    :param move: move about to be searched.
+    :param depth_left: search depth remaining at the node.
+    :param move_index: position of the move in the ordered list.
+    :param in_check: True if the side to move is in check (nothing is reduced).
+    :param lmr: late move reductions setting; losing captures are reduced either way.
+    :return: plies to reduce by.
+    """
+    if in_check:
+        return 0
+    if board.is_capture(move):
+        return see.capture_reduction(board, move, depth_left, move_index)
+    if not lmr or move.promotion or move_index < LMR_FULL_MOVES or depth_left < LMR_MIN_DEPTH:
+        return 0
+    if move_index >= LMR_DEEP_MOVES and depth_left >= LMR_DEEP_DEPTH:
+        return 2
+    return 1
@@ -1,20 +1,187 @@
+from array import array
+from multiprocessing import shared_memory
+import chess
+import constants
+import terminal
+
+"""
+Layout of the packed data word stored alongside each 64-bit Zobrist key:
+bits 0-15 move | 16-39 score | 40-47 depth | 48-49 flag | 50-51 result | 52-57 generation
+The key word holds Zobrist key XOR data, so a slot torn by two processes writing at once fails the key check
+on probe instead of returning another position's data (lockless hashing). This lets Lazy SMP helpers share one
+table in shared memory without locks.
+"""
+SCORE_SHIFT, DEPTH_SHIFT, FLAG_SHIFT, RESULT_SHIFT, GENERATION_SHIFT = 16, 40, 48, 50, 52
+SCORE_OFFSET = 1 << 23                   # Scores are stored unsigned in 24 bits
+GENERATION_MASK = 0x3F
+SLOT_BYTES = 16                          # 8 byte key + 8 byte data
+BUCKET_SLOTS = 2                         # Slot 0: depth-preferred. Slot 1: always-replace.
+RESULTS = ['*', '1-0', '0-1', '1/2-1/2']
+
+
+def encode_move(move):
+    """
+    Pack a move into 16 bits: from square, to square and promotion piece type.
+    :param move: chess move, or None.
+    :return: packed move (0 for no move).
+    """
+    if not move:
+        return 0
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(packed):
+    """
+    Unpack a 16-bit move.
+    :param packed: packed move.
+    :return: chess move, or None.
+    """
+    if not packed:
+        return None
+    return chess.Move(packed & 0x3F, packed >> 6 & 0x3F, packed >> 12 or None)
+
+
 class TransTableEntry:
     """
-    Each entry, representing a board state in the transposition table.
+    Each entry, representing a board state in the transposition table. Decoded from the packed slot on probe.
     """
-    z_key = 0          # Zobrist hash key.
-    score = 0          # Node score.
-    depth = 0          # Current depth. Increases til max_depth reached.
-    finalBoard = None  # Board state
-    flag = 0           # 0 true value; 1 lower bound; 2 upper bound
-    move = ''          # Optimal move
-    result = ''        # Python-Chess formatted result of entry
+    __slots__ = ('move', 'score', 'depth', 'flag', 'result')
+
+    def __init__(self, move, score, depth, flag, result):
+        self.move = move                 # Optimal move
+        self.score = score               # Node score.
+        self.depth = depth               # Remaining search depth the score was found with.
+        self.flag = flag                 # 0 true value; 1 lower bound; 2 upper bound
+        self.result = result             # Python-Chess formatted result of entry
 
 
 class TransTable:
     """
-    Transposition table. Holds all transposition table entries.
+    Transposition table. Fixed-size and sized in megabytes, held in two packed arrays (keys and data).
+    Slots are grouped into buckets of a depth-preferred slot and an always-replace slot. Entries from
+    earlier searches are aged out by a generation counter rather than evicted.
+    With shared=True the arrays live in a multiprocessing.shared_memory block that other processes can
+    attach to by name (see attach).
     """
-    table = {}             # Table entry array
-    size = 0               # Table initial size
-    maxSize = 10 ** 7      # Maximum transposition table size
+    def __init__(self, size_mb=constants.TT_SIZE_MB, shared=False, name=None):
+        """
+        :param size_mb: table size in megabytes.
+        :param shared: True to hold the table in shared memory.
+        :param name: name of an existing shared memory table to attach to, instead of creating one.
+        """
+        buckets = 1
+        while buckets * 2 * BUCKET_SLOTS * SLOT_BYTES <= size_mb * (1 << 20):  # Largest power of two that fits
+            buckets *= 2
+        self.size_mb = size_mb
+        self.mask = buckets - 1
+        self.size = buckets * BUCKET_SLOTS                     # Number of slots
+        self.generation = 0
+        self.probes = 0                                        # Lookups this search
+        self.hits = 0                                          # Lookups that found their position
+        self.shm = None
+        self.is_owner = name is None                           # The creating process unlinks shared memory
+        if shared or name:
+            if name:
+                self.shm = shared_memory.SharedMemory(name=name)
+            else:
+                self.shm = shared_memory.SharedMemory(create=True, size=SLOT_BYTES * self.size)
+            words = self.shm.buf.cast('Q')
+            self.keys = words[:self.size]
+            self.data = words[self.size:2 * self.size]
+        else:
+            self.keys = array('Q', bytes(8 * self.size))
+            self.data = array('Q', bytes(8 * self.size))
+
+    @classmethod
+    def attach(cls, size_mb, name):
+        """
+        Open a table created with shared=True by another process.
+        :param size_mb: size the table was created with.
+        :param name: shared memory block name (TransTable.shm.name).
+        :return: TransTable.
+        """
+        return cls(size_mb, name=name)
+
+    def close(self):
+        """
+        Release a shared memory table. The creating process also frees the block.
+        """
+        if self.shm is None:
+            return
+        self.keys.release()
+        self.data.release()
+        self.keys, self.data = None, None
+        self.shm.close()
+        if self.is_owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def new_search(self):
+        """
+        Start a new search. Entries from older generations become the first to be replaced, and the probe counts
+        restart.
+        """
+        self.generation = (self.generation + 1) & GENERATION_MASK
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        """
+        Empty the table, keeping its size.
+        """
+        if self.shm is not None:
+            self.shm.buf[:SLOT_BYTES * self.size] = bytes(SLOT_BYTES * self.size)
+        else:
+            self.keys = array('Q', bytes(8 * self.size))
+            self.data = array('Q', bytes(8 * self.size))
+        self.generation = 0
+
+    def probe(self, z_key, ply=0):
+        """
+        Look up a position.
+        :param z_key: Zobrist hash key.
+        :param ply: distance of the position from the search root, for mate scores.
+        :return: TransTableEntry, or None if the position is not stored.
+        """
+        self.probes += 1
+        slot = (z_key & self.mask) * BUCKET_SLOTS
+        for index in (slot, slot + 1):
+            data = self.data[index]
+            if self.keys[index] ^ data == z_key:               # Fails if the slot is torn or holds another key
+                if not data:                                   # Empty slot (only matches key 0)
+                    return None
+                self.hits += 1
+                return TransTableEntry(decode_move(data & 0xFFFF),
+                                       terminal.score_from_table((data >> SCORE_SHIFT & 0xFFFFFF) - SCORE_OFFSET,
+                                                                 ply),
+                                       data >> DEPTH_SHIFT & 0xFF,
+                                       data >> FLAG_SHIFT & 0x3,
+                                       RESULTS[data >> RESULT_SHIFT & 0x3])
+        return None
+
+    def store(self, z_key, move, score, depth, flag, result, ply=0):
+        """
+        Store a position. The depth-preferred slot is overwritten by the same position, a deeper or equal search,
+        or an entry from an older search. Anything else goes into the always-replace slot.
+        :param z_key: Zobrist hash key.
+        :param move: best move found, or None.
+        :param score: node score.
+        :param depth: remaining search depth the score was found with.
+        :param flag: EXACT_SCORE, LOWER_BOUND_SCORE or UPPER_BOUND_SCORE.
+        :param result: python-chess formatted result of the position.
+        :param ply: distance of the position from the search root; mate scores are stored relative to it.
+        """
+        slot = (z_key & self.mask) * BUCKET_SLOTS
+        old = self.data[slot]
+        if (self.keys[slot] ^ old != z_key and old >> DEPTH_SHIFT & 0xFF > depth and
+                old >> GENERATION_SHIFT & GENERATION_MASK == self.generation):
+            slot += 1                                          # Keep the deeper, current entry
+
+        data = (encode_move(move) |
+                (terminal.score_to_table(score, ply) + SCORE_OFFSET) << SCORE_SHIFT |
+                min(depth, 0xFF) << DEPTH_SHIFT |
+                flag << FLAG_SHIFT |
+                RESULTS.index(result) << RESULT_SHIFT |
+                self.generation << GENERATION_SHIFT)
+        self.keys[slot] = z_key ^ data
+        self.data[slot] = data
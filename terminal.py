@@ -0,0 +1,117 @@
+import chess
+import constants
+
+"""
+Cheap game-over detection for the search. Reuses the move list the search has already generated where it can,
+and otherwise generates at most one legal move.
+Checkmate scores count down with the ply they are found at (MATE_SCORE - ply), so shorter mates score higher and
+the distance to mate can be read back from the root score. The transposition table stores them relative to the
+node instead (score_to_table / score_from_table), so an entry stays valid at any ply.
+"""
+
+MAX_MATE_PLY = 128            # Scores within this many points of MATE_SCORE are checkmates
+
+
+def has_legal_move(board):
+    """
+    Check for at least one legal move, stopping at the first one found.
+    :param board: board state.
+    :return: True if the side to move can move.
+    """
+    return next(iter(board.generate_legal_moves()), None) is not None
+
+
+def is_insufficient_material(board):
+    """
+    Insufficient material check. Any pawn, rook or queen on the board rules it out with one bitboard test,
+    so the full python-chess check only runs in bare minor-piece endings.
+    :param board: board state.
+    :return: True if neither side can checkmate.
+    """
+    if board.pawns | board.rooks | board.queens:
+        return False
+    return board.is_insufficient_material()
+
+
+def result(board, moves=None):
+    """
+    Python-chess formatted result of a position (1-0, 0-1, 1/2-1/2, or * (undetermined)).
+    Fivefold repetition is not checked: it needs the whole move stack and does not arise inside a search.
+    :param board: board state.
+    :param moves: legal moves already generated for this position, if any.
+    :return: result string.
+    """
+    can_move = bool(moves) if moves is not None else has_legal_move(board)
+    if not can_move:
+        if board.is_check():                                    # Checkmate: the side to move has lost
+            return '0-1' if board.turn == chess.WHITE else '1-0'
+        return '1/2-1/2'                                        # Stalemate
+    if is_insufficient_material(board) or board.halfmove_clock >= 150:  # 75-move rule
+        return '1/2-1/2'
+    return '*'
+
+
+def result_score(outcome, ply=0):
+    """
+    Score of a determined result for the side to move (in a search, a decisive result means it is checkmated).
+    :param outcome: python-chess formatted result, not '*'.
+    :param ply: distance from the search root.
+    :return: -(MATE_SCORE - ply) if checkmated, 0 if drawn.
+    """
+    return 0 if outcome == '1/2-1/2' else -(constants.MATE_SCORE - ply)
+
+
+def score(board, moves=None, ply=0):
+    """
+    Game-over score of a position for the side to move.
+    :param board: board state.
+    :param moves: legal moves already generated for this position, if any.
+    :param ply: distance from the search root.
+    :return: -(MATE_SCORE - ply) if checkmated, 0 if drawn, or None if the game continues.
+    """
+    outcome = result(board, moves)
+    if outcome == '*':
+        return None
+    return result_score(outcome, ply)
+
+
+def is_mate_score(value):
+    """
+    :param value: search score.
+    :return: True if the score is a checkmate, for either side.
+    """
+    return constants.MATE_SCORE - MAX_MATE_PLY < abs(value) <= constants.MATE_SCORE
+
+
+def mate_in(value):
+    """
+    Moves to checkmate from a root mate score.
+    :param value: root score, a checkmate (is_mate_score).
+    :return: moves to mate, negative if the side to move is getting mated.
+    """
+    moves = (constants.MATE_SCORE - abs(value) + 1) // 2
+    return moves if value > 0 else -moves
+
+
+def score_to_table(value, ply):
+    """
+    Make a mate score relative to the node, for storing in the transposition table.
+    :param value: search score.
+    :param ply: distance of the node from the search root.
+    :return: score to store.
+    """
+    if not is_mate_score(value):
+        return value
+    return value + ply if value > 0 else value - ply
+
+
+def score_from_table(value, ply):
+    """
+    Inverse of score_to_table, for a score probed at the given ply.
+    :param value: stored score.
+    :param ply: distance of the node from the search root.
+    :return: search score.
+    """
+    if not is_mate_score(value):
+        return value
+    return value - ply if value > 0 else value + ply
@@ -0,0 +1,121 @@
+import random
+import chess
+import evaluator
+import piece_tables
+
+"""
+Parity of the bitboard evaluator with the SquareSet + square_mirror evaluator it replaced: evaluator.evaluator(),
+score_board() and IncrementalEvaluator must all give the old scores, including after castling, en passant and
+promotions.
+"""
+
+SEED = 2021
+GAMES = 60
+MAX_PLIES = 300
+SPECIAL_FENS = [
+    'r3k2r/pppppppp/8/8/8/8/PPPPPPPP/R3K2R w KQkq - 0 1',          # Castling both ways, both sides
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',  # En passant
+    '4k3/1P6/8/8/8/8/6p1/4K2R w K - 0 1',                          # Promotions, with and without capture
+    '1n2k3/P7/8/8/8/8/8/4K3 w - - 0 1',
+]
+
+
+def old_evaluator(board, result):
+    """
+    The evaluator as it was before the bitboard rewrite.
+    """
+    if not result == "*":
+        return evaluator.score_result(board, result)
+
+    wp = len(board.pieces(chess.PAWN, chess.WHITE))
+    bp = len(board.pieces(chess.PAWN, chess.BLACK))
+    wn = len(board.pieces(chess.KNIGHT, chess.WHITE))
+    bn = len(board.pieces(chess.KNIGHT, chess.BLACK))
+    wb = len(board.pieces(chess.BISHOP, chess.WHITE))
+    bb = len(board.pieces(chess.BISHOP, chess.BLACK))
+    wr = len(board.pieces(chess.ROOK, chess.WHITE))
+    br = len(board.pieces(chess.ROOK, chess.BLACK))
+    wq = len(board.pieces(chess.QUEEN, chess.WHITE))
+    bq = len(board.pieces(chess.QUEEN, chess.BLACK))
+
+    material = 100 * (wp - bp) + 300 * (wn - bn) + 330 * (wb - bb) + 550 * (wr - br) + 1000 * (wq - bq)
+
+    pawn_sq = sum([piece_tables.TABLE_PAWN_MAIN[i] for i in board.pieces(chess.PAWN, chess.WHITE)])
+    pawn_sq += sum([-piece_tables.TABLE_PAWN_MAIN[chess.square_mirror(i)]
+                    for i in board.pieces(chess.PAWN, chess.BLACK)])
+    knight_sq = sum([piece_tables.TABLE_KNIGHT_MAIN[i] for i in board.pieces(chess.KNIGHT, chess.WHITE)])
+    knight_sq += sum([-piece_tables.TABLE_KNIGHT_MAIN[chess.square_mirror(i)]
+                      for i in board.pieces(chess.KNIGHT, chess.BLACK)])
+    bishop_sq = sum([piece_tables.TABLE_BISHOP_MAIN[i] for i in board.pieces(chess.BISHOP, chess.WHITE)])
+    bishop_sq += sum([-piece_tables.TABLE_BISHOP_MAIN[chess.square_mirror(i)]
+                      for i in board.pieces(chess.BISHOP, chess.BLACK)])
+    rook_sq = sum([piece_tables.TABLE_ROOK_MAIN[i] for i in board.pieces(chess.ROOK, chess.WHITE)])
+    rook_sq += sum([-piece_tables.TABLE_ROOK_MAIN[chess.square_mirror(i)]
+                    for i in board.pieces(chess.ROOK, chess.BLACK)])
+    queen_sq = sum([piece_tables.TABLE_QUEEN_MAIN[i] for i in board.pieces(chess.QUEEN, chess.WHITE)])
+    queen_sq += sum([-piece_tables.TABLE_QUEEN_MAIN[chess.square_mirror(i)]
+                     for i in board.pieces(chess.QUEEN, chess.BLACK)])
+    king_sq = sum([piece_tables.TABLE_KING_MAIN[i] for i in board.pieces(chess.KING, chess.WHITE)])
+    king_sq += sum([-piece_tables.TABLE_KING_MAIN[chess.square_mirror(i)]
+                    for i in board.pieces(chess.KING, chess.BLACK)])
+
+    evaluation = material + pawn_sq + knight_sq + bishop_sq + rook_sq + queen_sq + king_sq
+
+    return evaluation if board.turn else -evaluation
+
+
+def assert_parity(board, incremental):
+    expected = old_evaluator(board, "*")
+    assert evaluator.evaluator(board, "*") == expected, board.fen()
+    assert (evaluator.score_board(board) if board.turn else -evaluator.score_board(board)) == expected, board.fen()
+    assert incremental.evaluate() == expected, board.fen()
+
+
+def play_random_game(rng, fen=chess.STARTING_FEN):
+    """
+    Play random moves through an IncrementalEvaluator, checking every position on the way.
+    :return: set of special move kinds seen ('castling', 'en passant', 'promotion').
+    """
+    board = chess.Board(fen)
+    incremental = evaluator.IncrementalEvaluator(board)
+    seen = set()
+    assert_parity(board, incremental)
+    for _ in range(MAX_PLIES):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        special = [move for move in moves if board.is_castling(move) or board.is_en_passant(move) or move.promotion]
+        move = rng.choice(special if special and rng.random() < 0.5 else moves)  # Favour the rarer moves
+        if board.is_castling(move):
+            seen.add('castling')
+        if board.is_en_passant(move):
+            seen.add('en passant')
+        if move.promotion:
+            seen.add('promotion')
+        incremental.push(move)
+        assert_parity(board, incremental)
+    while board.move_stack:                                  # Unmaking restores every earlier score
+        incremental.pop()
+        assert_parity(board, incremental)
+    return seen
+
+
+def test_random_games_match_old_evaluator():
+    rng = random.Random(SEED)
+    seen = set()
+    for _ in range(GAMES):
+        seen |= play_random_game(rng)
+    assert seen == {'castling', 'en passant', 'promotion'}
+
+
+def test_special_positions_match_old_evaluator():
+    rng = random.Random(SEED)
+    for fen in SPECIAL_FENS:
+        for _ in range(20):
+            play_random_game(rng, fen)
+
+
+def test_determined_results_match_old_evaluator():
+    board = chess.Board('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3')  # Fool's mate
+    for result in ('1-0', '0-1', '1/2-1/2'):
+        assert evaluator.evaluator(board, result) == old_evaluator(board, result)
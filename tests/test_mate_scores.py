@@ -0,0 +1,49 @@
+import chess
+import constants
+import negamaxab
+import negascout
+import mtdf
+import terminal
+import uci
+
+"""
+Mate scores count plies from the search root, so UCI reports the distance to mate in moves rather than a flat
+'mate 1', and a score stored in the transposition table keeps its meaning at a different ply.
+"""
+
+MATE_IN_1 = 'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4'
+MATE_IN_2 = 'r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1'
+MATED_IN_1 = 'k7/8/8/8/8/8/rr6/7K w - - 0 1'
+
+
+def search_score(engine_class, fen, depth):
+    board = chess.Board(fen)
+    if engine_class is negamaxab.NegamaxAbEngine:
+        return engine_class(board, depth).search_controller().score
+    engine = engine_class(board, depth, null_move=False, lmr=False)
+    if engine_class is mtdf.MTDfEngine:
+        return engine.search_controller(board).score
+    return engine.search_controller().score
+
+
+def test_format_score():
+    assert uci.format_score(constants.MATE_SCORE - 1) == 'mate 1'
+    assert uci.format_score(constants.MATE_SCORE - 3) == 'mate 2'
+    assert uci.format_score(-(constants.MATE_SCORE - 2)) == 'mate -1'
+    assert uci.format_score(-(constants.MATE_SCORE - 4)) == 'mate -2'
+    assert uci.format_score(35) == 'cp 35'
+    assert uci.format_score(constants.MAX_SCORE) == 'cp {}'.format(uci.MAX_CP)  # Out of range: clamped, not a mate
+
+
+def test_table_scores_are_relative_to_the_node():
+    for score in (constants.MATE_SCORE - 5, -(constants.MATE_SCORE - 6), 120, 0):
+        assert terminal.score_from_table(terminal.score_to_table(score, 3), 3) == score
+    stored = terminal.score_to_table(constants.MATE_SCORE - 5, 3)                # Mate 5 plies from the root, at ply 3
+    assert terminal.score_from_table(stored, 1) == constants.MATE_SCORE - 3      # Same node found at ply 1
+
+
+def test_engines_report_distance_to_mate():
+    for engine_class in (negamaxab.NegamaxAbEngine, negascout.NegaScoutEngine, mtdf.MTDfEngine):
+        assert terminal.mate_in(search_score(engine_class, MATE_IN_1, 3)) == 1
+        assert terminal.mate_in(search_score(engine_class, MATE_IN_2, 4)) == 2
+        assert terminal.mate_in(search_score(engine_class, MATED_IN_1, 3)) == -1
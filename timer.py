@@ -1,3 +1,20 @@
+import time
+
+EXPECTED_GAME_MOVES = 40                      # Moves a game is assumed to last, for spreading the base time
+MIN_MOVES_TO_GO = 15                          # Never plan for fewer remaining moves than this
+INC_FRACTION = 0.75                           # Share of the increment spent on each move
+MAX_BASE_FRACTION = 0.25                      # Never spend more than this share of the remaining base on one move
+SAFETY_MARGIN = 200                           # ms kept back for process and GUI latency
+NEXT_ITERATION_FRACTION = 0.4                 # Don't start another iteration after this share of the budget
+STOP_SEARCH = -1.0                            # Shared deadline value that aborts a search at once
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when its time budget has run out.
+    """
+
+
 def get_timer(time_y):
     # Returns timer
     s, ms = divmod(int(time_y), 1000)
@@ -7,14 +24,180 @@ def get_timer(time_y):
 
 class Timer:
     """
-    Controls the timers for the game, including fischer based incrementation format.
+    Controls the timers for the game, including fischer based incrementation format. The clock runs on
+    time.monotonic(), so it stays accurate however often the display is refreshed.
     """
     def __init__(self):
         self.base = 5 * 60 * 1000             # 5 minutes in ms
         self.inc = 10000                      # increment time in ms (10 sec)
-        self.elapsed = 0
+        self.elapsed = 0                      # ms used on the current move while the clock was running before
+        self.started = None                   # time.monotonic() when the clock was started, None when stopped
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def stop(self):
+        if self.started is not None:
+            self.elapsed += (time.monotonic() - self.started) * 1000
+            self.started = None
+
+    def read(self):
+        """
+        :return: ms used on the current move, including the running time.
+        """
+        if self.started is None:
+            return self.elapsed
+        return self.elapsed + (time.monotonic() - self.started) * 1000
 
     def update_base(self):                    # Update base time after every move
+        self.stop()
         self.base += self.inc - self.elapsed  # add 10 seconds minus elapsed time
         self.base = max(0, self.base)
         self.elapsed = 0
+
+    def move_budget(self, move_number, moves_to_go=None):
+        """
+        Time to spend on the next move, from the remaining base time, the increment and the move number.
+        :param move_number: full move number of the game.
+        :param moves_to_go: moves left until the next time control, if the time control has one.
+        :return: time budget in ms.
+        """
+        if moves_to_go is None:
+            moves_to_go = max(MIN_MOVES_TO_GO, EXPECTED_GAME_MOVES - move_number)
+        moves_to_go = max(1, moves_to_go)
+        budget = self.base / moves_to_go + self.inc * INC_FRACTION
+        return max(0, min(budget, self.base * MAX_BASE_FRACTION) - SAFETY_MARGIN)
+
+
+class TimeManager:
+    """
+    Deadline for an iterative deepening search. Engines call check() at every node; once at least one iteration
+    has completed and the budget has run out it raises SearchTimeout, and the engine returns the best move from
+    the last completed iteration. Without a budget the search is only limited by depth.
+    """
+    def __init__(self, budget=None, max_nodes=None, iterate=False):
+        """
+        :param budget: time budget in ms, or None for no limit.
+        :param max_nodes: node limit, or None for no limit.
+        :param iterate: deepen iteratively even without a budget, for searches that can be stopped with stop().
+        """
+        self.budget = budget / 1000 if budget is not None else None  # Seconds
+        self.max_nodes = max_nodes
+        self.iterate = iterate or budget is not None or max_nodes is not None
+        self.start_time = time.monotonic()
+        self.deadline = None
+        self.nodes = 0
+        self.iterations = 0                   # Completed iterations
+        self.on_iteration = None              # Called with (depth, move, score, nodes, seconds) after each iteration
+
+    def first_depth(self, max_depth):
+        """
+        First iterative deepening depth. Untimed searches go straight to the full depth: without a transposition
+        table the shallower iterations only add work.
+        :param max_depth: maximum search depth.
+        :return: depth to start from.
+        """
+        return 1 if self.iterate else max_depth
+
+    def start(self):
+        """
+        Start the clock for a new search.
+        """
+        self.start_time = time.monotonic()
+        self.deadline = self.start_time + self.budget if self.budget is not None else None
+        self.nodes = 0
+        self.iterations = 0
+
+    def limits(self):
+        """
+        Deadline state to hand to another process searching part of the same tree (see resume).
+        :return: (deadline, completed iterations) tuple.
+        """
+        return self.deadline, self.iterations
+
+    @classmethod
+    def resume(cls, limits):
+        """
+        Time manager for a process searching part of another process's search. time.monotonic() is system-wide,
+        so the deadline carries over.
+        :param limits: tuple from limits().
+        :return: TimeManager.
+        """
+        time_manager = cls()
+        time_manager.start()
+        time_manager.deadline, time_manager.iterations = limits
+        return time_manager
+
+    def elapsed(self):
+        """
+        :return: seconds since the search started.
+        """
+        return time.monotonic() - self.start_time
+
+    def stop(self):
+        """
+        Stop the search from another thread. It ends at the next node once an iteration has completed.
+        """
+        self.deadline = 0.0
+
+    def check(self):
+        """
+        Count a node and test the limits. A clock read is far cheaper than a node, so it is done every time.
+        """
+        self.nodes += 1
+        if self.iterations and (self.deadline is not None and time.monotonic() >= self.deadline
+                                or self.max_nodes is not None and self.nodes >= self.max_nodes):
+            raise SearchTimeout
+
+    def iteration_complete(self, depth=None, move=None, score=None):
+        """
+        Record a completed iteration and report it to on_iteration, if set.
+        :param depth: depth of the iteration.
+        :param move: best move found.
+        :param score: score of the best move, for the side to move.
+        :return: True if there is likely to be time for the next one.
+        """
+        self.iterations += 1
+        if self.on_iteration:
+            self.on_iteration(depth, move, score, self.nodes, self.elapsed())
+        return self.time_for_next_iteration()
+
+    def time_for_next_iteration(self):
+        """
+        :return: True if the next iteration is likely to finish within the limits.
+        """
+        if self.max_nodes is not None and self.nodes >= self.max_nodes * NEXT_ITERATION_FRACTION:
+            return False
+        return self.deadline is None or self.elapsed() < (self.deadline - self.start_time) * NEXT_ITERATION_FRACTION
+
+
+class SharedTimeManager(TimeManager):
+    """
+    Time manager whose deadline is written by another process into a shared value. Used by ponder searches (no
+    deadline until the player moves: a real one on a ponder hit, STOP_SEARCH on a miss) and by Lazy SMP helpers
+    (stopped with STOP_SEARCH when the main search finishes).
+    """
+    def __init__(self, shared_deadline):
+        """
+        :param shared_deadline: multiprocessing.RawValue('d') holding a time.monotonic() deadline, 0 for none.
+        """
+        super().__init__()
+        self.shared_deadline = shared_deadline
+
+    def first_depth(self, max_depth):
+        return 1                              # Always deepen iteratively: a deadline can arrive mid-search
+
+    def check(self):
+        self.nodes += 1
+        deadline = self.shared_deadline.value
+        if deadline and (deadline == STOP_SEARCH or self.iterations and time.monotonic() >= deadline):
+            raise SearchTimeout
+
+    def time_for_next_iteration(self):
+        deadline = self.shared_deadline.value
+        if not deadline:                      # Still pondering: keep going
+            return True
+        if deadline == STOP_SEARCH:
+            return False
+        return self.elapsed() < (deadline - self.start_time) * NEXT_ITERATION_FRACTION
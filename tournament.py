@@ -0,0 +1,295 @@
+import argparse
+import concurrent.futures
+import datetime
+import itertools
+import math
+import os
+import random
+import time
+import chess
+import chess.pgn
+import chess.polyglot
+import constants
+import evaluator
+import search_worker
+import t_table
+import timer
+
+"""
+Headless engine-vs-engine tournament. Every pair of players (algorithm and depth) plays each opening twice, once
+with each colour. Games run in parallel worker processes and start from balanced openings drawn from the polyglot
+book; each finished game is appended to a PGN file as it comes in.
+Run with: python tournament.py [--player "NAME:DEPTH" ...] [--openings N] [--workers N] [--pgn FILE] [--book FILE]
+"""
+
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Book', 'book.bin')  # Any working dir
+OPENING_PLIES = 8             # Most book moves played before the engines take over
+OPENING_MIN_PLIES = 4         # Fewest book moves for an opening (the book is shallow in places)
+OPENING_MAX_IMBALANCE = 50    # Largest static score (centipawns, either side) for an opening to count as balanced
+OPENING_ATTEMPTS = 50         # Book walks per opening needed, before giving up on finding more
+MAX_PLIES = 300               # Games still going after this many plies are adjudicated a draw
+ELO_Z = 1.96                  # 95% confidence interval
+
+
+def parse_player(text):
+    """
+    :param text: player as 'ALGORITHM:DEPTH', e.g. 'MTD(f) - Main:4'.
+    :return: (algorithm, depth) tuple.
+    """
+    algorithm, _, depth = text.rpartition(':')
+    if algorithm not in constants.ALGORITHM_LIST or not depth.isdigit():
+        raise argparse.ArgumentTypeError('expected ALGORITHM:DEPTH with ALGORITHM one of {}'.format(
+            ', '.join(constants.ALGORITHM_LIST)))
+    return algorithm, int(depth)
+
+
+def player_name(player):
+    """
+    :param player: (algorithm, depth) tuple.
+    :return: name used in reports and PGN headers.
+    """
+    return '{} d{}'.format(*player)
+
+
+def book_openings(count, seed=0, book_file=BOOK_FILE):
+    """
+    Draw distinct balanced openings by walking the book with weighted random choices.
+    :param count: number of openings wanted.
+    :param seed: random seed, so a tournament can be replayed.
+    :param book_file: polyglot book.
+    :return: list of openings, each a list of moves in UCI notation (fewer than count if the book runs out).
+    """
+    rng = random.Random(seed)
+    openings = []
+    with chess.polyglot.open_reader(book_file) as reader:
+        for _ in range(count * OPENING_ATTEMPTS):
+            if len(openings) == count:
+                break
+            board = chess.Board()
+            for _ in range(OPENING_PLIES):
+                entry = reader.get(board)       # Cheap test first: weighted_choice raises when out of book
+                if entry is None:
+                    break
+                board.push(reader.weighted_choice(board, random=rng).move)
+            opening = [move.uci() for move in board.move_stack]
+            if (len(opening) >= OPENING_MIN_PLIES and opening not in openings
+                    and abs(evaluator.score_board(board)) <= OPENING_MAX_IMBALANCE):
+                openings.append(opening)
+    return openings
+
+
+def engine_move(player, board, trans_table, movetime):
+    """
+    Search one move.
+    :param player: (algorithm, depth) tuple.
+    :param board: board state.
+    :param trans_table: the player's transposition table (MTD(f) only).
+    :param movetime: time budget per move in ms, or None for fixed depth.
+    :return: (move, seconds) tuple.
+    """
+    algorithm, depth = player
+    engine = search_worker.create_engine(algorithm, board, depth, trans_table, timer.TimeManager(movetime))
+    start = time.perf_counter()
+    move = search_worker.run_search(engine, board).move
+    return move, time.perf_counter() - start
+
+
+def play_game(white, black, opening, movetime=None, round_number=1):
+    """
+    Play one game. Runs in a worker process.
+    :param white: (algorithm, depth) of the white player.
+    :param black: (algorithm, depth) of the black player.
+    :param opening: opening moves, in UCI notation.
+    :param movetime: time budget per move in ms, or None for fixed depth.
+    :param round_number: PGN round.
+    :return: dict of the players, result, PGN text and each side's (moves, seconds) thinking time.
+    """
+    board = chess.Board()
+    for uci in opening:
+        board.push_uci(uci)
+    players = {chess.WHITE: white, chess.BLACK: black}
+    tables = {colour: t_table.TransTable() if player[0] == 'MTD(f) - Main' else None
+              for colour, player in players.items()}
+    thinking = {chess.WHITE: [0, 0.0], chess.BLACK: [0, 0.0]}
+    termination = None
+
+    while not board.is_game_over(claim_draw=True):
+        if len(board.move_stack) >= MAX_PLIES:
+            termination = 'adjudication: {} plies'.format(MAX_PLIES)
+            break
+        colour = board.turn
+        move, seconds = engine_move(players[colour], board, tables[colour], movetime)
+        if move is None or move not in board.legal_moves:
+            termination = 'illegal move by {}'.format(player_name(players[colour]))
+            break
+        thinking[colour][0] += 1
+        thinking[colour][1] += seconds
+        board.push(move)
+
+    if termination is None:
+        result = board.result(claim_draw=True)
+    elif termination.startswith('illegal'):
+        result = '0-1' if board.turn == chess.WHITE else '1-0'
+    else:
+        result = '1/2-1/2'
+
+    game = chess.pgn.Game.from_board(board)
+    game.headers['Event'] = 'BeatMyChessAI tournament'
+    game.headers['Date'] = datetime.date.today().strftime('%Y.%m.%d')
+    game.headers['Round'] = str(round_number)
+    game.headers['White'] = player_name(white)
+    game.headers['Black'] = player_name(black)
+    game.headers['Result'] = result
+    game.headers['Opening'] = ' '.join(opening)
+    if termination:
+        game.headers['Termination'] = termination
+    for table in tables.values():
+        if table:
+            table.close()
+    return {'white': white, 'black': black, 'result': result, 'pgn': str(game),
+            'thinking': {'white': tuple(thinking[chess.WHITE]), 'black': tuple(thinking[chess.BLACK])}}
+
+
+def elo(wins, draws, losses):
+    """
+    Elo difference implied by a score, with a 95% error bar.
+    :return: (Elo difference, error margin) tuple; the margin is inf when the score is 0% or 100%.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    if score in (0, 1):
+        return math.copysign(math.inf, score - 0.5), math.inf
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+
+    def to_elo(p):
+        if p <= 0 or p >= 1:
+            return math.copysign(math.inf, p - 0.5)
+        return -400 * math.log10(1 / p - 1) + 0.0     # + 0.0: no '-0' for an even score
+
+    margin = ELO_Z * math.sqrt(variance / games)
+    error = (to_elo(min(score + margin, 1)) - to_elo(max(score - margin, 0))) / 2
+    return to_elo(score), error
+
+
+class Standings:
+    """
+    Running score of the tournament, per player and per pairing.
+    """
+    def __init__(self):
+        self.records = {}                   # (player, opponent) -> [wins, draws, losses]
+        self.thinking = {}                  # player -> [moves, seconds]
+
+    def add(self, game):
+        """
+        :param game: result dict from play_game.
+        """
+        white, black = game['white'], game['black']
+        points = {'1-0': (0, 2), '0-1': (2, 0), '1/2-1/2': (1, 1)}[game['result']]  # Index into [W, D, L]
+        self.records.setdefault((white, black), [0, 0, 0])[points[0]] += 1
+        self.records.setdefault((black, white), [0, 0, 0])[points[1]] += 1
+        for player, side in ((white, 'white'), (black, 'black')):
+            moves, seconds = game['thinking'][side]
+            totals = self.thinking.setdefault(player, [0, 0.0])
+            totals[0] += moves
+            totals[1] += seconds
+
+    def player_record(self, player):
+        """
+        :return: [wins, draws, losses] against every opponent.
+        """
+        record = [0, 0, 0]
+        for (first, _), results in self.records.items():
+            if first == player:
+                record = [total + result for total, result in zip(record, results)]
+        return record
+
+    def report(self):
+        """
+        :return: human-readable standings, best score first.
+        """
+        lines = ['{:<28} {:>5} {:>5} {:>5} {:>6} {:>16} {:>10}'.format('Player', 'W', 'D', 'L', 'Score', 'Elo',
+                                                                        's/move')]
+        players = sorted(self.thinking, key=lambda player: -self.score(self.player_record(player)))
+        for player in players:
+            wins, draws, losses = self.player_record(player)
+            difference, error = elo(wins, draws, losses)
+            moves, seconds = self.thinking[player]
+            lines.append('{:<28} {:>5} {:>5} {:>5} {:>5.1f}% {:>+7.0f} +/- {:<5.0f} {:>10.3f}'.format(
+                player_name(player), wins, draws, losses, 100 * self.score([wins, draws, losses]), difference, error,
+                seconds / moves if moves else 0.0))
+        lines.append('')
+        for (player, opponent), (wins, draws, losses) in sorted(self.records.items()):
+            if player < opponent:           # Each pairing once
+                difference, error = elo(wins, draws, losses)
+                lines.append('{} vs {}: +{} ={} -{}  Elo {:+.0f} +/- {:.0f}'.format(
+                    player_name(player), player_name(opponent), wins, draws, losses, difference, error))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def score(record):
+        wins, draws, losses = record
+        games = wins + draws + losses
+        return (wins + draws / 2) / games if games else 0.0
+
+
+def run_tournament(players, openings, pgn_file, workers=1, movetime=None, progress=None):
+    """
+    Play a round robin: every pair of players plays every opening with both colours.
+    :param players: list of (algorithm, depth) tuples.
+    :param openings: list of openings from book_openings.
+    :param pgn_file: path the games are appended to as they finish.
+    :param workers: games played at once.
+    :param movetime: time budget per move in ms, or None for fixed depth.
+    :param progress: optional callable, given each finished game's result dict and the standings.
+    :return: Standings.
+    """
+    schedule = []
+    for first, second in itertools.combinations(players, 2):
+        for opening in openings:
+            schedule += [(first, second, opening), (second, first, opening)]
+
+    standings = Standings()
+    with open(pgn_file, 'a', encoding='utf-8') as pgn, \
+            concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play_game, white, black, opening, movetime, round_number)
+                   for round_number, (white, black, opening) in enumerate(schedule, 1)]
+        for future in concurrent.futures.as_completed(futures):
+            game = future.result()
+            pgn.write(game['pgn'] + '\n\n')
+            pgn.flush()                     # Keep the file complete up to the last finished game
+            standings.add(game)
+            if progress:
+                progress(game, standings)
+    return standings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Engine-vs-engine tournament.')
+    parser.add_argument('--player', action='append', type=parse_player, metavar='ALGORITHM:DEPTH',
+                        help='player (repeatable, default every algorithm at depth 3)')
+    parser.add_argument('--openings', type=int, default=4, help='book openings, each played with both colours')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the openings')
+    parser.add_argument('--workers', type=int, default=1, help='games played in parallel')
+    parser.add_argument('--movetime', type=int, help='time per move in ms (default: fixed depth)')
+    parser.add_argument('--pgn', default='tournament.pgn', help='PGN file the games are appended to')
+    parser.add_argument('--book', default=BOOK_FILE, help='polyglot book the openings are drawn from')
+    args = parser.parse_args()
+
+    players = args.player or [(algorithm, 3) for algorithm in constants.ALGORITHM_LIST]
+    if len(set(players)) < 2:
+        parser.error('at least two different players are needed')
+    openings = book_openings(args.openings, args.seed, args.book)
+
+    def progress(game, standings):
+        print('{} - {}: {}'.format(player_name(game['white']), player_name(game['black']), game['result']),
+              flush=True)
+
+    standings = run_tournament(list(dict.fromkeys(players)), openings, args.pgn, args.workers, args.movetime,
+                               progress)
+    print(standings.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import multiprocessing
+import sys
+import threading
+import chess
+import bench
+import constants
+import lazy_smp
+import perft
+import search_worker
+import t_table
+import terminal
+import timer
+
+"""
+Headless UCI (Universal Chess Interface) entry point. Exposes all four engines over stdin/stdout, so they can be
+run by tournament managers and batch jobs without the GUI (PySimpleGUI is never imported).
+Run with: python uci.py
+"""
+
+ENGINE_NAME = 'BeatMyChessAI'
+ENGINE_AUTHOR = 'Daniel Thurston'
+DEFAULT_ALGORITHM = 'MTD(f) - Main'
+MAX_DEPTH = 64                      # Depth limit when 'go' gives none (infinite, movetime, clock or node limits)
+MAX_HASH_MB = 4096
+MAX_THREADS = max(constants.THREAD_LIST)
+GO_INT_PARAMS = ('depth', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo', 'nodes')
+MAX_CP = constants.MATE_SCORE - terminal.MAX_MATE_PLY  # Non-mate scores are clamped below the mate range
+
+
+def format_score(score):
+    """
+    UCI score of a search, relative to the engine. Mate scores count plies from the root (terminal.py), so the
+    distance to mate is sent in moves.
+    :param score: root score.
+    :return: 'cp N' or 'mate N'.
+    """
+    if terminal.is_mate_score(score):
+        return 'mate {}'.format(terminal.mate_in(score))
+    return 'cp {}'.format(max(-MAX_CP, min(score, MAX_CP)))
+
+
+def parse_go(tokens):
+    """
+    Parse the parameters of a 'go' command.
+    :param tokens: command tokens after 'go'.
+    :return: dict of integer parameters, plus 'infinite' if given.
+    """
+    params = {}
+    for index, token in enumerate(tokens):
+        if token in GO_INT_PARAMS and index + 1 < len(tokens):
+            try:
+                params[token] = int(tokens[index + 1])
+            except ValueError:
+                pass
+        elif token == 'infinite':
+            params['infinite'] = True
+    return params
+
+
+def parse_position(tokens):
+    """
+    Parse a 'position' command.
+    :param tokens: command tokens after 'position'.
+    :return: board state, or None if the position is invalid.
+    """
+    moves_index = tokens.index('moves') if 'moves' in tokens else len(tokens)
+    try:
+        if tokens and tokens[0] == 'startpos':
+            board = chess.Board()
+        elif tokens and tokens[0] == 'fen':
+            board = chess.Board(' '.join(tokens[1:moves_index]))
+        else:
+            return None
+        for uci in tokens[moves_index + 1:]:
+            board.push_uci(uci)
+    except ValueError:                      # Invalid FEN or illegal move
+        return None
+    return board
+
+
+def move_budget(board, params):
+    """
+    Time budget for a 'go' command: movetime if given, otherwise allocated from the side to move's clock.
+    :param board: board state.
+    :param params: parsed 'go' parameters.
+    :return: time budget in ms, or None for no time limit.
+    """
+    if 'movetime' in params:
+        return params['movetime']
+    side = 'w' if board.turn == chess.WHITE else 'b'
+    if side + 'time' not in params:
+        return None
+    clock = timer.Timer()
+    clock.base = params[side + 'time']
+    clock.inc = params.get(side + 'inc', 0)
+    return clock.move_budget(board.fullmove_number, params.get('movestogo'))
+
+
+class UciEngine:
+    """
+    UCI protocol handler. Commands are read on the main thread; each search runs on a background thread so that
+    'stop', 'isready' and 'quit' are handled while the engine thinks.
+    """
+    def __init__(self, output=sys.stdout):
+        """
+        :param output: stream the engine writes its replies to.
+        """
+        self.output = output
+        self.output_lock = threading.Lock()  # Info lines come from the search thread
+        self.algorithm = DEFAULT_ALGORITHM
+        self.hash_mb = constants.TT_SIZE_MB
+        self.threads = 1
+        self.null_move = True               # Null-move pruning (NegaScout and MTD(f))
+        self.lmr = True                     # Late move reductions (NegaScout and MTD(f))
+        self.board = chess.Board()
+        self.trans_table = None             # MTD(f) table, kept between searches
+        self.smp_pool = None                # Lazy SMP helpers, with more than one thread
+        self.search_thread = None
+        self.time_manager = None            # Time manager of the running search, for 'stop'
+
+    def send(self, line):
+        """
+        Write a line to the GUI.
+        :param line: reply.
+        """
+        with self.output_lock:
+            print(line, file=self.output, flush=True)
+
+    def handle(self, line):
+        """
+        Handle one command.
+        :param line: command line.
+        :return: False on 'quit', otherwise True.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == 'uci':
+            self.send('id name {}'.format(ENGINE_NAME))
+            self.send('id author {}'.format(ENGINE_AUTHOR))
+            self.send('option name Hash type spin default {} min 1 max {}'.format(constants.TT_SIZE_MB, MAX_HASH_MB))
+            self.send('option name Threads type spin default 1 min 1 max {}'.format(MAX_THREADS))
+            self.send('option name Algorithm type combo default {} {}'.format(
+                DEFAULT_ALGORITHM, ' '.join('var ' + name for name in constants.ALGORITHM_LIST)))
+            self.send('option name NullMove type check default true')
+            self.send('option name LMR type check default true')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'setoption':
+            self.wait()
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.wait()
+            self.board = chess.Board()
+            if self.trans_table:
+                self.trans_table.clear()
+        elif command == 'position':
+            self.wait()
+            board = parse_position(args)
+            if board is None:
+                self.send('info string invalid position')
+            else:
+                self.board = board
+        elif command == 'go' and args[:1] == ['perft']:
+            self.wait()
+            depth = int(args[1]) if len(args) > 1 and args[1].isdigit() else 1
+            report = perft.run_perft(self.board.fen(), max(1, depth))
+            for line in perft.format_report(report, divide=True).splitlines():
+                self.send(line)
+        elif command == 'go':
+            self.wait()
+            self.go(parse_go(args))
+        elif command == 'stop':
+            self.wait(stop=True)
+        elif command == 'bench':
+            self.wait()
+            self.bench(args)
+        elif command == 'quit':
+            self.wait(stop=True)
+            self.close()
+            return False
+        return True
+
+    def set_option(self, args):
+        """
+        Handle 'setoption name <name> value <value>'. Changing Hash, Threads or Algorithm discards the table and
+        helpers, which are recreated for the next search. NullMove and LMR apply from the next search.
+        :param args: command tokens after 'setoption'.
+        """
+        if 'name' not in args:
+            return
+        value_index = args.index('value') if 'value' in args else len(args)
+        name = ' '.join(args[args.index('name') + 1:value_index]).lower()
+        value = ' '.join(args[value_index + 1:])
+
+        if name == 'algorithm':
+            matches = [algorithm for algorithm in constants.ALGORITHM_LIST if algorithm.lower() == value.lower()]
+            if not matches:
+                self.send('info string unknown algorithm {}'.format(value))
+                return
+            self.algorithm = matches[0]
+        elif name in ('nullmove', 'lmr'):
+            if value.lower() not in ('true', 'false'):
+                self.send('info string invalid value {}'.format(value))
+                return
+            if name == 'nullmove':
+                self.null_move = value.lower() == 'true'
+            else:
+                self.lmr = value.lower() == 'true'
+            return                                          # The table and helpers can be kept
+        elif name in ('hash', 'threads'):
+            try:
+                number = int(value)
+            except ValueError:
+                self.send('info string invalid value {}'.format(value))
+                return
+            if name == 'hash':
+                self.hash_mb = min(max(1, number), MAX_HASH_MB)
+            else:
+                self.threads = min(max(1, number), MAX_THREADS)
+        else:
+            return
+        self.close()
+
+    def prepare(self):
+        """
+        Create the transposition table and Lazy SMP helpers for the current options, if MTD(f) needs them.
+        """
+        if self.algorithm != 'MTD(f) - Main' or self.trans_table:
+            return
+        smp = search_worker.uses_smp(self.algorithm, self.threads)
+        self.trans_table = t_table.TransTable(self.hash_mb, shared=smp)
+        if smp:
+            self.smp_pool = lazy_smp.LazySmpPool(self.threads - 1, self.trans_table)
+
+    def go(self, params):
+        """
+        Start a search on a background thread. It replies with 'bestmove' when done.
+        :param params: parsed 'go' parameters.
+        """
+        self.prepare()
+        board = self.board.copy()
+        time_manager = timer.TimeManager(move_budget(board, params), params.get('nodes'), iterate=True)
+        time_manager.on_iteration = self.send_info
+        depth = min(params['depth'], MAX_DEPTH) if 'depth' in params else MAX_DEPTH
+        engine = search_worker.create_engine(self.algorithm, board, max(1, depth), self.trans_table, time_manager,
+                                             self.smp_pool, self.threads, self.null_move, self.lmr)
+        self.time_manager = time_manager
+        self.search_thread = threading.Thread(target=self.search, args=(engine, board), daemon=True)
+        self.search_thread.start()
+
+    def search(self, engine, board):
+        """
+        Search thread: run the engine and send the result.
+        :param engine: engine object.
+        :param board: board state the engine was created with.
+        """
+        result = search_worker.run_search(engine, board)
+        nodes = result.nodes
+        if getattr(engine, 'smp_report', None):
+            nodes = sum(worker_nodes for _, worker_nodes, _ in engine.smp_report)
+        seconds = result.seconds
+        self.send('info nodes {} time {} nps {}'.format(nodes, int(seconds * 1000),
+                                                        int(nodes / seconds) if seconds else 0))
+        self.send('bestmove {}'.format(result.move.uci() if result.move else '0000'))
+
+    def send_info(self, depth, move, score, nodes, seconds):
+        """
+        Report a completed iteration (timer.TimeManager.on_iteration callback).
+        """
+        line = 'info depth {}'.format(depth)
+        if score is not None and move:                 # No best move: the root score is only a placeholder
+            line += ' score {}'.format(format_score(score))
+        line += ' nodes {} time {} nps {}'.format(nodes, int(seconds * 1000), int(nodes / seconds) if seconds else 0)
+        if move:
+            line += ' pv {}'.format(move.uci())
+        self.send(line)
+
+    def bench(self, args):
+        """
+        Handle 'bench [depth ...]': run the search benchmark with the current algorithm (see bench.py).
+        :param args: command tokens after 'bench'.
+        """
+        depths = [int(arg) for arg in args if arg.isdigit()] or None
+        report = bench.run_bench([self.algorithm], depths,
+                                 progress=lambda result: self.send(bench.format_result(result)),
+                                 null_move=self.null_move, lmr=self.lmr)
+        for line in bench.format_report(report).splitlines():
+            self.send(line)
+
+    def wait(self, stop=False):
+        """
+        Wait for the running search, if any, to finish.
+        :param stop: True to stop it first.
+        """
+        if self.search_thread is None:
+            return
+        if stop:
+            self.time_manager.stop()
+        self.search_thread.join()
+        self.search_thread = None
+
+    def close(self):
+        """
+        Shut down the Lazy SMP helpers and release the transposition table.
+        """
+        if self.smp_pool:
+            self.smp_pool.close()
+            self.smp_pool = None
+        if self.trans_table:
+            self.trans_table.close()
+            self.trans_table = None
+
+    def main_loop(self, commands=sys.stdin):
+        """
+        Read and handle commands until 'quit' or end of input.
+        :param commands: stream of UCI commands.
+        """
+        try:
+            for line in commands:
+                if not self.handle(line):
+                    return
+            self.wait()
+        finally:
+            self.close()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    multiprocessing.set_start_method('spawn')  # A process forked from the search thread would inherit the main
+    UciEngine().main_loop()                    # thread's lock on stdin and hang closing it
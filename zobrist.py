@@ -0,0 +1,123 @@
+import chess
+import chess.polyglot
+
+"""
+Incremental Zobrist hashing. Keys are identical to chess.polyglot.zobrist_hash, so they match the opening book.
+"""
+
+RANDOM_ARRAY = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+TURN_KEY = RANDOM_ARRAY[780]
+HASHER = chess.polyglot.ZobristHasher(RANDOM_ARRAY)
+
+
+def build_piece_keys():
+    """
+    Polyglot piece keys arranged for direct lookup.
+    :return: PIECE_KEYS[colour][piece_type][square].
+    """
+    piece_keys = [[None] * 7, [None] * 7]
+    for colour in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            piece_index = (piece_type - 1) * 2 + int(colour)           # Polyglot order: black then white
+            piece_keys[colour][piece_type] = RANDOM_ARRAY[64 * piece_index:64 * piece_index + 64]
+    return piece_keys
+
+
+PIECE_KEYS = build_piece_keys()
+CASTLING_KEYS = {}                       # Cleaned castling rights mask -> castling part of the key
+
+
+def state_key(board):
+    """
+    Castling and en passant part of the key. Cheap enough to recompute on every move.
+    :param board: board state.
+    :return: partial Zobrist key.
+    """
+    if board.chess960:                   # Castling key also depends on where the king stands
+        return HASHER.hash_castling(board) ^ HASHER.hash_ep_square(board)
+
+    rights = board.clean_castling_rights()
+    castling_key = CASTLING_KEYS.get(rights)
+    if castling_key is None:
+        castling_key = CASTLING_KEYS[rights] = HASHER.hash_castling(board)
+    return castling_key ^ HASHER.hash_ep_square(board) if board.ep_square else castling_key
+
+
+class ZobristTracker:
+    """
+    Keeps the polyglot Zobrist key of a board up to date as moves are made and unmade, so reading the key
+    is O(1) instead of a rescan of all 64 squares.
+    """
+    def __init__(self, board, inner=None):
+        """
+        :param board: board state.
+        :param inner: optional make/unmake layer with push/pop (such as evaluator.IncrementalEvaluator) that moves
+                      are passed on to. Defaults to the board itself.
+        """
+        self.board = board
+        self.inner = inner or board
+        self.keys = [chess.polyglot.zobrist_hash(board)]  # Key for each position on the search path
+
+    @property
+    def key(self):
+        return self.keys[-1]
+
+    def move_key(self, move):
+        """
+        XOR of the piece keys changed by a move, computed before it is pushed.
+        :param move: pseudo-legal move (or null move) for the current board.
+        :return: partial Zobrist key.
+        """
+        if not move:                                                   # Null move: no pieces change
+            return 0
+
+        board = self.board
+        colour = board.turn
+        own = PIECE_KEYS[colour]
+        piece_type = board.piece_type_at(move.from_square)
+
+        if piece_type == chess.KING and board.is_castling(move):       # King and rook both relocate
+            rank = 0 if colour == chess.WHITE else 56
+            if board.is_kingside_castling(move):
+                king_to, rook_from, rook_to = chess.G1 + rank, chess.H1 + rank, chess.F1 + rank
+            else:
+                king_to, rook_from, rook_to = chess.C1 + rank, chess.A1 + rank, chess.D1 + rank
+            return (own[chess.KING][move.from_square] ^ own[chess.KING][king_to] ^
+                    own[chess.ROOK][rook_from] ^ own[chess.ROOK][rook_to])
+
+        key = own[piece_type][move.from_square] ^ own[move.promotion or piece_type][move.to_square]
+
+        if move.to_square == board.ep_square and piece_type == chess.PAWN:  # Captured pawn is behind the target
+            captured_sq = move.to_square - 8 if colour == chess.WHITE else move.to_square + 8
+            key ^= PIECE_KEYS[not colour][chess.PAWN][captured_sq]
+        else:
+            captured_type = board.piece_type_at(move.to_square)
+            if captured_type:
+                key ^= PIECE_KEYS[not colour][captured_type][move.to_square]
+
+        return key
+
+    def push(self, move):
+        """
+        Make a move on the board and update the key.
+        :param move: move to make.
+        """
+        key = self.keys[-1] ^ self.move_key(move) ^ state_key(self.board) ^ TURN_KEY
+        self.inner.push(move)
+        self.keys.append(key ^ state_key(self.board))
+
+    def pop(self):
+        """
+        Unmake the last move and restore the previous key.
+        :return: the move that was unmade.
+        """
+        self.keys.pop()
+        return self.inner.pop()
+
+    def unwind(self, ply):
+        """
+        Unmake moves until the board is back at the given move stack length, such as after an aborted search.
+        :param ply: move stack length to return to.
+        """
+        while len(self.board.move_stack) > ply:
+            self.pop()